@@ -0,0 +1,231 @@
+import itertools
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import numpy as np
+
+from backend.profiling import timed
+
+# Selections touching fewer chunks are left to h5py, which keeps them in its chunk cache
+MIN_CHUNKS = 8
+
+# Blosc filters registered by hdf5plugin
+FILTER_BLOSC = 32001
+FILTER_BLOSC2 = 32026
+
+
+def _unshuffle(buffer, cd_values):
+    """Undo the HDF5 shuffle filter: the bytes of the elements were grouped by position."""
+    itemsize = cd_values[0]
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    whole = len(data) - len(data) % itemsize
+    # Bytes left over after the last whole element are stored as-is
+    return np.concatenate((data[:whole].reshape(itemsize, -1).T.ravel(), data[whole:]))
+
+
+def _inflate(buffer, cd_values):
+    return zlib.decompress(buffer)
+
+
+def _blosc(buffer, cd_values):
+    import blosc2
+    return blosc2.decompress(bytes(buffer))
+
+
+def _blosc2(buffer, cd_values):
+    import blosc2
+    # The Blosc2 filter stores every chunk as a contiguous super-chunk frame
+    return blosc2.schunk_from_cframe(bytes(buffer), copy=True)[:]
+
+
+# Filter id -> decode(buffer, cd_values); zlib and Blosc release the GIL while decompressing
+DECODERS = {
+    h5py.h5z.FILTER_DEFLATE: _inflate,
+    h5py.h5z.FILTER_SHUFFLE: _unshuffle,
+    FILTER_BLOSC: _blosc,
+    FILTER_BLOSC2: _blosc2,
+}
+
+
+def chunk_filters(dataset):
+    """
+    Return the filter pipeline of a dataset if its chunks can be decoded here.
+
+    Args:
+        dataset (h5py.Dataset): The dataset.
+
+    Returns:
+        list: (filter id, cd_values) in the order they were applied when
+        writing, or None if the dataset is not chunked and compressed, uses a
+        filter without a decoder (e.g. fletcher32 or szip), or is stored in a
+        type NumPy cannot read in place.
+    """
+    if dataset.chunks is None or dataset.dtype.hasobject:
+        return None
+    dcpl = dataset.id.get_create_plist()
+    filters = []
+    for index in range(dcpl.get_nfilters()):
+        code, _, cd_values, _ = dcpl.get_filter(index)
+        filters.append((code, cd_values))
+    if not filters or any(code not in DECODERS for code, _ in filters):
+        return None
+    if any(code in (FILTER_BLOSC, FILTER_BLOSC2) for code, _ in filters):
+        try:
+            import blosc2  # noqa: F401
+        except ImportError:
+            return None
+    # The decoded bytes must be byte for byte the NumPy dtype
+    if dataset.id.get_type() != h5py.h5t.py_create(dataset.dtype):
+        return None
+    return filters
+
+
+def hyperslab_ranges(selection, shape):
+    """
+    (start, stop) per axis of a selection made of integers and slices of step
+    1, and the axes indexed by an integer; None for any other selection.
+    """
+    if not isinstance(selection, tuple):
+        selection = (selection,)
+    if len(selection) > len(shape):
+        return None
+    ranges, dropped = [], []
+    for axis, size in enumerate(shape):
+        index = selection[axis] if axis < len(selection) else slice(None)
+        if isinstance(index, (int, np.integer)):
+            index = int(index) + (size if index < 0 else 0)
+            if not 0 <= index < size:
+                return None
+            ranges.append((index, index + 1))
+            dropped.append(axis)
+        elif isinstance(index, slice) and index.step in (None, 1):
+            start, stop, _ = index.indices(size)
+            ranges.append((start, max(start, stop)))
+        else:
+            return None
+    return ranges, dropped
+
+
+_default_executor = None
+
+
+def default_executor():
+    """
+    Return the thread pool shared by parallel chunk reads, one thread per
+    core, or None on a single core, where reads are left to h5py.
+    """
+    global _default_executor
+    if _default_executor is None and (os.cpu_count() or 1) > 1:
+        _default_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='chunk-reader')
+    return _default_executor
+
+
+class ParallelChunkReader:
+    """
+    Reads large hyperslabs of a compressed dataset with its chunks
+    decompressed in parallel.
+
+    The chunks a selection touches are fetched raw with `read_direct_chunk`
+    in the calling thread, since h5py serializes library calls, while a pool
+    of threads decodes them and copies their intersection with the selection
+    straight into the preallocated output array. Small and non-hyperslab
+    selections, and chunks that are not allocated, are read by h5py. Indexed
+    like the h5py dataset, see `DatasetReader._source`.
+    """
+
+    def __init__(self, dataset, filters, executor=None, min_chunks=MIN_CHUNKS):
+        """
+        Initialize the ParallelChunkReader object.
+
+        Args:
+            dataset (h5py.Dataset): Chunked, compressed dataset.
+            filters (list): Its filter pipeline, see `chunk_filters`.
+            executor (concurrent.futures.Executor): Decoding threads, defaults to the shared pool.
+            min_chunks (int): Selections touching fewer chunks are read by h5py.
+        """
+        self.dataset = dataset
+        self.filters = filters
+        self.executor = executor or default_executor()
+        self.min_chunks = min_chunks
+        # Compressed chunks waiting for a thread, bounds the memory held by a read
+        self.max_pending = 4 * (os.cpu_count() or 1)
+        self.shape = dataset.shape
+        self.ndim = dataset.ndim
+        self.dtype = dataset.dtype
+
+    def fields(self, names):
+        """Some fields of a compound dataset, read by the next index like `h5py.Dataset.fields`."""
+        return _Fields(self, names)
+
+    def __getitem__(self, selection):
+        return self.read(selection)
+
+    def read(self, selection, names=None):
+        """
+        Read a selection, decompressing its chunks in parallel when it is large.
+
+        Args:
+            selection: Index of the dataset.
+            names (str or list): Fields of a compound dataset to return.
+        """
+        hyperslab = hyperslab_ranges(selection, self.shape) if self.executor is not None else None
+        chunks = self.dataset.chunks
+        if hyperslab is not None:
+            ranges, dropped = hyperslab
+            first = [start // chunk for (start, _), chunk in zip(ranges, chunks)]
+            last = [-(-stop // chunk) for (_, stop), chunk in zip(ranges, chunks)]
+            count = int(np.prod([stop - start for start, stop in zip(first, last)]))
+        if hyperslab is None or count < self.min_chunks:
+            return self.dataset[selection] if names is None else self.dataset.fields(names)[selection]
+
+        out = np.empty([stop - start for start, stop in ranges], dtype=self.dtype)
+        pending = deque()
+        for origin in itertools.product(*(range(start, stop) for start, stop in zip(first, last))):
+            offset = tuple(index * chunk for index, chunk in zip(origin, chunks))
+            # Chunks overlap the edges of the selection; only their intersection is copied
+            source = tuple(slice(max(start, corner) - corner, min(stop, corner + chunk) - corner)
+                           for (start, stop), corner, chunk in zip(ranges, offset, chunks))
+            target = tuple(slice(max(start, corner) - start, min(stop, corner + chunk) - start)
+                           for (start, stop), corner, chunk in zip(ranges, offset, chunks))
+            try:
+                filter_mask, raw = self.dataset.id.read_direct_chunk(offset)
+            except RuntimeError:
+                # Not allocated, h5py returns the fill value
+                out[target] = self.dataset[tuple(slice(corner + part.start, corner + part.stop)
+                                                 for corner, part in zip(offset, source))]
+                continue
+            pending.append(self.executor.submit(self._decode, raw, filter_mask, out, source, target))
+            while len(pending) > self.max_pending:
+                pending.popleft().result()
+        while pending:
+            pending.popleft().result()
+
+        if dropped:
+            out = out.reshape([size for axis, size in enumerate(out.shape) if axis not in dropped])
+        return out if names is None else out[names]
+
+    def _decode(self, raw, filter_mask, out, source, target):
+        """Decode a raw chunk and copy its part of the selection, in a pool thread."""
+        buffer = raw
+        with timed('decompress') as timer:
+            for index in reversed(range(len(self.filters))):
+                if not filter_mask & (1 << index):
+                    code, cd_values = self.filters[index]
+                    buffer = DECODERS[code](buffer, cd_values)
+            timer.nbytes = len(buffer)
+        chunk = np.frombuffer(buffer, dtype=self.dtype).reshape(self.dataset.chunks)
+        out[target] = chunk[source]
+
+
+class _Fields:
+    """Fields of a ParallelChunkReader, indexed like the result of `h5py.Dataset.fields`."""
+
+    def __init__(self, reader, names):
+        self.reader = reader
+        self.names = names
+
+    def __getitem__(self, selection):
+        return self.reader.read(selection, self.names)
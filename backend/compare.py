@@ -0,0 +1,536 @@
+import itertools
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+from backend.chunk_reader import hyperslab_ranges
+from backend.file_pool import default_pool
+from backend.scanner import scan_file
+from backend.statistics import PIECE_BYTES, TASK_BYTES, default_executor
+
+# Ranges of differing rows kept per column; the differing values are still all counted
+MAX_RANGES = 10_000
+
+
+class DatasetDiff:
+    """
+    Differences between the values of two datasets.
+
+    Rows are the first axis, or the row axis of a slice, and columns are the
+    fields of compound datasets or the other axes flattened, like the table
+    shows them. Columns are matched by field name, or by position. Runs of
+    differing rows are kept per column of the first dataset, so they can be
+    highlighted; rows only one dataset has count as differing in every column.
+    """
+
+    def __init__(self, key_path, other_key_path, view, columns, names, rows_a, rows_b):
+        """
+        Initialize the DatasetDiff object.
+
+        Args:
+            key_path (str): Path of the first dataset.
+            other_key_path (str): Path of the second dataset.
+            view (tuple): Slice compared, see `DatasetReader.set_view`, None for the whole datasets.
+            columns (list): Columns of the first dataset compared.
+            names (list): Names of the compared columns.
+            rows_a (int): Rows of the first dataset.
+            rows_b (int): Rows of the second dataset.
+        """
+        self.key_path = key_path
+        self.other_key_path = other_key_path
+        self.view = view
+        self.columns = columns
+        self.names = names
+        self.rows_a = rows_a
+        self.rows_b = rows_b
+        self.cells = [0] * len(columns)  # Differing values per column, over the common rows
+        self.ranges = [[] for _ in columns]  # (start, stop) runs of differing rows per column
+        self.truncated = False  # Ranges beyond MAX_RANGES were dropped
+        self.rows_skipped = 0  # Rows whose chunks are stored identically, never decoded
+        self.bounds = {}  # Column -> starts and stops of its ranges, for `differs`
+
+    @property
+    def identical(self):
+        return self.rows_a == self.rows_b and not any(self.cells)
+
+    @property
+    def differing_rows(self):
+        """Rows differing in at least one column, rows only one dataset has included."""
+        starts, stops = self._column_bounds(None)
+        return int((stops - starts).sum())
+
+    def merge(self, part):
+        """Add the result of a range of rows, see `_compare_range`."""
+        self.rows_skipped += part['rows_skipped']
+        self.truncated |= part['truncated']
+        for position, (cells, ranges) in enumerate(zip(part['cells'], part['ranges'])):
+            self.cells[position] += cells
+            self.ranges[position].extend(ranges)
+
+    def finish(self):
+        """Sort and join the ranges of the merged parts."""
+        for position, ranges in enumerate(self.ranges):
+            ranges.sort()
+            joined = []
+            for start, stop in ranges:
+                if joined and start <= joined[-1][1]:
+                    joined[-1][1] = max(joined[-1][1], stop)
+                else:
+                    joined.append([start, stop])
+            if len(joined) > MAX_RANGES:
+                joined, self.truncated = joined[:MAX_RANGES], True
+            self.ranges[position] = [tuple(bounds) for bounds in joined]
+        self.bounds.clear()
+
+    def _column_bounds(self, column):
+        """Starts and stops of the differing rows of a column, of any column if None."""
+        if column not in self.bounds:
+            if column is None:
+                ranges = sorted(bounds for column_ranges in self.ranges for bounds in column_ranges)
+            else:
+                ranges = self.ranges[self.columns.index(column)] if column in self.columns else []
+            if self.rows_a != self.rows_b:
+                ranges = list(ranges) + [(min(self.rows_a, self.rows_b), max(self.rows_a, self.rows_b))]
+            joined = []
+            for start, stop in ranges:
+                if joined and start <= joined[-1][1]:
+                    joined[-1][1] = max(joined[-1][1], stop)
+                else:
+                    joined.append([start, stop])
+            bounds = np.array(joined, dtype=np.int64).reshape(-1, 2)
+            self.bounds[column] = bounds[:, 0], bounds[:, 1]
+        return self.bounds[column]
+
+    def column_ranges(self, column):
+        """
+        Runs of differing rows of a column of the first dataset.
+
+        Returns:
+            list: (start, stop) tuples in increasing order.
+        """
+        starts, stops = self._column_bounds(column)
+        return list(zip(starts.tolist(), stops.tolist()))
+
+    def differs(self, row, column):
+        """True if a cell of the first dataset differs, found by bisection."""
+        starts, stops = self._column_bounds(column)
+        index = np.searchsorted(starts, row, side='right') - 1
+        return index >= 0 and row < stops[index]
+
+    def next_row(self, row, column=None):
+        """First differing row after `row`, in a column or in any column, or None."""
+        starts, stops = self._column_bounds(column)
+        index = np.searchsorted(stops, row + 1, side='right')
+        if index == len(starts):
+            return None
+        return int(max(starts[index], row + 1))
+
+    def summary(self):
+        if self.identical:
+            return "identical"
+        parts = []
+        if self.rows_a != self.rows_b:
+            parts.append(f"{self.rows_a:,} vs {self.rows_b:,} rows")
+        differing = [f"{name} ({cells:,})" for name, cells in zip(self.names, self.cells) if cells]
+        if differing:
+            parts.append(f"{sum(self.cells):,} values differ in {', '.join(map(str, differing))}")
+        return "; ".join(parts)
+
+    def to_dict(self):
+        return {'key_path': self.key_path, 'other_key_path': self.other_key_path, 'view': self.view,
+                'columns': self.columns, 'names': [str(name) for name in self.names], 'rows_a': self.rows_a,
+                'rows_b': self.rows_b, 'cells': self.cells, 'ranges': self.ranges, 'truncated': self.truncated,
+                'rows_skipped': self.rows_skipped}
+
+
+class Comparison:
+    """
+    Result of comparing two files, or two datasets: the structural
+    differences (objects missing on one side, types, shapes, dtypes and
+    attributes) and a DatasetDiff per pair of datasets whose values were compared.
+    """
+
+    def __init__(self, filename, other_filename):
+        self.filename = filename
+        self.other_filename = other_filename
+        self.differences = []  # (path, description) of the structural differences
+        self.datasets = {}  # Path in the first file -> DatasetDiff
+
+    @property
+    def identical(self):
+        return not self.differences and all(diff.identical for diff in self.datasets.values())
+
+    def to_dict(self):
+        return {'filename': self.filename, 'other_filename': self.other_filename, 'identical': self.identical,
+                'differences': [list(difference) for difference in self.differences],
+                'datasets': {path: diff.to_dict() for path, diff in self.datasets.items()}}
+
+
+def normalize_path(path):
+    """Path of an object with a single leading slash, the key of `Comparison.datasets`."""
+    return '/' + path.strip('/')
+
+
+def _flatten(metadata, entries=None):
+    """Path -> entry of every group and dataset of nested metadata."""
+    entries = {} if entries is None else entries
+    for entry in metadata.values():
+        entries[normalize_path(entry["Path"])] = entry
+        if entry.get("Type") == "Group":
+            _flatten(entry.get("Children", {}), entries)
+    return entries
+
+
+def _equal_values(value, other):
+    try:
+        return bool(np.array_equal(value, other)) and np.asarray(value).dtype == np.asarray(other).dtype
+    except Exception:
+        return False
+
+
+def compare_attributes(obj, other):
+    """
+    Compare the attributes of two groups or datasets, by value.
+
+    Returns:
+        list: Description of every attribute that is missing or different.
+    """
+    differences = []
+    names, other_names = set(obj.attrs), set(other.attrs)
+    for name in sorted(names - other_names):
+        differences.append(f"attribute '{name}' only in the first file")
+    for name in sorted(other_names - names):
+        differences.append(f"attribute '{name}' only in the second file")
+    for name in sorted(names & other_names):
+        try:
+            equal = _equal_values(obj.attrs[name], other.attrs[name])
+        except Exception:
+            equal = False  # Unreadable attributes, e.g. an unsupported type
+        if not equal:
+            differences.append(f"attribute '{name}' differs")
+    return differences
+
+
+def _compare_layout(dataset, other):
+    """Shape and dtype differences of two datasets."""
+    differences = []
+    if dataset.shape != other.shape:
+        differences.append(f"shape {dataset.shape} vs {other.shape}")
+    if dataset.dtype != other.dtype:
+        differences.append(f"dtype {dataset.dtype} vs {other.dtype}")
+    return differences
+
+
+def same_storage(dataset, other):
+    """
+    True if two datasets store the same values in byte-identical chunks, so
+    their chunks can be compared without decoding them: same shape, chunk
+    shape, stored type, filter pipeline and fill value. Variable-length data
+    is excluded, its chunks hold references into each file's heap.
+    """
+    if dataset.chunks is None or dataset.chunks != other.chunks or dataset.shape != other.shape:
+        return False
+    if dataset.dtype.hasobject or dataset.id.get_type() != other.id.get_type():
+        return False
+    dcpl, other_dcpl = dataset.id.get_create_plist(), other.id.get_create_plist()
+    filters = [dcpl.get_filter(index)[:3] for index in range(dcpl.get_nfilters())]
+    other_filters = [other_dcpl.get_filter(index)[:3] for index in range(other_dcpl.get_nfilters())]
+    if filters != other_filters:
+        return False
+    return np.asarray(dataset.fillvalue).tobytes() == np.asarray(other.fillvalue).tobytes()
+
+
+def _raw_chunk(dataset, offset):
+    try:
+        return dataset.id.read_direct_chunk(offset)
+    except RuntimeError:
+        return None  # Not allocated, reads as the fill value
+
+
+def _equal_chunk_rows(dataset, other, selection, row_axis):
+    """
+    Which chunk rows of a selection are stored identically in two datasets,
+    see `same_storage`. A chunk row is skipped as soon as one of its chunks differs.
+
+    Returns:
+        np.ndarray: One bool per chunk along the row axis, from the chunk of the first row.
+    """
+    ranges, _ = hyperslab_ranges(selection, dataset.shape)
+    chunks = dataset.chunks
+    first = [start // chunk for (start, _), chunk in zip(ranges, chunks)]
+    last = [-(-stop // chunk) for (_, stop), chunk in zip(ranges, chunks)]
+    equal = np.ones(last[row_axis] - first[row_axis], dtype=bool)
+    for origin in itertools.product(*(range(start, stop) for start, stop in zip(first, last))):
+        band = origin[row_axis] - first[row_axis]
+        if equal[band]:
+            offset = tuple(index * chunk for index, chunk in zip(origin, chunks))
+            # (filter mask, stored bytes), compared without decompressing
+            equal[band] = _raw_chunk(dataset, offset) == _raw_chunk(other, offset)
+    return equal
+
+
+def _layout(dataset, view):
+    """
+    Rows, column names and column keys (field names or indexes) of a
+    dataset, in a view or along its first axis.
+    """
+    shape, fields = dataset.shape, dataset.dtype.names
+    if view is not None:
+        row_axis, column_axis, _ = view
+        rows = shape[row_axis]
+        columns = shape[column_axis] if column_axis is not None else 0
+    else:
+        rows = shape[0] if shape else 1
+        columns = int(np.prod(shape[1:])) if shape else 1
+    if fields:
+        return rows, list(fields), list(fields)
+    return rows, [str(column) for column in range(columns)], list(range(columns))
+
+
+def _row_bytes(dataset, view):
+    """Bytes of one row of a view, or along the first axis."""
+    if view is None:
+        return max(1, dataset.dtype.itemsize * int(np.prod(dataset.shape[1:])))
+    column_axis = view[1]
+    return max(1, dataset.dtype.itemsize * (dataset.shape[column_axis] if column_axis is not None else 1))
+
+
+def _selection(view, start, stop, ndim):
+    """Index of rows [start, stop) of a view, or along the first axis."""
+    if ndim == 0:
+        return ()
+    if view is None:
+        return slice(start, stop)
+    row_axis, column_axis, indexes = view
+    selection = list(indexes)
+    selection[row_axis] = slice(start, stop)
+    if column_axis is not None:
+        selection[column_axis] = slice(None)
+    return tuple(selection)
+
+
+def _as_rows(values, view):
+    """Values read with `_selection` with the rows first and the columns flattened."""
+    values = np.asarray(values)
+    if values.ndim == 0:
+        values = values.reshape(1)
+    if view is not None and view[1] is not None and view[1] < view[0]:
+        values = values.T
+    return values.reshape(len(values), -1)
+
+
+def _differs(values, other):
+    """Rows where two columns differ; NaNs are equal to NaNs."""
+    try:
+        with np.errstate(invalid='ignore'):
+            differs = np.asarray(values != other)
+    except (TypeError, ValueError):
+        differs = None
+    if differs is None or differs.shape != values.shape:
+        # Values that cannot be compared, e.g. strings and numbers
+        return np.ones(len(values), dtype=bool)
+    if values.dtype.kind in 'fc' and other.dtype.kind in 'fc':
+        differs &= ~(np.isnan(values) & np.isnan(other))
+    return differs.reshape(len(values), -1).any(axis=1)
+
+
+def _runs(mask, offset):
+    """(start, stop) runs of True in a mask, shifted by `offset`."""
+    edges = np.flatnonzero(np.diff(mask.astype(np.int8), prepend=0, append=0))
+    return (edges.reshape(-1, 2) + offset).tolist()
+
+
+def _compare_range(filename, key_path, other_filename, other_key_path, view, pairs, start, stop):
+    """
+    Compare rows [start, stop) of two datasets, in a worker process.
+
+    Chunk rows stored identically in both files are skipped without being
+    decoded; the other rows are read in pieces of about PIECE_BYTES and
+    compared column by column.
+
+    Args:
+        pairs (list): (column key of the first dataset, column key of the second).
+
+    Returns:
+        dict: Differing values and runs of rows per pair, see `DatasetDiff.merge`.
+    """
+    pool = default_pool()
+    part = {'cells': [0] * len(pairs), 'ranges': [[] for _ in pairs], 'truncated': False, 'rows_skipped': 0}
+    with pool.dataset(filename, key_path) as dataset, pool.dataset(other_filename, other_key_path) as other:
+        row_axis = 0 if view is None else view[0]
+        chunk_rows = dataset.chunks[row_axis] if dataset.chunks else 1
+        raw = same_storage(dataset, other)
+        sources = []
+        for name, path, fallback in ((filename, key_path, dataset), (other_filename, other_key_path, other)):
+            mapped = pool.memmap(name, path)
+            sources.append(fallback if mapped is None else mapped)
+        piece_rows = chunk_rows * max(1, PIECE_BYTES // _row_bytes(dataset, view) // chunk_rows)
+
+        for piece_start in range(start, stop, piece_rows):
+            piece_stop = min(piece_start + piece_rows, stop)
+            spans = [(piece_start, piece_stop)]
+            if raw:
+                # Tasks and pieces start on a chunk row, so chunk row i covers piece_start + i * chunk_rows
+                equal = _equal_chunk_rows(dataset, other, _selection(view, piece_start, piece_stop, dataset.ndim),
+                                          row_axis)
+                spans = [(piece_start + first * chunk_rows, min(piece_stop, piece_start + last * chunk_rows))
+                         for first, last in _runs(~equal, 0)]
+                part['rows_skipped'] += (piece_stop - piece_start) - sum(end - begin for begin, end in spans)
+            for span_start, span_stop in spans:
+                selection = _selection(view, span_start, span_stop, dataset.ndim)
+                rows, other_rows = _as_rows(sources[0][selection], view), _as_rows(sources[1][selection], view)
+                for position, (key, other_key) in enumerate(pairs):
+                    values = rows[key] if isinstance(key, str) else rows[:, key]
+                    other_values = other_rows[other_key] if isinstance(other_key, str) else other_rows[:, other_key]
+                    differs = _differs(values, other_values)
+                    count = int(differs.sum())
+                    if not count:
+                        continue
+                    part['cells'][position] += count
+                    ranges = part['ranges'][position]
+                    runs = _runs(differs, span_start)
+                    if len(ranges) + len(runs) > MAX_RANGES:
+                        runs, part['truncated'] = runs[:MAX_RANGES - len(ranges)], True
+                    ranges.extend(runs)
+    return part
+
+
+def _plan(filename, key_path, other_filename, other_key_path, view, differences):
+    """
+    Prepare the value comparison of two datasets.
+
+    Args:
+        differences (list): Receives the shape, dtype and attribute
+            differences, as (path, description).
+
+    Returns:
+        tuple: The empty DatasetDiff and the arguments of its `_compare_range` tasks.
+    """
+    pool = default_pool()
+    with pool.dataset(filename, key_path) as dataset, pool.dataset(other_filename, other_key_path) as other:
+        for description in _compare_layout(dataset, other) + compare_attributes(dataset, other):
+            differences.append((key_path, description))
+        if view is not None and dataset.ndim != other.ndim:
+            raise ValueError("The datasets do not have the same number of dimensions.")
+        rows, names, keys = _layout(dataset, view)
+        other_rows, other_names, other_keys = _layout(other, view)
+        if dataset.dtype.names and other.dtype.names:
+            pairs = [(key, key) for key in keys if key in other_keys]
+        elif not dataset.dtype.names and not other.dtype.names:
+            pairs = list(zip(keys, other_keys))
+        else:
+            pairs = []
+        chunk_rows = dataset.chunks[0 if view is None else view[0]] if dataset.chunks else 1
+        row_bytes = _row_bytes(dataset, view)
+
+    columns = [keys.index(key) for key, _ in pairs]
+    diff = DatasetDiff(key_path, other_key_path, view, columns, [names[column] for column in columns], rows, other_rows)
+    common = min(rows, other_rows)
+    task_rows = chunk_rows * max(1, TASK_BYTES // row_bytes // chunk_rows)
+    tasks = [(filename, key_path, other_filename, other_key_path, view, pairs, start, min(start + task_rows, common))
+             for start in range(0, common, task_rows)] if pairs else []
+    return diff, tasks
+
+
+def _run(plans, progress=None, should_stop=None, executor=None):
+    """
+    Run the tasks of several dataset comparisons in a process pool, merging
+    their results as they complete.
+
+    Returns:
+        bool: False if cancelled.
+    """
+    executor = executor or default_executor()
+    pending = {executor.submit(_compare_range, *task): diff for diff, tasks in plans for task in tasks}
+    total = len(pending)
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            if should_stop and should_stop():
+                return False
+            for future in done:
+                pending.pop(future).merge(future.result())
+            if done and progress:
+                progress(int(100 * (total - len(pending)) / total))
+    finally:
+        for future in pending:
+            future.cancel()
+    for diff, _ in plans:
+        diff.finish()
+    return True
+
+
+def compare_datasets(filename, key_path, other_filename, other_key_path, view=None, progress=None,
+                     should_stop=None, executor=None):
+    """
+    Compare two datasets, of the same file or of two files.
+
+    The rows are split into chunk-aligned ranges compared in parallel, like
+    `statistics.compute_statistics`. When both datasets are chunked and
+    filtered the same way, chunks whose stored bytes match are skipped
+    without being decompressed, so identical outputs cost about one read of
+    the compressed data.
+
+    Args:
+        filename (str): Path to the first HDF5 file.
+        key_path (str): Path of the first dataset.
+        other_filename (str): Path to the second HDF5 file.
+        other_key_path (str): Path of the second dataset.
+        view (tuple): Slice compared in both datasets, see `DatasetReader.set_view`.
+            None compares the whole datasets, row by row along their first axis.
+        progress (callable): Called with the percentage done.
+        should_stop (callable): Returns True to cancel the comparison.
+        executor (concurrent.futures.Executor): Defaults to the process pool of the statistics.
+
+    Returns:
+        Comparison: The differences, or None if cancelled.
+    """
+    comparison = Comparison(filename, other_filename)
+    key_path, other_key_path = normalize_path(key_path), normalize_path(other_key_path)
+    diff, tasks = _plan(filename, key_path, other_filename, other_key_path, view, comparison.differences)
+    comparison.datasets[key_path] = diff
+    if not _run([(diff, tasks)], progress, should_stop, executor):
+        return None
+    return comparison
+
+
+def compare_files(filename, other_filename, progress=None, should_stop=None, executor=None):
+    """
+    Compare two HDF5 files: the groups and datasets only one of them has,
+    their types, shapes, dtypes and attributes, and the values of every
+    dataset both have, see `compare_datasets`. The rows of all datasets are
+    compared by the same pool of workers.
+
+    Returns:
+        Comparison: The differences, or None if cancelled.
+    """
+    comparison = Comparison(filename, other_filename)
+    pool = default_pool()
+    with pool.read(filename) as h5file, pool.read(other_filename) as other_file:
+        entries, other_entries = _flatten(scan_file(h5file)), _flatten(scan_file(other_file))
+        for difference in compare_attributes(h5file, other_file):
+            comparison.differences.append(("/", difference))
+        datasets = []
+        for path in sorted(entries.keys() | other_entries.keys()):
+            entry, other_entry = entries.get(path), other_entries.get(path)
+            if other_entry is None:
+                comparison.differences.append((path, "only in the first file"))
+            elif entry is None:
+                comparison.differences.append((path, "only in the second file"))
+            elif entry["Type"] != other_entry["Type"]:
+                comparison.differences.append((path, f"{entry['Type']} vs {other_entry['Type']}"))
+            elif entry["Type"] == "Dataset":
+                datasets.append(path)
+            else:
+                for difference in compare_attributes(h5file[path], other_file[path]):
+                    comparison.differences.append((path, difference))
+
+    plans = []
+    for path in datasets:
+        diff, tasks = _plan(filename, path, other_filename, path, None, comparison.differences)
+        comparison.datasets[path] = diff
+        plans.append((diff, tasks))
+    if not _run(plans, progress, should_stop, executor):
+        return None
+    comparison.differences.sort(key=lambda difference: difference[0])
+    return comparison
@@ -0,0 +1,157 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+
+
+class _Entry:
+    """A cached dataset model and the plot envelope computed for it."""
+
+    __slots__ = ('model', 'envelope', 'envelope_key')
+
+    def __init__(self, model):
+        self.model = model
+        self.envelope = None
+        self.envelope_key = None  # (n_bins, view) the envelope was computed for
+
+    @property
+    def nbytes(self):
+        nbytes = self.model.nbytes
+        if self.envelope is not None:
+            nbytes += sum(array.nbytes for array in self.envelope)
+        return nbytes
+
+
+class DatasetCache:
+    """
+    In-process LRU cache of recently viewed datasets.
+
+    Entries are keyed by file, dataset path and file modification time, so a
+    file changed on disk never serves stale rows. A cached model keeps the
+    blocks its reader already read, which makes re-selecting a dataset
+    instant. Resident bytes are measured from the `nbytes` of the cached
+    blocks and envelopes; when they exceed `max_bytes`, the least recently
+    used entries are closed and dropped. The most recent entry and entries
+    holding unsaved edits are never evicted.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """
+        Initialize the DatasetCache object.
+
+        Args:
+            max_bytes (int): Budget of the resident bytes.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()  # Loaders use the cache from worker threads
+        self._entries = OrderedDict()  # (path, key path) -> (mtime_ns, _Entry)
+
+    @staticmethod
+    def _key(filename, key_path):
+        return os.path.abspath(filename), '/' + key_path.strip('/')
+
+    def get(self, filename, key_path):
+        """
+        Return the cached model of a dataset, if the file did not change since.
+
+        Returns:
+            DatasetModel: The model, or None.
+        """
+        key = self._key(filename, key_path)
+        mtime_ns = os.stat(key[0]).st_mtime_ns
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != mtime_ns:
+                if cached is not None:
+                    del self._entries[key]
+                    cached[1].model.close()
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[1].model
+
+    def put(self, filename, key_path, dataset_model):
+        """
+        Cache the model of a dataset, replacing any previous entry.
+        """
+        key = self._key(filename, key_path)
+        mtime_ns = os.stat(key[0]).st_mtime_ns
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None and previous[1].model is not dataset_model:
+                previous[1].model.close()
+            self._entries[key] = (mtime_ns, _Entry(dataset_model))
+            self._evict()
+
+    def get_envelope(self, filename, key_path, n_bins, view=None):
+        """
+        Return the first column envelope stored with a cached dataset, if it
+        was computed for the same number of bins and the same slice.
+        """
+        with self._lock:
+            cached = self._entries.get(self._key(filename, key_path))
+            if cached is None or cached[1].envelope_key != (n_bins, view):
+                return None
+            return cached[1].envelope
+
+    def put_envelope(self, filename, key_path, n_bins, envelope, view=None):
+        """
+        Store the first column envelope of a cached dataset.
+        """
+        with self._lock:
+            cached = self._entries.get(self._key(filename, key_path))
+            if cached is not None:
+                cached[1].envelope = envelope
+                cached[1].envelope_key = (n_bins, view)
+                self._evict()
+
+    def invalidate(self, filename, key_path=None):
+        """
+        Drop the entries of a file, or of one of its datasets.
+        """
+        path = os.path.abspath(filename)
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == path and (key_path is None or key == self._key(filename, key_path)):
+                    self._entries.pop(key)[1].model.close()
+
+    def clear(self):
+        with self._lock:
+            for _, entry in self._entries.values():
+                entry.model.close()
+            self._entries.clear()
+
+    @property
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry.nbytes for _, entry in self._entries.values())
+
+    def stats(self):
+        """
+        Hit counters and resident size of the cache.
+        """
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'entries': len(self._entries),
+            'resident_bytes': self.resident_bytes,
+        }
+
+    def _evict(self):
+        # Blocks are added to cached readers after insertion, so sizes are
+        # measured again on every eviction pass
+        sizes = {key: entry.nbytes for key, (_, entry) in self._entries.items()}
+        total = sum(sizes.values())
+        for key in list(self._entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key][1]
+            if entry.model.reader is not None and entry.model.reader.has_edits:
+                continue
+            del self._entries[key]
+            entry.model.close()
+            total -= sizes[key]
@@ -1,15 +1,114 @@
 from dataclasses import dataclass, field
-import pandas as pd
+from typing import TYPE_CHECKING
 
-@dataclass
+from backend.dataset_reader import DatasetReader
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+@dataclass(eq=False)
 class DatasetModel:
     keypath: str = ""
-    dataFrame: pd.DataFrame = field(default_factory=pd.DataFrame)
+    dataFrame: "pd.DataFrame" = None  # None until in-memory data is given; pandas is imported on first use
+    reader: DatasetReader = None
     title: str = field(init=False)
 
     def __post_init__(self):
         self.title = self.keypath.split('/')[-1] if self.keypath else "Untitled"
 
     @classmethod
-    def from_values(cls, keypath: str, dataframe: pd.DataFrame):
-        return cls(keypath=keypath, dataFrame=dataframe)
\ No newline at end of file
+    def from_values(cls, keypath: str, dataframe: "pd.DataFrame"):
+        return cls(keypath=keypath, dataFrame=dataframe)
+
+    @classmethod
+    def from_reader(cls, keypath: str, reader: DatasetReader):
+        return cls(keypath=keypath, reader=reader)
+
+    @property
+    def columns(self) -> list:
+        if self.reader is not None:
+            return self.reader.columns
+        if self.dataFrame is None:
+            return []
+        return list(self.dataFrame.columns)
+
+    @property
+    def empty(self) -> bool:
+        if self.reader is not None:
+            return self.reader.row_count == 0 or self.reader.column_count == 0
+        return self.dataFrame is None or self.dataFrame.empty
+
+    @property
+    def row_count(self) -> int:
+        if self.reader is not None:
+            return self.reader.row_count
+        if self.dataFrame is None:
+            return 0
+        return len(self.dataFrame)
+
+    @property
+    def view(self):
+        """
+        Slice shown by a reader-backed model of an N-D dataset, None otherwise.
+        """
+        if self.reader is not None:
+            return self.reader.view
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes of data held in memory.
+        """
+        if self.reader is not None:
+            return self.reader.nbytes
+        if self.dataFrame is None:
+            return 0
+        return int(self.dataFrame.memory_usage(index=False).sum())
+
+    @property
+    def row_bytes(self) -> int:
+        """
+        Bytes of one row as stored, for compound datasets the whole record.
+        """
+        if self.reader is not None:
+            return self.reader.row_bytes
+        return max(1, int(self.dataFrame.memory_usage(index=False).sum()) // max(1, len(self.dataFrame))) \
+            if self.dataFrame is not None else 1
+
+    @property
+    def chunk_rows(self) -> int:
+        """
+        Height of one storage chunk, the natural read granularity.
+        """
+        if self.reader is not None:
+            return self.reader.row_chunk
+        return 1
+
+    def read_column(self, index: int, start: int = 0, stop: int = None):
+        """
+        Values of one column over a range of rows, as a NumPy array.
+        """
+        if self.reader is not None:
+            return self.reader.read_column(index, start, stop)
+        return self.dataFrame.iloc[start:stop, index].to_numpy()
+
+    def rename_column(self, old_name, new_name):
+        if self.reader is not None:
+            self.reader.rename_column(old_name, new_name)
+        elif self.dataFrame is not None:
+            self.dataFrame.rename(columns={old_name: new_name}, inplace=True)
+
+    def discard_changes(self, renamed_columns: dict):
+        """
+        Undo unsaved edits and the given renames (old name -> new name).
+        """
+        if self.reader is not None:
+            self.reader.discard_changes()
+        elif self.dataFrame is not None:
+            for old_name, new_name in renamed_columns.items():
+                self.dataFrame.rename(columns={new_name: old_name}, inplace=True)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
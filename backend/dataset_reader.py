@@ -0,0 +1,556 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import RLock
+
+import numpy as np
+
+from backend.chunk_reader import ParallelChunkReader, chunk_filters, default_executor
+from backend.file_pool import default_pool
+from backend.profiling import timed
+
+
+class DatasetReader:
+    """
+    Windowed access to the rows of an HDF5 dataset.
+
+    The dataset is borrowed from the FileHandlePool, so it stays open between
+    reads, and rows are read in blocks whose size is a multiple of the chunk
+    height, so every read maps onto whole chunks. The
+    most recently used blocks are kept in a bounded LRU cache, which keeps the
+    memory use constant whatever the length of the dataset.
+
+    Datasets with more than two dimensions (more than one for compound
+    datasets) are sliced instead of flattened: one axis is shown as rows, one
+    as columns, and every other axis is held at a single index. Only that 2-D
+    hyperslab is read, see `set_view`.
+
+    Compound datasets are read column by column: a block holds one array per
+    field, and only the fields of the active columns (the ones on screen) are
+    read, with `dataset.fields`. Numeric fields stay plain NumPy arrays and
+    strings are only decoded when a block column is formatted.
+
+    Contiguous, unfiltered datasets are read through a read-only memory map
+    instead of the HDF5 library, see `FileHandlePool.memmap`: columns read for
+    the graph, the statistics and exports are views of the page cache, and
+    only the blocks kept for the table are copied, so edits can be patched
+    into them. Large reads of compressed datasets decompress their chunks in
+    parallel, see `ParallelChunkReader`.
+    """
+
+    # Fields read for a compound dataset before the viewport reports its columns
+    INITIAL_FIELDS = 16
+
+    def __init__(self, filename, key_path, block_bytes=1024 * 1024, max_blocks=32, pool=None):
+        """
+        Initialize the DatasetReader object.
+
+        Args:
+            filename (str): Path to the HDF5 file.
+            key_path (str): Path of the dataset in the file.
+            block_bytes (int): Approximate size of one block of rows.
+            max_blocks (int): Number of blocks kept in memory.
+            pool (FileHandlePool): Source of file handles, defaults to the shared pool.
+        """
+        self.filename = filename
+        self.key_path = key_path
+        self.max_blocks = max_blocks
+        self.block_bytes = block_bytes
+        self.pool = pool or default_pool()
+        self._lock = RLock()  # Guards the block cache
+        self._blocks = OrderedDict()  # Block index -> rows
+        self._edits = {}  # Block index -> {(row offset, column): value} not saved yet
+        self._generation = 0  # Bumped when the view changes, so reads of the old view are dropped
+
+        with self.pool.dataset(self.filename, self.key_path) as dataset:
+            if dataset.ndim == 0:
+                raise ValueError("Scalar datasets cannot be displayed as a table.")
+            self.shape = dataset.shape
+            self.dtype = dataset.dtype
+            self.chunks = dataset.chunks
+            self._stored_columns = dataset.attrs.get('columns')
+            self._filters = chunk_filters(dataset)  # Pipeline of chunks decoded in parallel, None for h5py
+        self.fields = self.dtype.names
+
+        self.sliced = len(self.shape) > (1 if self.fields else 2)
+        self.row_axis = 0
+        self.column_axis = None  # Axis shown as columns when sliced; compound datasets use their fields
+        self.indexes = ()  # Index of every axis when sliced, display axes are ignored
+        if self.sliced:
+            if self.fields:
+                self.row_axis = len(self.shape) - 1
+            else:
+                self.row_axis, self.column_axis = len(self.shape) - 2, len(self.shape) - 1
+            self.indexes = (0,) * len(self.shape)
+        self.set_active_columns(range(min(self.INITIAL_FIELDS, len(self.fields or ()))))
+        self._configure()
+
+    def _configure(self):
+        """Derive the rows, columns and block size of the current view."""
+        self.row_count = self.shape[self.row_axis]
+
+        if self.fields:
+            self.columns = list(self.fields)
+            row_bytes = self.dtype.itemsize
+        elif self.sliced:
+            self.columns = [str(column) for column in range(self.shape[self.column_axis])]
+            row_bytes = self.dtype.itemsize * self.shape[self.column_axis]
+        else:
+            self.columns = [str(column) for column in range(int(np.prod(self.shape[1:])))]
+            row_bytes = self.dtype.itemsize * int(np.prod(self.shape[1:]))
+        stored_columns = self._stored_columns
+        if stored_columns is not None and len(stored_columns) == len(self.columns):
+            self.columns = [str(column) for column in stored_columns]
+        self.saved_columns = list(self.columns)  # Column names as stored in the file
+
+        self.row_bytes = max(1, row_bytes)
+        chunk_rows = self.row_chunk
+        rows = max(1, self.block_bytes // self.row_bytes)
+        self.block_rows = max(chunk_rows, (rows // chunk_rows) * chunk_rows)
+
+    @property
+    def row_chunk(self):
+        """Chunk size along the row axis, the natural read granularity."""
+        return self.chunks[self.row_axis] if self.chunks else 1
+
+    @property
+    def view(self):
+        """(row axis, column axis, indexes) of a sliced dataset, None otherwise."""
+        if not self.sliced:
+            return None
+        return self.row_axis, self.column_axis, self.indexes
+
+    def set_view(self, row_axis, column_axis=None, indexes=None):
+        """
+        Choose the 2-D hyperslab shown by a sliced dataset.
+
+        Args:
+            row_axis (int): Axis shown as rows.
+            column_axis (int): Axis shown as columns, None for compound datasets.
+            indexes (tuple): Index along every axis; the display axes are ignored.
+
+        Raises:
+            ValueError: If the dataset is not sliced, the view is invalid, or
+                there are unsaved edits or renames.
+        """
+        ndim = len(self.shape)
+        indexes = tuple(int(index) for index in (indexes if indexes is not None else self.indexes))
+        if not self.sliced:
+            raise ValueError("Only datasets with more than two dimensions can be sliced.")
+        if not 0 <= row_axis < ndim or (column_axis is None) != bool(self.fields) \
+                or (column_axis is not None and (not 0 <= column_axis < ndim or column_axis == row_axis)):
+            raise ValueError("Invalid display axes.")
+        if len(indexes) != ndim or any(not 0 <= index < size for index, size in zip(indexes, self.shape)):
+            raise ValueError("Slice index out of range.")
+        if self.has_edits or self.columns_changed:
+            raise ValueError("Save or discard the changes before changing the slice.")
+
+        with self._lock:
+            self._blocks.clear()
+            self._generation += 1
+            self.row_axis, self.column_axis, self.indexes = row_axis, column_axis, indexes
+            self._configure()
+
+    def refresh(self):
+        """
+        Pick up the rows appended to the dataset since it was opened, for a
+        file another process is writing, see `FileHandlePool.set_live`.
+
+        Only the dataset metadata is reloaded; the cached blocks are kept,
+        except the last one if it was partial.
+
+        Returns:
+            int: Number of rows appended.
+
+        Raises:
+            ValueError: If the dataset shrank or its columns changed.
+        """
+        with self.pool.dataset(self.filename, self.key_path) as dataset:
+            dataset.refresh()
+            shape = dataset.shape
+        if shape == self.shape:
+            return 0
+        if len(shape) != len(self.shape) or any(new < old for new, old in zip(shape, self.shape)):
+            raise ValueError("The dataset shrank, open it again.")
+        column_axes = [self.column_axis] if self.sliced else range(1, len(shape))
+        if any(shape[axis] != self.shape[axis] for axis in column_axes if axis is not None):
+            raise ValueError("The columns of the dataset changed, open it again.")
+
+        with self._lock:
+            row_count = self.row_count
+            self.shape = shape
+            self.row_count = shape[self.row_axis]
+            if row_count % self.block_rows:
+                self._blocks.pop(row_count // self.block_rows, None)
+                # A read of that block may still be running with the old row count
+                self._generation += 1
+        return self.row_count - row_count
+
+    def selection(self, start, stop, column=None):
+        """
+        Index of rows [start, stop) of the current view, for h5py.
+
+        Args:
+            column (int): Select a single column of a sliced dataset.
+        """
+        if not self.sliced:
+            return slice(start, stop)
+        selection = list(self.indexes)
+        selection[self.row_axis] = slice(start, stop)
+        if self.column_axis is not None:
+            selection[self.column_axis] = slice(None) if column is None else column
+        return tuple(selection)
+
+    def _as_rows(self, values):
+        """Rows of a hyperslab read with `selection`, as a 2-D view."""
+        if self.fields:
+            return values
+        if self.sliced:
+            return values.T if self.column_axis < self.row_axis else values
+        return values.reshape(len(values), -1)
+
+    @property
+    def column_count(self):
+        return len(self.columns)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the cached blocks."""
+        with self._lock:
+            if self.fields:
+                return sum(values.nbytes for block in self._blocks.values() for values in block.values())
+            return sum(block.nbytes for block in self._blocks.values())
+
+    @property
+    def active_columns(self):
+        """Columns of a compound dataset read into every block."""
+        return self._active_columns
+
+    @property
+    def active_fields(self):
+        """Field names of the active columns of a compound dataset."""
+        return self._active_fields
+
+    def set_active_columns(self, columns, keep=False):
+        """
+        Set the columns of a compound dataset to read, typically the visible ones.
+
+        Args:
+            columns (iterable): Column indexes.
+            keep (bool): Add to the active columns instead of replacing them.
+        """
+        columns = frozenset(column for column in columns if 0 <= column < len(self.fields or ()))
+        columns = (self._active_columns | columns) if keep else columns
+        # Assigned last and together, the prefetch thread reads them without the lock
+        self._active_fields = frozenset(self.fields[column] for column in columns)
+        self._active_columns = columns
+
+    def close(self):
+        """
+        Drop the cached blocks. The file handle belongs to the pool, which
+        closes it once it is idle.
+        """
+        with self._lock:
+            self._blocks.clear()
+
+    @contextmanager
+    def _source(self):
+        """
+        Borrow what the rows are read from: the memory map of the dataset if
+        it has one, a ParallelChunkReader if its chunks can be decoded here,
+        the h5py dataset otherwise. All take the same indexes.
+        """
+        mapped = self.pool.memmap(self.filename, self.key_path)
+        if mapped is not None:
+            yield mapped
+            return
+        with self.pool.dataset(self.filename, self.key_path) as dataset:
+            executor = default_executor() if self._filters is not None else None
+            yield ParallelChunkReader(dataset, self._filters, executor) if executor is not None else dataset
+
+    @staticmethod
+    def _fields(source, names):
+        """Some fields of a compound source, read by the next index."""
+        return source[names] if isinstance(source, np.ndarray) else source.fields(names)
+
+    def read_rows(self, start, stop, edits=False):
+        """
+        Read a range of rows straight from the file, as a 2-D array (or a
+        structured 1-D array for compound datasets). Rows of a memory-mapped
+        dataset are a read-only view, unless edits are applied.
+
+        Args:
+            edits (bool): Apply the pending edits to the rows read.
+        """
+        with timed('read', self.key_path) as timer, self._source() as source:
+            rows = source[self.selection(start, stop)]
+            timer.nbytes = rows.nbytes
+        if edits:
+            rows = np.array(rows)
+            self.apply_edits(rows, start)
+        return self._as_rows(rows)
+
+    def read_fields(self, start, stop, columns):
+        """
+        Read some fields of a compound dataset over a range of rows.
+
+        Returns:
+            dict: Field name -> 1-D array.
+        """
+        names = [self.fields[column] for column in sorted(columns)]
+        with timed('read', self.key_path) as timer, self._source() as source:
+            rows = self._fields(source, names)[self.selection(start, stop)]
+            timer.nbytes = rows.nbytes
+        return {name: rows[name] for name in names}
+
+    def read_indexed(self, rows, columns=None):
+        """
+        Read rows at arbitrary indexes, in the given order, with the pending
+        edits applied. The rows are read with a single point selection.
+
+        Args:
+            rows (np.ndarray): Row indexes, in any order.
+            columns (iterable): Columns of a compound dataset to read, defaults
+                to the active columns.
+
+        Returns:
+            np.ndarray: 2-D array of the rows. For compound datasets, a dict of
+            field arrays.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        unique, inverse = np.unique(rows, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        selection = unique
+        if self.sliced:
+            selection = list(self.selection(0, 1))
+            selection[self.row_axis] = unique
+            selection = tuple(selection)
+        with timed('read', self.key_path) as timer, self._source() as source:
+            if self.fields:
+                names = [self.fields[column] for column in sorted(self._active_columns if columns is None else columns)]
+                values = self._fields(source, names)[selection]
+                block = {name: values[name][inverse] for name in names}
+            else:
+                values = source[selection]
+                block = self._as_rows(values)[inverse]
+            timer.nbytes = values.nbytes
+
+        with self._lock:
+            edits = [(block_index * self.block_rows + offset, column, value)
+                     for block_index, block_edits in self._edits.items()
+                     for (offset, column), value in block_edits.items()]
+        if edits:
+            positions = {}
+            for position, row in enumerate(rows.tolist()):
+                positions.setdefault(row, []).append(position)
+            self._patch(block, {(position, column): value
+                                for row, column, value in edits for position in positions.get(row, ())})
+        return block
+
+    @property
+    def block_count(self):
+        return -(-self.row_count // self.block_rows)
+
+    def cached_block(self, block_index):
+        """
+        Return a block of rows if it is cached, without touching the file.
+
+        Args:
+            block_index (int): Index of the block, in units of `block_rows`.
+
+        Returns:
+            np.ndarray: Rows of the block, or None. For compound datasets, a
+            dict of field arrays, None unless it holds every active column.
+        """
+        with self._lock:
+            block = self._blocks.get(block_index)
+            if block is not None:
+                if self.fields and not self._active_fields <= block.keys():
+                    return None
+                self._blocks.move_to_end(block_index)
+            return block
+
+    def get_block(self, block_index):
+        """
+        Return a block of rows, reading it if it is not cached.
+
+        Args:
+            block_index (int): Index of the block, in units of `block_rows`.
+
+        Returns:
+            np.ndarray: Rows of the block. For compound datasets, a dict of
+            field arrays holding at least the active columns.
+        """
+        block = self.cached_block(block_index)
+        if block is not None:
+            return block
+
+        # The cache lock is not held while reading, so lookups from the GUI
+        # thread never wait for a background read
+        generation = self._generation
+        start = block_index * self.block_rows
+        stop = min(start + self.block_rows, self.row_count)
+        if self.fields:
+            with self._lock:
+                cached = self._blocks.get(block_index, {})
+            missing = [column for column in self._active_columns if self.fields[column] not in cached]
+            block = self.read_fields(start, stop, missing) if missing else {}
+            # Views of a memory map are copied, edits are patched into the cached blocks
+            block = {name: values if values.flags.writeable else np.array(values) for name, values in block.items()}
+        else:
+            block = self.read_rows(start, stop)
+            if not block.flags.writeable:
+                block = np.array(block)
+        with self._lock:
+            if generation != self._generation:
+                return self.get_block(block_index)
+            self._patch(block, self._edits.get(block_index, {}))
+            if self.fields:
+                # Merge the new fields into the fields already cached for the block
+                block = {**self._blocks.get(block_index, {}), **block}
+            self._blocks[block_index] = block
+            self._blocks.move_to_end(block_index)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+    def value(self, row, column):
+        """
+        Return a single cell, read through the block cache.
+        """
+        if self.fields:
+            self.set_active_columns([column], keep=True)
+        block = self.get_block(row // self.block_rows)
+        offset = row % self.block_rows
+        if self.fields:
+            return block[self.fields[column]][offset]
+        return block[offset, column]
+
+    def read_column(self, column, start=0, stop=None):
+        """
+        Read one column over a range of rows.
+
+        Args:
+            column (int): Column index.
+            start (int): First row.
+            stop (int): Row after the last one, defaults to the end.
+
+        Returns:
+            np.ndarray: 1-D array of the column values.
+        """
+        stop = self.row_count if stop is None else stop
+        with timed('read', self.key_path) as timer, self._source() as source:
+            if self.fields:
+                values = self._fields(source, self.fields[column])[self.selection(start, stop)]
+            elif self.sliced:
+                values = source[self.selection(start, stop, column)]
+            elif source.ndim == 1:
+                values = source[start:stop]
+            elif source.ndim == 2:
+                values = source[start:stop, column]
+            else:
+                values = source[start:stop].reshape(stop - start, -1)[:, column]
+            timer.nbytes = values.nbytes
+        return values
+
+    def _patch(self, rows, edits, first_offset=0):
+        """Write pending edits into rows (2-D view, structured array or dict of fields) in place."""
+        for (offset, column), value in edits.items():
+            offset -= first_offset
+            if self.fields:
+                field = self.fields[column]
+                values = rows.get(field) if isinstance(rows, dict) else rows[field]
+                if values is not None and 0 <= offset < len(values):
+                    values[offset] = value
+            elif 0 <= offset < len(rows):
+                rows[offset, column] = value
+
+    def _convert(self, column, value):
+        """Convert an edited value, typically text, to the dtype of its column."""
+        dtype = self.dtype[self.fields[column]] if self.fields else self.dtype
+        if dtype.kind == 'b' and isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes')
+        if dtype.kind == 'S' and isinstance(value, str):
+            value = value.encode()
+        return np.array(value).astype(dtype)[()]
+
+    def set_value(self, row, column, value):
+        """
+        Edit a cell. The edit is kept in memory until it is saved with HDF5File.write_changes.
+
+        Raises:
+            ValueError: If the value cannot be converted to the column dtype.
+        """
+        value = self._convert(column, value)
+        block_index, offset = divmod(row, self.block_rows)
+        with self._lock:
+            self._edits.setdefault(block_index, {})[(offset, column)] = value
+            block = self._blocks.get(block_index)
+            if block is not None:
+                self._patch(block, {(offset, column): value})
+
+    @property
+    def has_edits(self):
+        return bool(self._edits)
+
+    @property
+    def columns_changed(self):
+        return self.columns != self.saved_columns
+
+    def dirty_ranges(self, max_rows):
+        """
+        Row ranges holding edits, widened to whole chunks and merged when
+        contiguous, at most `max_rows` rows long.
+
+        Returns:
+            list: (start, stop) tuples in increasing order.
+        """
+        chunk_rows = self.row_chunk
+        max_rows = max(chunk_rows, (max_rows // chunk_rows) * chunk_rows)
+        with self._lock:
+            rows = sorted({block_index * self.block_rows + offset
+                           for block_index, edits in self._edits.items() for offset, _ in edits})
+        ranges = []
+        for row in rows:
+            start = (row // chunk_rows) * chunk_rows
+            stop = min(start + chunk_rows, self.row_count)
+            if ranges and start <= ranges[-1][1] and stop - ranges[-1][0] <= max_rows:
+                ranges[-1] = (ranges[-1][0], max(stop, ranges[-1][1]))
+            elif not ranges or start >= ranges[-1][1]:
+                ranges.append((start, stop))
+        return ranges
+
+    def apply_edits(self, rows, start):
+        """
+        Write the pending edits falling in a range of rows read from the file.
+
+        Args:
+            rows (np.ndarray): Rows as read from the dataset with `selection`, modified in place.
+            start (int): Index of the first row.
+        """
+        view = self._as_rows(rows)
+        with self._lock:
+            for block_index in range(start // self.block_rows, (start + len(view) - 1) // self.block_rows + 1):
+                self._patch(view, self._edits.get(block_index, {}), start - block_index * self.block_rows)
+
+    def mark_saved(self):
+        """
+        Forget the pending edits and renames once they are written to the file.
+        """
+        with self._lock:
+            self._edits.clear()
+        self.saved_columns = list(self.columns)
+
+    def discard_changes(self):
+        """
+        Drop the pending edits and renames.
+        """
+        with self._lock:
+            for block_index in self._edits:
+                self._blocks.pop(block_index, None)
+            self._edits.clear()
+        self.columns = list(self.saved_columns)
+
+    def rename_column(self, old_name, new_name):
+        # Like DataFrame.rename, unknown names are ignored
+        if old_name in self.columns:
+            self.columns[self.columns.index(old_name)] = new_name
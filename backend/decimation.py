@@ -0,0 +1,89 @@
+import numpy as np
+
+# Bytes of rows read per piece while decimating, rounded to whole chunks. Reading
+# one field of a compound dataset reads whole records, so pieces are sized by
+# the full row, and kept small because h5py holds the GIL during a read
+PIECE_BYTES = 8 * 1024 * 1024
+
+
+def minmax_envelope(read, start, stop, n_bins, piece_rows, should_stop=None):
+    """
+    Min/max envelope of a range of samples, streamed piece by piece.
+
+    The range is split into `n_bins` bins of consecutive samples and every bin
+    is reduced to its minimum and maximum, so no peak is lost however many
+    samples fall in one pixel column. Samples are read in pieces aligned to
+    `piece_rows`, so memory use is bounded by one piece. NaNs are ignored.
+
+    Args:
+        read (callable): read(start, stop) returns the samples of a range.
+        start (int): First sample.
+        stop (int): Sample after the last one.
+        n_bins (int): Number of bins, typically the pixel width of the plot.
+        piece_rows (int): Read granularity, a multiple of the chunk height.
+        should_stop (callable): Checked between pieces, returns True to cancel.
+
+    Returns:
+        tuple: (x, y) arrays, or None if cancelled. Ranges holding no more
+        than two samples per bin are returned as-is.
+    """
+    start, stop = max(0, int(start)), int(stop)
+    if stop <= start:
+        return np.empty(0), np.empty(0)
+    if stop - start <= 2 * n_bins:
+        return np.arange(start, stop), np.asarray(read(start, stop), dtype=np.float64)
+
+    edges = np.unique(np.linspace(start, stop, n_bins + 1).astype(np.int64))
+    mins = np.full(len(edges) - 1, np.nan)
+    maxs = np.full(len(edges) - 1, np.nan)
+
+    piece_start = start
+    while piece_start < stop:
+        if should_stop and should_stop():
+            return None
+        # Pieces end on multiples of piece_rows so each read covers whole chunks
+        piece_stop = min(stop, (piece_start // piece_rows + 1) * piece_rows)
+        values = np.asarray(read(piece_start, piece_stop), dtype=np.float64)
+
+        first_bin = np.searchsorted(edges, piece_start, side='right') - 1
+        last_bin = np.searchsorted(edges, piece_stop - 1, side='right') - 1
+        offsets = np.maximum(edges[first_bin:last_bin + 1] - piece_start, 0)
+        with np.errstate(invalid='ignore'):
+            bins = slice(first_bin, last_bin + 1)
+            mins[bins] = np.fmin(mins[bins], np.fmin.reduceat(values, offsets))
+            maxs[bins] = np.fmax(maxs[bins], np.fmax.reduceat(values, offsets))
+        piece_start = piece_stop
+
+    # Each bin is drawn as a vertical segment from its minimum to its maximum
+    x = np.repeat(edges[:-1], 2)
+    y = np.column_stack((mins, maxs)).ravel()
+    return x, y
+
+
+def column_envelope(dataset_model, column, start, stop, n_bins, pyramid=None, should_stop=None):
+    """
+    Min/max envelope of one column of a DatasetModel over [start, stop).
+
+    The coarsest usable level of the overview pyramid is used when one is
+    given; otherwise the column is streamed in chunk-aligned pieces.
+
+    Args:
+        dataset_model (DatasetModel): Source of the column.
+        column (int): Column index.
+        start (int): First sample.
+        stop (int): Sample after the last one.
+        n_bins (int): Number of bins, typically the pixel width of the plot.
+        pyramid (Pyramid): Overview pyramid of the column, optional.
+        should_stop (callable): Returns True to cancel a streamed envelope.
+
+    Returns:
+        tuple: (x, y) arrays, or None if cancelled.
+    """
+    if pyramid is not None:
+        envelope = pyramid.envelope(start, stop, n_bins)
+        if envelope is not None:
+            return envelope
+    chunk_rows = max(1, dataset_model.chunk_rows)
+    piece_rows = chunk_rows * max(1, PIECE_BYTES // dataset_model.row_bytes // chunk_rows)
+    read = lambda piece_start, piece_stop: dataset_model.read_column(column, piece_start, piece_stop)
+    return minmax_envelope(read, start, stop, n_bins, piece_rows, should_stop)
@@ -0,0 +1,192 @@
+import csv
+import os
+
+import numpy as np
+
+from backend.dataset_reader import DatasetReader
+from backend.formatting import format_values
+
+# Rows written per batch, in bytes of whole rows rounded to chunks
+BATCH_BYTES = 8 * 1024 * 1024
+# Rows per batch of a sorted or filtered selection, read with point selections
+MAX_INDEXED_ROWS = 65536
+
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.npy': 'npy'}
+
+
+def export_format(filename):
+    """
+    Return the export format of a file name from its extension.
+
+    Raises:
+        ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported export format '{extension}', use one of {', '.join(FORMATS)}.")
+    return FORMATS[extension]
+
+
+def _batches(reader: DatasetReader, rows=None):
+    """
+    Yield (first row, batch) over the rows of the current view, with the
+    pending edits applied. A batch is a 2-D array, or a dict of field arrays
+    for compound datasets.
+
+    Args:
+        rows (np.ndarray): Rows to export in this order, every row if None.
+    """
+    batch_rows = reader.row_chunk * max(1, BATCH_BYTES // reader.row_bytes // reader.row_chunk)
+    if rows is None:
+        for start in range(0, reader.row_count, batch_rows):
+            batch = reader.read_rows(start, min(start + batch_rows, reader.row_count), edits=True)
+            if reader.fields:
+                batch = {name: batch[name] for name in reader.fields}
+            yield start, batch
+    else:
+        batch_rows = min(batch_rows, MAX_INDEXED_ROWS)
+        for start in range(0, len(rows), batch_rows):
+            columns = range(len(reader.fields)) if reader.fields else None
+            yield start, reader.read_indexed(np.asarray(rows[start:start + batch_rows]), columns)
+
+
+def _columns(reader: DatasetReader, batch):
+    """1-D arrays of the columns of a batch."""
+    if reader.fields:
+        return [batch[name] for name in reader.fields]
+    return [batch[:, column] for column in range(batch.shape[1])]
+
+
+class _CsvWriter:
+    def __init__(self, file, reader: DatasetReader, row_count):
+        self.file = open(file, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(reader.columns)
+        self.reader = reader
+
+    def write(self, start, batch):
+        self.writer.writerows(zip(*(format_values(values) for values in _columns(self.reader, batch))))
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, file, reader: DatasetReader, row_count):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet export needs the pyarrow package.") from None
+        self.pyarrow = pyarrow
+        self.reader = reader
+        self.file = file
+        self.writer = None  # Created with the schema of the first batch
+        self.pq = pyarrow.parquet
+
+    def _array(self, values):
+        if values.dtype.kind in 'SO':
+            # Byte and variable-length strings are written as text
+            return self.pyarrow.array(format_values(values), type=self.pyarrow.string())
+        return self.pyarrow.array(values)
+
+    def write(self, start, batch):
+        table = self.pyarrow.Table.from_arrays([self._array(values) for values in _columns(self.reader, batch)],
+                                               names=[str(name) for name in self.reader.columns])
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.file, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            # No batch came, e.g. for an empty dataset: write the schema alone
+            if self.reader.fields:
+                empty = np.empty(0, dtype=self.reader.dtype)
+            else:
+                empty = np.empty((0, self.reader.column_count), dtype=self.reader.dtype)
+            self.write(0, empty)
+        self.writer.close()
+
+
+def _plain_dtype(dtype):
+    """The dtype without the metadata h5py attaches to strings, which .npy files do not store."""
+    if dtype.names is None:
+        return np.dtype((dtype.base.str, dtype.shape)) if dtype.shape else np.dtype(dtype.str)
+    return np.dtype({
+        'names': list(dtype.names),
+        'formats': [_plain_dtype(dtype[name]) for name in dtype.names],
+        'offsets': [dtype.fields[name][1] for name in dtype.names],
+        'itemsize': dtype.itemsize,
+    })
+
+
+class _NpyWriter:
+    def __init__(self, file, reader: DatasetReader, row_count):
+        if reader.fields:
+            shape = (row_count,)
+        else:
+            shape = (row_count, reader.column_count)
+        dtype = _plain_dtype(reader.dtype)
+        if dtype.hasobject:
+            raise ValueError("Variable-length data cannot be exported to .npy, use CSV or Parquet.")
+        self.reader = reader
+        # The header holds the final shape, the rows are written through a memory map
+        self.array = np.lib.format.open_memmap(file, mode='w+', dtype=dtype, shape=shape)
+
+    def write(self, start, batch):
+        if self.reader.fields:
+            for name in self.reader.fields:
+                self.array[name][start:start + len(batch[name])] = batch[name]
+        else:
+            self.array[start:start + len(batch)] = batch
+        self.array.flush()
+
+    def close(self):
+        self.array.flush()
+        del self.array
+
+
+WRITERS = {'csv': _CsvWriter, 'parquet': _ParquetWriter, 'npy': _NpyWriter}
+
+
+def export_dataset(reader: DatasetReader, filename, rows=None, progress=None, should_stop=None):
+    """
+    Stream the rows of a dataset, or of a selection of them, to a CSV,
+    Parquet or .npy file.
+
+    Rows are read and written in chunk-aligned batches of about BATCH_BYTES,
+    so the memory use does not depend on the size of the dataset. The view of
+    a sliced dataset and the pending edits are exported as shown. The file is
+    written under a temporary name and only appears once complete.
+
+    Args:
+        reader (DatasetReader): Dataset to export, in its current view.
+        filename (str): Output file; the format follows its extension, see `export_format`.
+        rows (np.ndarray): Rows to export in this order, e.g. a sort or filter result.
+        progress (callable): Called with the percentage done.
+        should_stop (callable): Returns True to cancel.
+
+    Returns:
+        bool: True once exported, False if cancelled.
+    """
+    writer_class = WRITERS[export_format(filename)]
+    row_count = reader.row_count if rows is None else len(rows)
+    partial = f"{filename}.partial"
+    writer = writer_class(partial, reader, row_count)
+    try:
+        for start, batch in _batches(reader, rows):
+            if should_stop and should_stop():
+                return False
+            writer.write(start, batch)
+            if progress:
+                batch_length = len(next(iter(batch.values()))) if isinstance(batch, dict) else len(batch)
+                progress(int(100 * (start + batch_length) / max(row_count, 1)))
+        writer.close()
+        writer = None
+        os.replace(partial, filename)
+        return True
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(partial):
+            os.remove(partial)
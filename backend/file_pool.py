@@ -0,0 +1,313 @@
+import os
+import time
+from contextlib import contextmanager
+from threading import Condition, Event, Thread
+
+import h5py
+import numpy as np
+
+
+def map_dataset(filename, dataset):
+    """
+    Memory-map the payload of a dataset stored as one contiguous, unfiltered
+    block of the file, in the layout of its NumPy dtype.
+
+    Reads through the map are served by the OS page cache without going
+    through the HDF5 library, and slicing the map copies nothing.
+
+    Args:
+        filename (str): Path to the HDF5 file, opened with the default driver.
+        dataset (h5py.Dataset): The dataset.
+
+    Returns:
+        np.memmap: Read-only map with the shape of the dataset, or None if the
+        dataset is chunked, external, not allocated yet, or stored in a type
+        NumPy cannot read in place (e.g. variable-length strings).
+    """
+    dsid = dataset.id
+    dcpl = dsid.get_create_plist()
+    if dataset.file.driver != 'sec2' or dcpl.get_layout() != h5py.h5d.CONTIGUOUS or dcpl.get_external_count():
+        return None
+    dtype = dataset.dtype
+    size = dtype.itemsize * int(np.prod(dataset.shape))
+    if dtype.hasobject or size == 0 or dsid.get_storage_size() != size:
+        return None
+    # The file type must be byte for byte the NumPy dtype: same order, padding and member offsets
+    if dsid.get_type() != h5py.h5t.py_create(dtype):
+        return None
+    offset = dsid.get_offset()
+    if offset is None or offset + size > os.path.getsize(filename):
+        return None
+    return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=dataset.shape)
+
+
+class _Handle:
+    """A pooled read handle and the datasets opened through it."""
+
+    __slots__ = ('file', 'datasets', 'maps', 'users', 'last_used', 'stat', 'swmr')
+
+    def __init__(self, h5file, stat, swmr=False):
+        self.file = h5file
+        self.datasets = {}  # Key path -> h5py.Dataset, kept open to keep their chunk cache
+        self.maps = {}  # Key path -> np.memmap of the dataset, or None if it cannot be mapped
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.stat = stat
+        self.swmr = swmr  # Opened in SWMR read mode
+
+
+class FileHandlePool:
+    """
+    Shared, persistent h5py file handles.
+
+    Each file gets one read-only handle, opened with a configurable chunk
+    cache and kept open between accesses, so its B-trees and decompressed
+    chunks are not thrown away on every read. Datasets opened through the pool
+    stay open for the same reason. Saving switches the file to a write handle
+    for the duration of the save; readers from other threads wait meanwhile.
+    Handles unused for `idle_timeout` seconds are closed by a background
+    thread, and a handle is reopened when the file changed on disk.
+
+    Contiguous, unfiltered datasets are also memory-mapped, see `memmap`.
+
+    Files another process is appending to are opened in SWMR read mode once
+    marked live with `set_live`; their handles are kept open as the file grows,
+    and datasets pick up the new rows with `h5py.Dataset.refresh`.
+    """
+
+    def __init__(self, rdcc_nbytes=64 * 1024 * 1024, rdcc_nslots=100003, rdcc_w0=0.75, idle_timeout=120.0):
+        """
+        Initialize the FileHandlePool object.
+
+        Args:
+            rdcc_nbytes (int): Size of the chunk cache of each dataset.
+            rdcc_nslots (int): Number of chunk slots in the cache hash table, ideally a prime.
+            rdcc_w0 (float): Chunk preemption policy, between 0 and 1.
+            idle_timeout (float): Seconds after which an unused handle is closed.
+        """
+        self.rdcc_nbytes = rdcc_nbytes
+        self.rdcc_nslots = rdcc_nslots
+        self.rdcc_w0 = rdcc_w0
+        self.idle_timeout = idle_timeout
+        self._handles = {}  # Absolute path -> _Handle
+        self._writers = set()  # Absolute paths open for writing
+        self._live = set()  # Absolute paths opened in SWMR read mode
+        self._condition = Condition()
+        self._stopped = Event()
+        self._reaper = None
+
+    def _open_options(self):
+        return dict(rdcc_nbytes=self.rdcc_nbytes, rdcc_nslots=self.rdcc_nslots, rdcc_w0=self.rdcc_w0)
+
+    @staticmethod
+    def _stat(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _acquire(self, path):
+        with self._condition:
+            while path in self._writers:
+                self._condition.wait()
+            handle = self._handles.get(path)
+            stat = self._stat(path)
+            live = path in self._live
+            if handle is not None and handle.users == 0:
+                # Live handles stay open as the file grows, but must be SWMR readers
+                if (not handle.swmr) if live else handle.stat != stat:
+                    self._close_handle(path)
+                    handle = None
+            if handle is None:
+                handle = self._open(path, stat, live)
+                self._handles[path] = handle
+                self._start_reaper()
+            handle.users += 1
+            return handle
+
+    def _open(self, path, stat, swmr):
+        try:
+            return _Handle(h5py.File(path, 'r', swmr=swmr, **self._open_options()), stat, swmr)
+        except OSError:
+            if swmr:
+                raise
+            # A file being written in SWMR mode can only be opened by SWMR readers
+            return _Handle(h5py.File(path, 'r', swmr=True, **self._open_options()), stat, True)
+
+    def _release(self, handle):
+        with self._condition:
+            handle.users -= 1
+            handle.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    def _close_handle(self, path):
+        handle = self._handles.pop(path, None)
+        if handle is not None:
+            handle.datasets.clear()
+            # Arrays still viewing a map keep it alive, the file is only unmapped once they are gone
+            handle.maps.clear()
+            handle.file.close()
+
+    def set_live(self, filename, live=True):
+        """
+        Follow a file that another process appends to, or stop following it.
+
+        The handle of a live file is opened in SWMR read mode and is not
+        reopened when the file changes on disk. The switch happens the next
+        time the handle is borrowed while nobody else uses it. Once not live,
+        the handle is reopened as soon as the file changed, like any other.
+
+        Args:
+            filename (str): Path to the HDF5 file.
+            live (bool): Follow the file.
+        """
+        path = os.path.abspath(filename)
+        with self._condition:
+            if live:
+                self._live.add(path)
+            else:
+                self._live.discard(path)
+            handle = self._handles.get(path)
+            if live and handle is not None and handle.users == 0 and not handle.swmr:
+                self._close_handle(path)
+
+    def is_live(self, filename):
+        return os.path.abspath(filename) in self._live
+
+    @contextmanager
+    def read(self, filename):
+        """
+        Borrow the shared read handle of a file.
+
+        Yields:
+            h5py.File: Read-only file, left open after the block.
+        """
+        handle = self._acquire(os.path.abspath(filename))
+        try:
+            yield handle.file
+        finally:
+            self._release(handle)
+
+    @contextmanager
+    def dataset(self, filename, key_path):
+        """
+        Borrow an open dataset from the shared read handle of its file.
+
+        Yields:
+            h5py.Dataset: The dataset, left open after the block.
+
+        Raises:
+            KeyError: If the path does not exist.
+            ValueError: If the path is not a dataset.
+        """
+        handle = self._acquire(os.path.abspath(filename))
+        try:
+            with self._condition:
+                dataset = self._dataset(handle, key_path)
+            yield dataset
+        finally:
+            self._release(handle)
+
+    @staticmethod
+    def _dataset(handle, key_path):
+        dataset = handle.datasets.get(key_path)
+        if dataset is None:
+            if key_path not in handle.file:
+                raise KeyError(f"Key '{key_path}' not found in HDF5 file.")
+            dataset = handle.file[key_path]
+            if not isinstance(dataset, h5py.Dataset):
+                raise ValueError("Path does not point to a dataset.")
+            handle.datasets[key_path] = dataset
+        return dataset
+
+    def memmap(self, filename, key_path):
+        """
+        Return the read-only memory map of a contiguous, unfiltered dataset,
+        see `map_dataset`. The map is created once per file handle and stays
+        valid after the handle is closed; it is dropped with the handle, so a
+        file changed on disk is mapped again.
+
+        Returns:
+            np.memmap: The map, or None if the dataset cannot be mapped.
+
+        Raises:
+            KeyError: If the path does not exist.
+            ValueError: If the path is not a dataset.
+        """
+        path = os.path.abspath(filename)
+        handle = self._acquire(path)
+        try:
+            with self._condition:
+                if key_path not in handle.maps:
+                    handle.maps[key_path] = map_dataset(path, self._dataset(handle, key_path))
+                return handle.maps[key_path]
+        finally:
+            self._release(handle)
+
+    @contextmanager
+    def write(self, filename):
+        """
+        Open a file for writing, closing its read handle first.
+
+        Must not be used by a thread that currently borrows a read handle of
+        the same file.
+
+        Yields:
+            h5py.File: File opened in append mode, closed after the block.
+        """
+        path = os.path.abspath(filename)
+        with self._condition:
+            while path in self._writers:
+                self._condition.wait()
+            self._writers.add(path)
+            while path in self._handles and self._handles[path].users:
+                self._condition.wait()
+            self._close_handle(path)
+        try:
+            with h5py.File(path, 'a', **self._open_options()) as h5file:
+                yield h5file
+        finally:
+            with self._condition:
+                self._writers.discard(path)
+                self._condition.notify_all()
+
+    def close_idle(self):
+        """
+        Close the handles nobody used for `idle_timeout` seconds.
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        with self._condition:
+            for path, handle in list(self._handles.items()):
+                if handle.users == 0 and handle.last_used < deadline:
+                    self._close_handle(path)
+
+    def close_all(self):
+        """
+        Close every handle that is not in use and stop the idle reaper.
+        """
+        self._stopped.set()
+        with self._condition:
+            for path, handle in list(self._handles.items()):
+                if handle.users == 0:
+                    self._close_handle(path)
+
+    def _start_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._stopped.clear()
+            self._reaper = Thread(target=self._reap, name='FileHandlePool reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while not self._stopped.wait(max(1.0, self.idle_timeout / 4)):
+            self.close_idle()
+
+
+_default_pool = None
+
+
+def default_pool():
+    """
+    Return the pool shared by the whole application.
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = FileHandlePool()
+    return _default_pool
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.profiling import timed
+
+
+def format_values(values):
+    """
+    Format a 1-D array of cell values as display strings in one vectorized pass.
+
+    Numeric, boolean and date values give the same text as `str(value)`; byte
+    strings are decoded as UTF-8.
+
+    Args:
+        values (np.ndarray): Values of one column over a block of rows.
+
+    Returns:
+        list: One Python string per value.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'S':
+        return np.char.decode(values, 'utf-8', 'replace').tolist()
+    if values.dtype.kind in 'biufcUMm':
+        return values.astype(str).tolist()
+    return [value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value) for value in values]
+
+
+class FormatCache:
+    """
+    LRU cache of formatted cells, one entry per (block, segment, column).
+
+    Columns are formatted when one of their cells is first painted, so only the
+    visible columns of a wide table are ever formatted. Large blocks are
+    formatted in segments of a few rows around the painted cells, and the cache
+    is bounded by the number of cells it holds, not by its number of entries.
+    """
+
+    def __init__(self, max_cells=1_000_000):
+        """
+        Initialize the FormatCache object.
+
+        Args:
+            max_cells (int): Number of formatted cells kept in memory.
+        """
+        self.max_cells = max_cells
+        self._entries = OrderedDict()  # (block index, segment, column) -> list of strings
+        self._cells = 0
+
+    def get(self, block_index, column, values, segment=0):
+        """
+        Return the formatted cells of a block column, formatting them on a miss.
+
+        Args:
+            block_index (int): Index of the row block.
+            column (int): Column index.
+            values (callable): Returns the raw values of the block column, or of the segment.
+            segment (int): Segment of the block, for blocks formatted in parts.
+
+        Returns:
+            list: Formatted cells of the block column, or of the segment.
+        """
+        key = (block_index, segment, column)
+        strings = self._entries.get(key)
+        if strings is not None:
+            self._entries.move_to_end(key)
+            return strings
+
+        column_values = values()
+        with timed('format', f'block {block_index}, segment {segment}, column {column}') as timer:
+            strings = format_values(column_values)
+            timer.nbytes = np.asarray(column_values).nbytes
+        self._entries[key] = strings
+        self._cells += len(strings)
+        # The entry just formatted is kept even if it is larger than the budget
+        while self._cells > self.max_cells and len(self._entries) > 1:
+            self._cells -= len(self._entries.popitem(last=False)[1])
+        return strings
+
+    def invalidate(self, block_index=None):
+        """
+        Drop the formatted cells of a block, or of every block.
+        """
+        if block_index is None:
+            self._entries.clear()
+            self._cells = 0
+            return
+        for key in [key for key in self._entries if key[0] == block_index]:
+            self._cells -= len(self._entries.pop(key))
@@ -1,25 +1,52 @@
-import h5py
-import pandas as pd
-from PyQt5.QtCore import QThread, pyqtSignal
+from threading import Event
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, pyqtSignal
 from PyQt5.QtWidgets import QMessageBox
 
+from backend.compare import compare_datasets, compare_files
 from backend.dataset_model import DatasetModel
+from backend.dataset_reader import DatasetReader
+from backend.decimation import column_envelope
+from backend.export import export_dataset
+from backend.file_pool import default_pool
+from backend.hdf5_file import HDF5File
+from backend.path_index import PathIndex
+from backend.profiling import timed
+from backend.pyramid import Pyramid, build_pyramid
+from backend.row_index import build_row_index
+from backend.statistics import compute_statistics
 
 
 class HDF5Data(QThread):
-    metadata_loaded = pyqtSignal(dict)  # Emits metadata for the QTreeWidget
+    """
+    Loads the metadata of an HDF5 file on a separate thread for the viewer.
+    File operations are done by an HDF5File, which does not depend on Qt.
+    """
+
+    metadata_loaded = pyqtSignal(object)  # Emits metadata for the QTreeWidget
     error_occurred = pyqtSignal(str)  # Emits error messages
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, lazy=True, cache=None, pool=None, dataset_cache=None):
         """
         Initialize the HDF5Data object.
 
         Args:
             filename (str): Path to the HDF5 file.
+            lazy (bool): Only list the root level at open time; sub-groups are
+                listed on demand with a GroupLoader.
+            cache (MetadataCache): Persistent metadata index, optional.
+            pool (FileHandlePool): Source of file handles, defaults to the shared pool.
+            dataset_cache (DatasetCache): Recently viewed datasets, optional.
         """
         super().__init__()
         self.filename = filename
+        self.lazy = lazy
+        self.cache = cache
+        self.pool = pool or default_pool()
+        self.dataset_cache = dataset_cache
+        self.file = HDF5File(filename, cache=cache, pool=self.pool, dataset_cache=dataset_cache)  # Qt-free operations
         self.metadata = {}  # Store metadata here
+        self.path_index = None  # PathIndex of the metadata, built with it
 
     def run(self):
         """
@@ -29,103 +56,430 @@ class HDF5Data(QThread):
             if not self.filename:
                 raise ValueError("Filename not provided.")
             self.metadata = self._load_metadata()  # Store metadata
+            # Index the paths here, so searching and clicking in the tree never walk the metadata
+            self.path_index = PathIndex(self.metadata)
+            self.path_index.prepare()
             self.metadata_loaded.emit(self.metadata)  # Emit metadata to the app
         except Exception as e:
             self.error_occurred.emit(str(e))
 
-    def _load_metadata(self):
+    def get_metadata(self):
         """
-        Load metadata (groups and datasets) for the HDF5 file.
+        Get the stored metadata.
 
         Returns:
-            dict: Metadata representing the structure of the HDF5 file.
+            dict: The metadata dictionary.
+        """
+        if not self.metadata:
+            raise ValueError("Metadata has not been loaded yet.")
+        return self.metadata
+
+    def _load_metadata(self):
+        return self.file.load_metadata(self.lazy)
+
+    def get_by_key(self, key_path):
+        """
+        Get a specific dataset or group from the HDF5 file by its key, see `HDF5File.get_by_key`.
+        """
+        return self.file.get_by_key(key_path)
+
+    def open_dataset(self, key_path):
+        """
+        Open a dataset for windowed reading, see `HDF5File.open_dataset`.
+        """
+        return self.file.open_dataset(key_path)
+
+    def update_dataset(self, datasetModel: DatasetModel):
+        """
+        Write the changes of a dataset model back to the HDF5 file, see
+        `HDF5File.write_changes`. Errors are reported in a message box.
         """
-        metadata = {}
+        try:
+            self.file.write_changes(datasetModel)
+        except Exception as e:
+            QMessageBox.warning(None, 'update_dataset failed', str(e))
 
-        with h5py.File(self.filename, 'r') as h5file:
-            self._process_group(h5file, '/', metadata)
 
-        return metadata
+class GroupLoader(QThread):
+    children_loaded = pyqtSignal(str, object)  # Emits the group path and its children metadata
+    error_occurred = pyqtSignal(str)  # Emits error messages
 
-    def _process_group(self, h5file, path, metadata):
+    def __init__(self, filename, path, cache=None, pool=None):
         """
-        Recursively process an HDF5 group to extract metadata.
+        Initialize the GroupLoader object.
 
         Args:
-            h5file (h5py.File): Open HDF5 file object.
-            path (str): Current group path.
-            metadata (dict): Dictionary to store metadata.
-        """
-        for key in h5file[path].keys():
-            item_path = f"{path}{key}"
-            if isinstance(h5file[item_path], h5py.Group):
-                # Add group to metadata and recurse
-                metadata[key] = {"Type": "Group", "Path": item_path, "Children": {}}
-                self._process_group(h5file, f"{item_path}/", metadata[key]["Children"])
-            elif isinstance(h5file[item_path], h5py.Dataset):
-                # Add dataset to metadata
-                metadata[key] = {"Type": "Dataset", "Path": item_path}
+            filename (str): Path to the HDF5 file.
+            path (str): Path of the group to list.
+            cache (MetadataCache): Persistent metadata index, optional.
+            pool (FileHandlePool): Source of file handles, defaults to the shared pool.
+        """
+        super().__init__()
+        self.filename = filename
+        self.path = path
+        self.cache = cache
+        self.pool = pool or default_pool()
 
-    def get_metadata(self):
+    def run(self):
         """
-        Get the stored metadata.
+        List the children of the group in a separate thread.
+        """
+        try:
+            children = HDF5File(self.filename, cache=self.cache, pool=self.pool).list_group(self.path)
+            self.children_loaded.emit(self.path, children)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
 
-        Returns:
-            dict: The metadata dictionary.
+
+class PyramidBuilder(QThread):
+    progress = pyqtSignal(int)  # Emits the percentage done
+    pyramid_built = pyqtSignal(str, int)  # Emits the dataset path and column of the finished pyramid
+    error_occurred = pyqtSignal(str)  # Emits error messages
+
+    def __init__(self, filename, key_path, column):
         """
-        if not self.metadata:
-            raise ValueError("Metadata has not been loaded yet.")
-        return self.metadata
+        Initialize the PyramidBuilder object.
 
-    def get_by_key(self, key_path):
+        Args:
+            filename (str): Path to the HDF5 file.
+            key_path (str): Path of the dataset in the file.
+            column (int): Column index.
+        """
+        super().__init__()
+        self.filename = filename
+        self.key_path = key_path
+        self.column = column
+
+    def run(self):
+        """
+        Build the overview pyramid of the column in a separate thread.
         """
-        Get a specific dataset or group from the HDF5 file by its key.
+        try:
+            if build_pyramid(self.filename, self.key_path, self.column,
+                             progress=self.progress.emit, should_stop=self.isInterruptionRequested):
+                self.pyramid_built.emit(self.key_path, self.column)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+
+class StatisticsWorker(QThread):
+    progress = pyqtSignal(int)  # Emits the percentage done
+    statistics_ready = pyqtSignal(str, object, object)  # Emits the dataset path, its slice and the ColumnStats list
+    error_occurred = pyqtSignal(str)  # Emits error messages
+
+    def __init__(self, filename, key_path, view=None, cache=None):
+        """
+        Initialize the StatisticsWorker object.
 
         Args:
-            key_path (str): Full path to the dataset or group.
+            filename (str): Path to the HDF5 file.
+            key_path (str): Path of the dataset in the file.
+            view (tuple): Slice of an N-D dataset, see `DatasetReader.set_view`.
+            cache (StatisticsCache): Where to store the result, optional.
+        """
+        super().__init__()
+        self.filename = filename
+        self.key_path = key_path
+        self.view = view
+        self.cache = cache
 
-        Returns:
-            object: Dataset or group data.
-        """
-        if not self.filename:
-            raise ValueError("Filename not provided.")
-        with h5py.File(self.filename, 'r') as h5file:
-            if key_path in h5file:
-                dataset = h5file[key_path]
-                if isinstance(dataset, h5py.Dataset):
-                    if 'columns' in dataset.attrs:
-                        columns = dataset.attrs['columns']
-                        return DatasetModel(key_path, pd.DataFrame(dataset[()], columns=columns))
-                    return DatasetModel(key_path, pd.DataFrame(dataset[()]))
-                else:
-                    raise ValueError("Path does not point to a dataset.")
+    def run(self):
+        """
+        Compute the column statistics in the process pool, waiting in a separate thread.
+        """
+        try:
+            columns = compute_statistics(self.filename, self.key_path, self.view,
+                                         progress=self.progress.emit, should_stop=self.isInterruptionRequested)
+            if columns is None:
+                return
+            if self.cache is not None:
+                try:
+                    self.cache.put(self.filename, self.key_path, columns, self.view)
+                except Exception as e:
+                    print(f'Error updating statistics cache: {e}')
+            self.statistics_ready.emit(self.key_path, self.view, columns)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+
+class RowIndexWorker(QThread):
+    progress = pyqtSignal(int)  # Emits the percentage done
+    row_index_ready = pyqtSignal(object)  # Emits the row indexes in display order, or None for the file order
+    error_occurred = pyqtSignal(str)  # Emits error messages
+
+    def __init__(self, reader: DatasetReader, sort_column=None, descending=False, expression=None, cache=None):
+        """
+        Initialize the RowIndexWorker object.
+
+        Args:
+            reader (DatasetReader): Dataset to sort and filter.
+            sort_column (int): Column to sort by, None to keep the file order.
+            descending (bool): Sort in descending order.
+            expression (str): Filter expression, see `filter_rows`.
+            cache (SortIndexCache): Persisted sort permutations, optional.
+        """
+        super().__init__()
+        self.reader = reader
+        self.sort_column = sort_column
+        self.descending = descending
+        self.expression = expression
+        self.cache = cache
+
+    def run(self):
+        """
+        Sort and filter the rows in the background.
+        """
+        try:
+            rows = build_row_index(self.reader, self.sort_column, self.descending, self.expression, self.cache,
+                                   progress=self.progress.emit, should_stop=self.isInterruptionRequested)
+            if not self.isInterruptionRequested():
+                self.row_index_ready.emit(rows)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+
+class ExportWorker(QThread):
+    progress = pyqtSignal(int)  # Emits the percentage done
+    export_finished = pyqtSignal(str)  # Emits the path of the exported file
+    error_occurred = pyqtSignal(str)  # Emits error messages
+
+    def __init__(self, reader: DatasetReader, filename, rows=None):
+        """
+        Initialize the ExportWorker object.
+
+        Args:
+            reader (DatasetReader): Dataset to export, in its current view.
+            filename (str): Output file, CSV, Parquet or .npy.
+            rows (np.ndarray): Rows to export in this order, every row if None.
+        """
+        super().__init__()
+        if not reader.has_edits and not reader.columns_changed:
+            # A reader of its own keeps exporting this slice if the table shows another one meanwhile.
+            # Pending changes block slice changes, so a reader holding some is used as is.
+            view = reader.view
+            reader = DatasetReader(reader.filename, reader.key_path, pool=reader.pool)
+            if view is not None:
+                reader.set_view(*view)
+        self.reader = reader
+        self.filename = filename
+        self.rows = rows
+
+    def run(self):
+        """
+        Stream the rows to the output file in the background.
+        """
+        try:
+            if export_dataset(self.reader, self.filename, self.rows,
+                              progress=self.progress.emit, should_stop=self.isInterruptionRequested):
+                self.export_finished.emit(self.filename)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+
+class CompareWorker(QThread):
+    progress = pyqtSignal(int)  # Emits the percentage done
+    comparison_ready = pyqtSignal(object)  # Emits the Comparison
+    error_occurred = pyqtSignal(str)  # Emits error messages
+
+    def __init__(self, filename, other_filename, key_path=None, other_key_path=None, view=None):
+        """
+        Initialize the CompareWorker object.
+
+        Args:
+            filename (str): Path to the first HDF5 file.
+            other_filename (str): Path to the second HDF5 file.
+            key_path (str): Dataset to compare, None to compare the whole files.
+            other_key_path (str): Dataset of the second file, defaults to `key_path`.
+            view (tuple): Slice of N-D datasets, see `DatasetReader.set_view`.
+        """
+        super().__init__()
+        self.filename = filename
+        self.other_filename = other_filename
+        self.key_path = key_path
+        self.other_key_path = other_key_path or key_path
+        self.view = view
+
+    def run(self):
+        """
+        Compare in the process pool, waiting in a separate thread.
+        """
+        try:
+            if self.key_path is None:
+                comparison = compare_files(self.filename, self.other_filename,
+                                           progress=self.progress.emit, should_stop=self.isInterruptionRequested)
             else:
-                raise KeyError(f"Key '{key_path}' not found in HDF5 file.")
+                comparison = compare_datasets(self.filename, self.key_path, self.other_filename, self.other_key_path,
+                                              self.view, progress=self.progress.emit,
+                                              should_stop=self.isInterruptionRequested)
+            if comparison is not None:
+                self.comparison_ready.emit(comparison)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
 
 
-    def update_dataset(self, datasetModel: DatasetModel):
+class LiveTail(QThread):
+    rows_appended = pyqtSignal(int, int)  # Emits the previous and the new row count
+    error_occurred = pyqtSignal(str)  # Emits error messages
+
+    def __init__(self, reader: DatasetReader, interval=1000):
         """
-        Update a specific dataset in the HDF5 file and in the in-memory data.
+        Initialize the LiveTail object.
 
         Args:
-            key_path (str): Dot-separated path to the dataset to update.
-            data (pd.DataFrame): The updated data to write back.
+            reader (DatasetReader): Dataset of a live file, see `FileHandlePool.set_live`.
+            interval (int): Milliseconds between two polls.
+        """
+        super().__init__()
+        self.reader = reader
+        self.interval = interval
+
+    def run(self):
+        """
+        Poll the dataset for appended rows in a separate thread, until interrupted.
+        Only the dataset metadata is read here; the new rows are read by whoever shows them.
+        """
+        while not self.isInterruptionRequested():
+            try:
+                row_count = self.reader.row_count
+                if self.reader.refresh():
+                    self.rows_appended.emit(row_count, self.reader.row_count)
+            except Exception as e:
+                self.error_occurred.emit(str(e))
+                return
+            # Sleep in short steps, so stopping the tail does not wait a whole interval
+            for _ in range(max(1, self.interval // 50)):
+                if self.isInterruptionRequested():
+                    return
+                self.msleep(min(50, self.interval))
+
+
+class DatasetLoaderSignals(QObject):
+    loaded = pyqtSignal(int, object, object)  # Emits the request id, the DatasetModel and the cached envelope or None
+    envelope_ready = pyqtSignal(int, object)  # Emits the request id and the first column envelope
+    error_occurred = pyqtSignal(int, str)  # Emits the request id and the error message
 
-        Raises:
-            KeyError: If the dataset path does not exist in the HDF5 file.
+
+class DatasetLoader(QRunnable):
+    """
+    Open a dataset on a worker thread of a QThreadPool.
+
+    Besides opening the dataset, the loader reads the first block of rows and
+    the full-range envelope of the first column, so the table and the graph
+    can show the dataset without touching the file on the GUI thread. The
+    model is delivered as soon as the first block is read; the envelope,
+    which streams the whole column, follows with `envelope_ready` unless it
+    was in the dataset cache. A cancelled loader stops between steps and
+    delivers nothing more.
+    """
+
+    def __init__(self, data: HDF5Data, key_path, request_id, n_bins):
         """
+        Initialize the DatasetLoader object.
+
+        Args:
+            data (HDF5Data): File the dataset belongs to.
+            key_path (str): Path of the dataset in the file.
+            request_id (int): Identifies the request, echoed in the signals.
+            n_bins (int): Number of bins of the first column envelope.
+        """
+        super().__init__()
+        self.signals = DatasetLoaderSignals()
+        self.data = data
+        self.key_path = key_path
+        self.request_id = request_id
+        self.n_bins = n_bins
+        self._cancelled = Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        model = None
         try:
-            keys = datasetModel.keypath.split('.')
-            dataset_path = '/' + '/'.join(keys)
+            cache = self.data.dataset_cache
+            model = self.data.open_dataset(self.key_path)
+            envelope = None
+            if not model.empty and not self.is_cancelled():
+                model.reader.get_block(0)
+            if not model.empty and cache is not None:
+                envelope = cache.get_envelope(self.data.filename, self.key_path, self.n_bins, model.view)
+            if self.is_cancelled():
+                if cache is None:
+                    model.close()
+                return
+            self.signals.loaded.emit(self.request_id, model, envelope)
+            if model.empty or envelope is not None:
+                return
+
+            # Pyramids are built for the columns of unsliced datasets only
+            pyramid = Pyramid.open(self.data.filename, self.key_path, 0) if model.view is None else None
+            envelope = column_envelope(model, 0, 0, model.row_count, self.n_bins, pyramid, self.is_cancelled)
+            if envelope is None:
+                return
+            if cache is not None:
+                cache.put_envelope(self.data.filename, self.key_path, self.n_bins, envelope, model.view)
+            if not self.is_cancelled():
+                self.signals.envelope_ready.emit(self.request_id, envelope)
+        except Exception as e:
+            if model is not None and self.data.dataset_cache is None:
+                model.close()
+            if not self.is_cancelled():
+                self.signals.error_occurred.emit(self.request_id, str(e))
 
-            with h5py.File(self.filename, 'a') as h5file:
-                if dataset_path not in h5file:
-                    raise KeyError(f"Dataset '{dataset_path}' not found in HDF5 file.")
 
-                del h5file[dataset_path]
-                h5file.create_dataset(dataset_path, data=datasetModel.dataFrame.to_numpy())
+class EnvelopeWorkerSignals(QObject):
+    envelope_ready = pyqtSignal(int, object)  # Emits the request id and the (x, y) envelope
+    error_occurred = pyqtSignal(int, str)  # Emits the request id and the error message
 
-                h5file[dataset_path].attrs['columns'] = datasetModel.dataFrame.columns.tolist()
 
+class EnvelopeWorker(QRunnable):
+    """
+    Compute the min/max envelope of a column range on a worker thread of a
+    QThreadPool, see `decimation.column_envelope`, so that switching columns,
+    zooming or appending rows never streams a column on the GUI thread. A
+    cancelled worker stops between pieces and delivers nothing.
+    """
+
+    def __init__(self, dataset_model: DatasetModel, column, start, stop, n_bins, pyramid, request_id):
+        """
+        Initialize the EnvelopeWorker object.
+
+        Args:
+            dataset_model (DatasetModel): Source of the column.
+            column (int): Column index.
+            start (int): First row.
+            stop (int): Row after the last one.
+            n_bins (int): Number of bins.
+            pyramid (Pyramid): Overview pyramid of the column, optional.
+            request_id (int): Identifies the request, echoed in the signals.
+        """
+        super().__init__()
+        self.signals = EnvelopeWorkerSignals()
+        self.dataset_model = dataset_model
+        self.column = column
+        self.start = start
+        self.stop = stop
+        self.n_bins = n_bins
+        self.pyramid = pyramid
+        self.request_id = request_id
+        self._cancelled = Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        try:
+            with timed('decimate', f'rows {self.start}-{self.stop}'):
+                envelope = column_envelope(self.dataset_model, self.column, self.start, self.stop, self.n_bins,
+                                           self.pyramid, self.is_cancelled)
+            if envelope is not None and not self.is_cancelled():
+                self.signals.envelope_ready.emit(self.request_id, envelope)
         except Exception as e:
-            QMessageBox.Warning('update_dataset failed', str(e))
+            if not self.is_cancelled():
+                self.signals.error_occurred.emit(self.request_id, str(e))
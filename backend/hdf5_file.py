@@ -0,0 +1,474 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING
+
+import h5py
+import numpy as np
+
+from backend.compare import compare_datasets, compare_files
+from backend.dataset_model import DatasetModel
+from backend.dataset_reader import DatasetReader
+from backend.export import export_dataset
+from backend.file_pool import default_pool
+from backend.metadata_cache import root_token
+from backend.profiling import timed
+from backend.row_index import build_row_index
+from backend.scanner import describe_attributes, describe_dataset, list_group, scan_file
+from backend.statistics import compute_statistics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class HDF5File:
+    """
+    Operations on one HDF5 file, without any dependency on Qt.
+
+    This is the API shared by the viewer, which runs these calls on its
+    worker threads, and by the command line tool and scripts: listing the
+    tree, describing objects, reading, computing statistics, exporting and
+    writing changes back. Errors are raised, never shown.
+    """
+
+    # Size of the hyperslabs written back when saving edits
+    WRITE_BLOCK_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, filename, cache=None, pool=None, dataset_cache=None):
+        """
+        Initialize the HDF5File object.
+
+        Args:
+            filename (str): Path to the HDF5 file.
+            cache (MetadataCache): Persistent metadata index, optional.
+            pool (FileHandlePool): Source of file handles, defaults to the shared pool.
+            dataset_cache (DatasetCache): Recently viewed datasets, optional.
+        """
+        self.filename = filename
+        self.cache = cache
+        self.pool = pool or default_pool()
+        self.dataset_cache = dataset_cache
+
+    def _check_filename(self):
+        if not self.filename:
+            raise ValueError("Filename not provided.")
+
+    def load_metadata(self, lazy=False):
+        """
+        Load metadata (groups and datasets) for the HDF5 file.
+
+        Dataset entries carry their shape, dtype, chunking, compression and
+        storage size, so the tree never has to reopen them. When a valid entry
+        exists in the metadata cache, the file structure is not scanned at all.
+
+        Args:
+            lazy (bool): Only list the root level; sub-groups are flagged with
+                "Loaded": False and listed with `list_group`.
+
+        Returns:
+            dict: Metadata representing the structure of the HDF5 file.
+        """
+        self._check_filename()
+        metadata = None
+
+        with self.pool.read(self.filename) as h5file:
+            token = root_token(h5file)
+            if self.cache is not None:
+                metadata = self.cache.get(self.filename, token, require_complete=not lazy)
+            if metadata is None:
+                with timed('scan', self.filename):
+                    metadata = list_group(h5file, '/') if lazy else scan_file(h5file)
+                if self.cache is not None:
+                    try:
+                        self.cache.put(self.filename, token, metadata)
+                    except Exception as e:
+                        print(f'Error updating metadata cache: {e}')
+
+        return metadata
+
+    def list_group(self, path):
+        """
+        List the direct children of a group, see `scanner.list_group`.
+
+        Args:
+            path (str): Group path.
+
+        Returns:
+            dict: Metadata of the children. Sub-groups are flagged with "Loaded": False.
+        """
+        self._check_filename()
+        with self.pool.read(self.filename) as h5file, timed('scan', path):
+            children = list_group(h5file, path)
+        if self.cache is not None:
+            try:
+                self.cache.put_group(self.filename, path, children)
+            except Exception as e:
+                print(f'Error updating metadata cache: {e}')
+        return children
+
+    def describe(self, path):
+        """
+        Describe one group or dataset, with its attributes.
+
+        Args:
+            path (str): Full path of the object.
+
+        Returns:
+            dict: Metadata entry, as found in the tree metadata. Groups carry
+                the number of their direct children in "ChildCount".
+
+        Raises:
+            KeyError: If the path does not exist in the HDF5 file.
+        """
+        self._check_filename()
+        path = '/' + path.strip('/')
+        with self.pool.read(self.filename) as h5file:
+            if path not in h5file:
+                raise KeyError(f"Key '{path}' not found in HDF5 file.")
+            obj = h5file[path]
+            if isinstance(obj, h5py.Dataset):
+                entry = describe_dataset(obj.id, path)
+            else:
+                entry = {"Type": "Group", "Path": path, "ChildCount": len(obj)}
+            if obj.attrs:
+                entry["Attributes"] = describe_attributes(obj)
+        return entry
+
+    def get_by_key(self, key_path):
+        """
+        Get a specific dataset or group from the HDF5 file by its key.
+
+        Args:
+            key_path (str): Full path to the dataset or group.
+
+        Returns:
+            object: Dataset or group data.
+        """
+        import pandas as pd
+
+        self._check_filename()
+        with self.pool.read(self.filename) as h5file:
+            if key_path in h5file:
+                dataset = h5file[key_path]
+                if isinstance(dataset, h5py.Dataset):
+                    # Contiguous datasets are copied straight from the page cache, not through HDF5
+                    mapped = self.pool.memmap(self.filename, key_path)
+                    with timed('read', key_path) as timer:
+                        values = np.array(mapped) if mapped is not None else dataset[()]
+                        timer.nbytes = values.nbytes
+                    with timed('dataframe', key_path) as timer:
+                        columns = dataset.attrs['columns'] if 'columns' in dataset.attrs else None
+                        data_frame = pd.DataFrame(values, columns=columns)
+                        timer.nbytes = values.nbytes
+                    return DatasetModel(key_path, data_frame)
+                else:
+                    raise ValueError("Path does not point to a dataset.")
+            else:
+                raise KeyError(f"Key '{key_path}' not found in HDF5 file.")
+
+    def open_dataset(self, key_path):
+        """
+        Open a dataset for windowed reading, without loading its data. A model
+        still in the dataset cache is returned as-is, with its cached blocks.
+
+        Args:
+            key_path (str): Full path to the dataset.
+
+        Returns:
+            DatasetModel: Model backed by a DatasetReader.
+        """
+        self._check_filename()
+        if self.dataset_cache is not None:
+            dataset_model = self.dataset_cache.get(self.filename, key_path)
+            if dataset_model is not None:
+                return dataset_model
+        with timed('model', key_path):
+            dataset_model = DatasetModel.from_reader(key_path, DatasetReader(self.filename, key_path, pool=self.pool))
+        if self.dataset_cache is not None:
+            self.dataset_cache.put(self.filename, key_path, dataset_model)
+        return dataset_model
+
+    def _reader(self, key_path, view=None):
+        reader = DatasetReader(self.filename, key_path, pool=self.pool)
+        if view is not None:
+            reader.set_view(*view)
+        return reader
+
+    def read(self, key_path, start=0, stop=None, view=None):
+        """
+        Read a range of rows of a dataset.
+
+        Args:
+            key_path (str): Full path to the dataset.
+            start (int): First row.
+            stop (int): Row after the last one, the end of the dataset if None.
+            view (tuple): Slice of an N-D dataset, see `DatasetReader.set_view`.
+
+        Returns:
+            tuple: The column names and the rows, a 2-D array or a structured
+                array for compound datasets.
+        """
+        self._check_filename()
+        reader = self._reader(key_path, view)
+        try:
+            stop = reader.row_count if stop is None else min(stop, reader.row_count)
+            return list(reader.columns), reader.read_rows(max(0, start), max(start, stop))
+        finally:
+            reader.close()
+
+    def statistics(self, key_path, view=None, progress=None, executor=None):
+        """
+        Compute the statistics of every column of a dataset in a process pool,
+        see `statistics.compute_statistics`.
+
+        Returns:
+            list: Pairs of column name and ColumnStats.
+        """
+        self._check_filename()
+        reader = self._reader(key_path, view)
+        try:
+            columns = list(reader.columns)
+        finally:
+            reader.close()
+        stats = compute_statistics(self.filename, key_path, view, progress=progress, executor=executor)
+        return list(zip(columns, stats))
+
+    def export(self, key_path, output, view=None, sort_column=None, descending=False, expression=None,
+               progress=None):
+        """
+        Export a dataset, optionally sorted and filtered, to a CSV, Parquet or
+        .npy file, see `export.export_dataset`.
+
+        Args:
+            key_path (str): Full path to the dataset.
+            output (str): Output file; the format follows its extension.
+            view (tuple): Slice of an N-D dataset, see `DatasetReader.set_view`.
+            sort_column (int): Column to sort by, None to keep the file order.
+            descending (bool): Sort in descending order.
+            expression (str): Filter expression, see `row_index.filter_rows`.
+            progress (callable): Called with the percentage done.
+
+        Returns:
+            int: Number of rows exported.
+        """
+        self._check_filename()
+        reader = self._reader(key_path, view)
+        try:
+            rows = build_row_index(reader, sort_column, descending, expression)
+            export_dataset(reader, output, rows, progress=progress)
+            return reader.row_count if rows is None else len(rows)
+        finally:
+            reader.close()
+
+    def compare(self, other_filename, key_path=None, other_key_path=None, view=None, progress=None, executor=None):
+        """
+        Compare this file with another one, or one of its datasets with a
+        dataset of another file (or of this one), see `compare.compare_files`
+        and `compare.compare_datasets`.
+
+        Args:
+            other_filename (str): Path to the other HDF5 file.
+            key_path (str): Dataset to compare, None to compare the whole files.
+            other_key_path (str): Dataset of the other file, defaults to `key_path`.
+            view (tuple): Slice of N-D datasets, see `DatasetReader.set_view`.
+            progress (callable): Called with the percentage done.
+
+        Returns:
+            Comparison: Structural and value differences.
+        """
+        self._check_filename()
+        if key_path is None:
+            return compare_files(self.filename, other_filename, progress=progress, executor=executor)
+        return compare_datasets(self.filename, key_path, other_filename, other_key_path or key_path, view,
+                                progress=progress, executor=executor)
+
+    def write_changes(self, datasetModel: DatasetModel):
+        """
+        Write the changes of a dataset model back to the HDF5 file.
+
+        A column rename only rewrites the 'columns' attribute. Edited rows are
+        written in place as chunk-aligned hyperslabs, so the dataset keeps its
+        dtype, chunk layout and filters and no file space is leaked.
+
+        Args:
+            datasetModel (DatasetModel): Model holding the changes.
+
+        Raises:
+            KeyError: If the dataset path does not exist in the HDF5 file.
+        """
+        keys = datasetModel.keypath.split('.')
+        dataset_path = '/' + '/'.join(keys)
+
+        if datasetModel.reader is not None:
+            self._write_reader_changes(dataset_path, datasetModel.reader)
+        elif datasetModel.dataFrame is not None:
+            self._write_data_frame(dataset_path, datasetModel.dataFrame)
+
+        if self.dataset_cache is not None:
+            # Writing changed the file modification time, so every entry of the file is stale
+            self.dataset_cache.invalidate(self.filename)
+
+    def _write_reader_changes(self, dataset_path, reader: DatasetReader):
+        """
+        Write the renamed columns and the edited rows of a reader-backed model.
+        """
+        if not reader.has_edits and not reader.columns_changed:
+            return
+
+        with self.pool.write(self.filename) as h5file:
+            if dataset_path not in h5file:
+                raise KeyError(f"Dataset '{dataset_path}' not found in HDF5 file.")
+            dataset = h5file[dataset_path]
+
+            if reader.columns_changed:
+                dataset.attrs['columns'] = reader.columns
+
+            for start, stop in reader.dirty_ranges(max(1, self.WRITE_BLOCK_BYTES // reader.row_bytes)):
+                selection = reader.selection(start, stop)
+                rows = dataset[selection]
+                reader.apply_edits(rows, start)
+                dataset[selection] = rows
+
+        reader.mark_saved()
+
+    def _write_data_frame(self, dataset_path, data_frame: "pd.DataFrame"):
+        """
+        Write an in-memory DataFrame back to its dataset.
+
+        When the shape is unchanged, the file is compared block by block and
+        only the blocks that differ are rewritten. Otherwise the dataset is
+        recreated with the same dtype, chunking, filters and attributes.
+        """
+        columns = [str(column) for column in data_frame.columns]
+        with self.pool.write(self.filename) as h5file:
+            if dataset_path not in h5file:
+                raise KeyError(f"Dataset '{dataset_path}' not found in HDF5 file.")
+            dataset = h5file[dataset_path]
+
+            if dataset.dtype.names and len(dataset.dtype.names) == len(columns):
+                values = np.empty(len(data_frame), dtype=dataset.dtype)
+                for index, name in enumerate(dataset.dtype.names):
+                    values[name] = data_frame.iloc[:, index].to_numpy()
+            else:
+                values = data_frame.to_numpy()
+                if values.size == int(np.prod(dataset.shape)) and len(values) == len(dataset):
+                    values = values.reshape(dataset.shape)
+
+            if values.shape == dataset.shape:
+                row_bytes = max(1, dataset.dtype.itemsize * int(np.prod(dataset.shape[1:])))
+                chunk_rows = dataset.chunks[0] if dataset.chunks else 1
+                block_rows = max(chunk_rows, (self.WRITE_BLOCK_BYTES // row_bytes // chunk_rows) * chunk_rows)
+                for start in range(0, len(dataset), block_rows):
+                    stop = min(start + block_rows, len(dataset))
+                    rows = np.asarray(values[start:stop]).astype(dataset.dtype)
+                    if not self._same_rows(dataset[start:stop], rows):
+                        dataset[start:stop] = rows
+            else:
+                self._recreate_dataset(h5file, dataset_path, values)
+
+            stored = h5file[dataset_path].attrs.get('columns')
+            if stored is None or list(map(str, stored)) != columns:
+                h5file[dataset_path].attrs['columns'] = columns
+
+    @staticmethod
+    def _same_rows(current, rows):
+        try:
+            return np.array_equal(current, rows, equal_nan=True)
+        except TypeError:
+            # equal_nan is not supported for structured and string dtypes
+            return np.array_equal(current, rows)
+
+    @staticmethod
+    def _recreate_dataset(h5file, dataset_path, values):
+        """
+        Replace a dataset whose shape changed, keeping its dtype, layout and attributes.
+        """
+        dataset = h5file[dataset_path]
+        attrs = dict(dataset.attrs)
+        dtype = dataset.dtype if np.can_cast(values.dtype, dataset.dtype, 'same_kind') else values.dtype
+        layout = {}
+        if dataset.chunks and len(dataset.chunks) == values.ndim:
+            layout = dict(
+                chunks=tuple(min(chunk, max(size, 1)) for chunk, size in zip(dataset.chunks, values.shape)),
+                compression=dataset.compression,
+                compression_opts=dataset.compression_opts,
+                shuffle=dataset.shuffle,
+                fletcher32=dataset.fletcher32,
+                scaleoffset=dataset.scaleoffset,
+            )
+        del h5file[dataset_path]
+        new_dataset = h5file.create_dataset(dataset_path, data=values.astype(dtype), **layout)
+        for name, value in attrs.items():
+            new_dataset.attrs[name] = value
+
+
+def _scan_one(filename):
+    """
+    Scan the whole hierarchy of one file, in a worker process.
+
+    Returns:
+        tuple: The file name, its metadata and None, or None and the error message.
+    """
+    try:
+        with h5py.File(filename, 'r') as h5file:
+            return filename, scan_file(h5file), None
+    except Exception as e:
+        return filename, None, str(e)
+
+
+def scan_files(filenames, workers=None, executor=None):
+    """
+    Scan the hierarchy of many files in parallel, one file per worker process.
+
+    Scanning is dominated by reading object headers, which holds the GIL in
+    h5py, so files are spread over processes rather than threads. Results
+    are yielded as they complete, not in the order of `filenames`.
+
+    Args:
+        filenames (list): Paths to the HDF5 files.
+        workers (int): Number of worker processes, one per core if None.
+        executor (concurrent.futures.Executor): Used instead of a new process pool.
+
+    Yields:
+        tuple: The file name, its metadata or None, and the error message or None.
+    """
+    filenames = list(filenames)
+    workers = min(workers or os.cpu_count() or 1, len(filenames))
+    if executor is None and workers < 2:
+        # Starting worker processes would only add their start-up time
+        for filename in filenames:
+            yield _scan_one(filename)
+        return
+    own_executor = executor is None
+    if own_executor:
+        # Spawned workers do not inherit the HDF5 library state of the parent process
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    futures = [executor.submit(_scan_one, filename) for filename in filenames]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def summarize(metadata):
+    """
+    Count the groups and datasets of nested metadata and add up their storage size.
+
+    Returns:
+        dict: "Groups", "Datasets" and "StorageSize".
+    """
+    summary = {"Groups": 0, "Datasets": 0, "StorageSize": 0}
+    pending = [metadata]
+    while pending:
+        for entry in pending.pop().values():
+            if entry.get("Type") == "Group":
+                summary["Groups"] += 1
+                pending.append(entry.get("Children", {}))
+            elif entry.get("Type") == "Dataset":
+                summary["Datasets"] += 1
+                summary["StorageSize"] += entry.get("StorageSize", 0)
+    return summary
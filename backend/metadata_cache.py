@@ -0,0 +1,232 @@
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+import h5py
+import msgpack
+
+
+def default_cache_dir():
+    """
+    Return the per-user cache directory of the application.
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'HDF5Viewer')
+
+
+def root_token(h5file):
+    """
+    Fingerprint of the root object header of an open HDF5 file.
+
+    Args:
+        h5file (h5py.File): Open HDF5 file object.
+
+    Returns:
+        str: Address and header layout of the root group.
+    """
+    info = h5py.h5o.get_info(h5file.id)
+    return f"{info.addr}:{info.hdr.nmesgs}:{info.hdr.nchunks}:{info.hdr.space.total}:{info.num_attrs}"
+
+
+class MetadataCache:
+    """
+    Persistent index of HDF5 metadata, stored in a SQLite file in the user cache.
+
+    Each file is keyed by its absolute path, size, modification time and root
+    object header. Group listings are stored one row per group, so groups that
+    are expanded lazily are added to the index incrementally. When the total
+    size of the index exceeds `max_bytes`, the least recently opened files are
+    evicted.
+    """
+
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024):
+        """
+        Initialize the MetadataCache object.
+
+        Args:
+            directory (str): Directory of the index file, defaults to the user cache.
+            max_bytes (int): Size budget of the stored listings.
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.filename = os.path.join(self.directory, 'metadata_index.sqlite')
+        with closing(self._connect()) as connection, connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    root_token TEXT NOT NULL,
+                    complete INTEGER NOT NULL DEFAULT 0,
+                    nbytes INTEGER NOT NULL DEFAULT 0,
+                    last_used REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS groups (
+                    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+                    group_path TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (path, group_path)
+                );
+            """)
+
+    def _connect(self):
+        # One connection per call keeps the cache usable from any QThread
+        connection = sqlite3.connect(self.filename, timeout=10)
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+
+    @staticmethod
+    def _file_key(filename):
+        stat = os.stat(filename)
+        return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _pack_listing(children):
+        """Serialize a group listing without the children of its sub-groups."""
+        listing = {}
+        for key, value in children.items():
+            if value.get("Type") == "Group":
+                listing[key] = {"Type": "Group", "Path": value["Path"]}
+                for name in ("Attributes", "Link"):
+                    if name in value:
+                        listing[key][name] = value[name]
+            else:
+                listing[key] = value
+        return msgpack.packb(listing, use_bin_type=True)
+
+    def get(self, filename, token, require_complete=False):
+        """
+        Rebuild the cached metadata of a file if its index entry is still valid.
+
+        Stale entries are dropped.
+
+        Args:
+            filename (str): Path to the HDF5 file.
+            token (str): Root object header fingerprint, see `root_token`.
+            require_complete (bool): Only accept an index holding every group.
+
+        Returns:
+            dict: Metadata in the HDF5Data format, or None on a cache miss.
+        """
+        path, size, mtime_ns = self._file_key(filename)
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT size, mtime_ns, root_token, complete FROM files WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[:3] != (size, mtime_ns, token):
+                connection.execute("DELETE FROM files WHERE path = ?", (path,))
+                return None
+            if require_complete and not row[3]:
+                return None
+
+            listings = {
+                group_path: msgpack.unpackb(payload, raw=False, use_list=False)
+                for group_path, payload in connection.execute(
+                    "SELECT group_path, payload FROM groups WHERE path = ?", (path,)
+                )
+            }
+            connection.execute("UPDATE files SET last_used = ? WHERE path = ?", (time.time(), path))
+
+        if '/' not in listings:
+            return None
+        return self._build_tree(listings, '/')
+
+    def _build_tree(self, listings, group_path):
+        children = listings[group_path]
+        for value in children.values():
+            if value.get("Type") != "Group":
+                continue
+            if value["Path"] in listings:
+                value["Children"] = self._build_tree(listings, value["Path"])
+                value["Loaded"] = True
+            else:
+                value["Children"] = {}
+                value["Loaded"] = False
+        return children
+
+    def put(self, filename, token, metadata):
+        """
+        Store the metadata of a file, replacing any previous entry.
+
+        Args:
+            filename (str): Path to the HDF5 file.
+            token (str): Root object header fingerprint, see `root_token`.
+            metadata (dict): Metadata in the HDF5Data format.
+        """
+        path, size, mtime_ns = self._file_key(filename)
+        rows = []
+        complete = True
+        pending = [('/', metadata)]
+        while pending:
+            group_path, children = pending.pop()
+            rows.append((path, group_path, self._pack_listing(children)))
+            for value in children.values():
+                if value.get("Type") != "Group":
+                    continue
+                if value.get("Loaded", True):
+                    pending.append((value["Path"], value.get("Children", {})))
+                elif not value.get("Link"):
+                    # Linked groups are listed lazily even after a full scan, see `scan_file`
+                    complete = False
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            connection.execute(
+                "INSERT INTO files (path, size, mtime_ns, root_token, complete, nbytes, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, token, int(complete), sum(len(row[2]) for row in rows), time.time()),
+            )
+            connection.executemany("INSERT INTO groups (path, group_path, payload) VALUES (?, ?, ?)", rows)
+            self._evict(connection)
+
+    def put_group(self, filename, group_path, children):
+        """
+        Add the listing of a lazily loaded group to an existing file entry.
+
+        The listing is ignored if the file changed since its entry was stored.
+
+        Args:
+            filename (str): Path to the HDF5 file.
+            group_path (str): Path of the group.
+            children (dict): Metadata of the group's direct children.
+        """
+        path, size, mtime_ns = self._file_key(filename)
+        payload = self._pack_listing(children)
+        with closing(self._connect()) as connection, connection:
+            # A group listed again replaces its previous listing, whose size is no longer counted
+            updated = connection.execute(
+                "UPDATE files SET nbytes = nbytes + ? - COALESCE("
+                "(SELECT LENGTH(payload) FROM groups WHERE path = ? AND group_path = ?), 0), last_used = ? "
+                "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (len(payload), path, group_path, time.time(), path, size, mtime_ns),
+            ).rowcount
+            if updated:
+                connection.execute(
+                    "INSERT OR REPLACE INTO groups (path, group_path, payload) VALUES (?, ?, ?)",
+                    (path, group_path, payload),
+                )
+                self._evict(connection)
+
+    def _evict(self, connection):
+        """Drop least recently used files until the index fits in `max_bytes`."""
+        total = connection.execute("SELECT COALESCE(SUM(nbytes), 0) FROM files").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for path, nbytes in connection.execute("SELECT path, nbytes FROM files ORDER BY last_used").fetchall():
+            connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            total -= nbytes
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Remove every entry of the index."""
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM files")
@@ -0,0 +1,170 @@
+import cProfile
+import time
+from collections import deque
+from threading import Lock
+
+
+class OperationStats:
+    """Count, total time and bytes of one kind of operation."""
+
+    __slots__ = ('count', 'seconds', 'nbytes', 'last_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.nbytes = 0
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def throughput(self):
+        """Bytes per second, over all the operations."""
+        return self.nbytes / self.seconds if self.seconds > 0 else 0.0
+
+    def copy(self):
+        stats = OperationStats()
+        for name in self.__slots__:
+            setattr(stats, name, getattr(self, name))
+        return stats
+
+
+class PerformanceMonitor:
+    """
+    Timings and counters of the hot paths of the viewer: metadata scans,
+    dataset reads, decompression, model and DataFrame construction, cell
+    formatting, table painting and plotting.
+
+    Operations are timed with `timed`, from any thread. While the monitor is
+    disabled, `timed` returns a shared object that does nothing, so the
+    instrumented code only pays for one attribute lookup. The monitor can
+    also run cProfile over the GUI thread for a session and dump its stats.
+    Worker processes (statistics, comparisons) are not covered.
+    """
+
+    def __init__(self, max_events=500):
+        """
+        Initialize the PerformanceMonitor object.
+
+        Args:
+            max_events (int): Number of recent operations kept.
+        """
+        self.enabled = False
+        self._lock = Lock()
+        self.events = deque(maxlen=max_events)  # (wall time, operation, detail, seconds, bytes), oldest first
+        self.operations = {}  # Operation -> OperationStats
+        self._profile = None
+
+    def record(self, operation, seconds, nbytes=0, detail=''):
+        """Add one operation, typically through `timed`."""
+        with self._lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = OperationStats()
+            stats.count += 1
+            stats.seconds += seconds
+            stats.nbytes += nbytes
+            stats.last_seconds = seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            self.events.append((time.time(), operation, detail, seconds, nbytes))
+
+    def snapshot(self):
+        """
+        Return a consistent copy of the counters.
+
+        Returns:
+            tuple: Operation -> OperationStats, and the recent events, oldest first.
+        """
+        with self._lock:
+            return {operation: stats.copy() for operation, stats in self.operations.items()}, list(self.events)
+
+    def reset(self):
+        with self._lock:
+            self.operations.clear()
+            self.events.clear()
+
+    @property
+    def profiling(self):
+        return self._profile is not None
+
+    def start_profile(self):
+        """
+        Start profiling the calling thread, the GUI thread in the viewer, with cProfile.
+        """
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop_profile(self, filename=None):
+        """
+        Stop profiling, and write the stats for pstats or snakeviz.
+
+        Args:
+            filename (str): Output file, the profile is dropped if None.
+        """
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return
+        profile.disable()
+        if filename:
+            profile.dump_stats(filename)
+
+
+class _Timer:
+    """Times a `with` block and records it, with the bytes it processed set on `nbytes`."""
+
+    __slots__ = ('monitor', 'operation', 'detail', 'nbytes', 'start')
+
+    def __init__(self, monitor, operation, detail):
+        self.monitor = monitor
+        self.operation = operation
+        self.detail = detail
+        self.nbytes = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.monitor.record(self.operation, time.perf_counter() - self.start, self.nbytes, self.detail)
+        return False
+
+
+class _NullTimer:
+    """Stands in for a _Timer while the monitor is disabled; `nbytes` is ignored."""
+
+    __slots__ = ('nbytes',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+_default_monitor = PerformanceMonitor()
+
+
+def default_monitor():
+    """
+    Return the monitor shared by the whole application.
+    """
+    return _default_monitor
+
+
+def timed(operation, detail=''):
+    """
+    Time a block of code if the shared monitor is enabled.
+
+    Usage:
+        with timed('read', key_path) as timer:
+            rows = dataset[start:stop]
+            timer.nbytes = rows.nbytes
+
+    Args:
+        operation (str): Kind of operation, e.g. 'read' or 'format'.
+        detail (str): What it was done on, shown with the recent operations.
+    """
+    if not _default_monitor.enabled:
+        return _NULL_TIMER
+    return _Timer(_default_monitor, operation, detail)
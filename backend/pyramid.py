@@ -0,0 +1,218 @@
+import hashlib
+import math
+import os
+
+import h5py
+import numpy as np
+
+from backend.dataset_reader import DatasetReader
+from backend.metadata_cache import default_cache_dir
+
+# Samples per bin of the finest level: 2 ** BASE_LEVEL
+BASE_LEVEL = 10
+# Rows read per piece while building, rounded to whole chunks when they are small enough
+PIECE_SAMPLES = 1 << 20
+
+
+def sidecar_path(filename):
+    """
+    Path of the sidecar file holding the overviews of an HDF5 file.
+
+    The sidecar sits next to the file, or in the user cache directory when
+    the file's directory is not writable.
+    """
+    filename = os.path.abspath(filename)
+    directory = os.path.dirname(filename)
+    if os.access(directory, os.W_OK):
+        return f"{filename}.pyramid.h5"
+    digest = hashlib.sha1(filename.encode()).hexdigest()[:16]
+    return os.path.join(default_cache_dir(), f"{os.path.basename(filename)}.{digest}.pyramid.h5")
+
+
+def _group_name(key_path, column):
+    return f"{key_path.strip('/')}/column_{column}"
+
+
+def _reduce_samples(values, factor):
+    """
+    Reduce samples to bins of `factor` samples: rows of (min, max, mean, count).
+    The last bin may be partial. NaNs are ignored.
+    """
+    bins = -(-len(values) // factor)
+    padded = np.full(bins * factor, np.nan)
+    padded[:len(values)] = values
+    parts = padded.reshape(bins, factor)
+    valid = ~np.isnan(parts)
+    counts = valid.sum(axis=1)
+    sums = np.where(valid, parts, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.column_stack((
+            np.fmin.reduce(parts, axis=1),
+            np.fmax.reduce(parts, axis=1),
+            np.where(counts > 0, sums / counts, np.nan),
+            counts,
+        ))
+
+
+def _reduce_level(rows):
+    """
+    Merge pairs of consecutive bins of a level into the next, coarser level.
+    """
+    if len(rows) % 2:
+        rows = np.vstack((rows, [np.nan, np.nan, np.nan, 0.0]))
+    first, second = rows[0::2], rows[1::2]
+    counts = first[:, 3] + second[:, 3]
+    sums = np.nan_to_num(first[:, 2]) * first[:, 3] + np.nan_to_num(second[:, 2]) * second[:, 3]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.column_stack((
+            np.fmin(first[:, 0], second[:, 0]),
+            np.fmax(first[:, 1], second[:, 1]),
+            np.where(counts > 0, sums / counts, np.nan),
+            counts,
+        ))
+
+
+def build_pyramid(filename, key_path, column, progress=None, should_stop=None):
+    """
+    Build the min/max/mean overview pyramid of one dataset column.
+
+    The finest level reduces the column by 2 ** BASE_LEVEL and every next level
+    halves the previous one. The column is streamed in pieces of at most
+    PIECE_SAMPLES rows, chunk-aligned when the chunk height allows it, and
+    each level is built by streaming the level below it, so memory use is
+    bounded by one piece. Levels are stored in the sidecar file.
+
+    Args:
+        filename (str): Path to the HDF5 file.
+        key_path (str): Path of the dataset in the file.
+        column (int): Column index.
+        progress (callable): Called with the percentage done.
+        should_stop (callable): Returns True to cancel the build.
+
+    Returns:
+        bool: True if the pyramid was completed.
+    """
+    reader = DatasetReader(filename, key_path)
+    try:
+        row_count = reader.row_count
+        base_factor = 1 << BASE_LEVEL
+        chunk_rows = reader.row_chunk
+        step = math.lcm(chunk_rows, base_factor)
+        if step > PIECE_SAMPLES:
+            # Odd or large chunk heights: pieces straddle chunks rather than grow past the budget
+            step = base_factor
+        piece_rows = step * max(1, PIECE_SAMPLES // step)
+
+        levels = []
+        length = -(-row_count // base_factor)
+        while length >= 1:
+            levels.append(length)
+            if length == 1:
+                break
+            length = -(-length // 2)
+        work = row_count + sum(levels[:-1])
+        done = 0
+
+        stat = os.stat(filename)
+        path = sidecar_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with h5py.File(path, 'a') as sidecar:
+            name = _group_name(key_path, column)
+            if name in sidecar:
+                del sidecar[name]
+            group = sidecar.create_group(name)
+            group.attrs['source_size'] = stat.st_size
+            group.attrs['source_mtime_ns'] = stat.st_mtime_ns
+            group.attrs['row_count'] = row_count
+            group.attrs['complete'] = False
+
+            previous = None
+            for index, length in enumerate(levels):
+                level = group.create_dataset(
+                    f"level_{BASE_LEVEL + index}", shape=(length, 4), dtype='f8', chunks=(min(length, 65536), 4)
+                )
+                level.attrs['factor'] = base_factor << index
+                if previous is None:
+                    for start in range(0, row_count, piece_rows):
+                        if should_stop and should_stop():
+                            return False
+                        stop = min(start + piece_rows, row_count)
+                        values = np.asarray(reader.read_column(column, start, stop), dtype=np.float64)
+                        level[start // base_factor:-(-stop // base_factor)] = _reduce_samples(values, base_factor)
+                        done += stop - start
+                        if progress:
+                            progress(int(100 * done / work))
+                else:
+                    piece_bins = 2 * PIECE_SAMPLES // 8
+                    for start in range(0, len(previous), piece_bins):
+                        if should_stop and should_stop():
+                            return False
+                        stop = min(start + piece_bins, len(previous))
+                        level[start // 2:-(-stop // 2)] = _reduce_level(previous[start:stop])
+                        done += stop - start
+                        if progress:
+                            progress(int(100 * done / work))
+                previous = level
+
+            group.attrs['complete'] = True
+        return True
+    finally:
+        reader.close()
+
+
+class Pyramid:
+    """
+    Read access to the overview pyramid of one dataset column.
+    """
+
+    def __init__(self, path, group_name, factors):
+        self.path = path
+        self.group_name = group_name
+        self.factors = factors  # Level factors, finest first
+
+    @classmethod
+    def open(cls, filename, key_path, column):
+        """
+        Open the pyramid of a column if it was built for the current file.
+
+        Returns:
+            Pyramid: The pyramid, or None if it is missing, incomplete or stale.
+        """
+        path = sidecar_path(filename)
+        if not os.path.exists(path):
+            return None
+        try:
+            stat = os.stat(filename)
+            with h5py.File(path, 'r') as sidecar:
+                name = _group_name(key_path, column)
+                if name not in sidecar:
+                    return None
+                group = sidecar[name]
+                attrs = group.attrs
+                if not attrs.get('complete') or attrs['source_size'] != stat.st_size \
+                        or attrs['source_mtime_ns'] != stat.st_mtime_ns:
+                    return None
+                factors = sorted(int(level.attrs['factor']) for level in group.values())
+            return cls(path, name, factors)
+        except (OSError, KeyError):
+            return None
+
+    def envelope(self, start, stop, n_bins):
+        """
+        Min/max envelope of [start, stop) from the coarsest level that still
+        has at least `n_bins` bins over the range.
+
+        Returns:
+            tuple: (x, y) arrays in the format of `minmax_envelope`, or None if
+            even the finest level is too coarse for the range.
+        """
+        usable = [factor for factor in self.factors if (stop - start) / factor >= n_bins]
+        if not usable:
+            return None
+        factor = usable[-1]
+        first, last = start // factor, -(-stop // factor)
+        with h5py.File(self.path, 'r') as sidecar:
+            rows = sidecar[self.group_name][f"level_{factor.bit_length() - 1}"][first:last]
+        x = np.repeat(np.arange(first, first + len(rows)) * factor, 2)
+        y = rows[:, :2].ravel()
+        return x, y
@@ -0,0 +1,343 @@
+import hashlib
+import os
+from collections import OrderedDict
+from threading import RLock
+
+import numpy as np
+
+from backend.dataset_reader import DatasetReader
+from backend.metadata_cache import default_cache_dir
+
+# Rows read at once when evaluating a filter or reading a column to sort
+PIECE_BYTES = 8 * 1024 * 1024
+
+
+def _piece_rows(reader: DatasetReader):
+    return reader.row_chunk * max(1, PIECE_BYTES // reader.row_bytes // reader.row_chunk)
+
+
+def _read_columns(reader: DatasetReader, columns, start, stop):
+    """Read some columns over rows [start, stop), as a dict column -> 1-D array."""
+    if reader.fields:
+        values = reader.read_fields(start, stop, columns)
+        return {column: values[reader.fields[column]] for column in columns}
+    rows = reader.read_rows(start, stop)
+    return {column: rows[:, column] for column in columns}
+
+
+def column_names(reader: DatasetReader):
+    """
+    Names of the columns in a filter expression: c0, c1, ... for every column,
+    and the column name itself when it is a valid identifier.
+
+    Returns:
+        dict: Name -> column index.
+    """
+    names = {f'c{column}': column for column in range(reader.column_count)}
+    names.update({name: column for column, name in enumerate(reader.columns) if name.isidentifier()})
+    return names
+
+
+def filter_rows(reader: DatasetReader, expression, progress=None, should_stop=None):
+    """
+    Find the rows of a dataset matching a numexpr expression, such as
+    `(temperature > 80) & (status == 3)`.
+
+    The expression is evaluated over chunk-aligned pieces of about PIECE_BYTES,
+    reading only the columns it uses, so the memory use does not depend on the
+    length of the dataset.
+
+    Args:
+        reader (DatasetReader): Dataset to filter.
+        expression (str): Boolean numexpr expression over the columns, see `column_names`.
+        progress (callable): Called with the percentage done.
+        should_stop (callable): Returns True to cancel.
+
+    Returns:
+        np.ndarray: Increasing indexes of the matching rows, or None if cancelled.
+
+    Raises:
+        ValueError: If the expression is invalid or does not give one boolean per row.
+    """
+    import numexpr  # Imported on first use, it is slow to import
+
+    names = column_names(reader)
+    try:
+        code = compile(expression, '<filter>', 'eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid filter expression: {e.msg}") from None
+    used = {name: names[name] for name in code.co_names if name in names}
+    if not used:
+        raise ValueError("The filter expression does not use any column.")
+
+    matches = []
+    piece_rows = _piece_rows(reader)
+    for start in range(0, reader.row_count, piece_rows):
+        if should_stop and should_stop():
+            return None
+        stop = min(start + piece_rows, reader.row_count)
+        values = _read_columns(reader, set(used.values()), start, stop)
+        try:
+            mask = numexpr.evaluate(expression, local_dict={name: values[column] for name, column in used.items()},
+                                    global_dict={})
+        except Exception as e:
+            raise ValueError(f"Invalid filter expression: {e}. "
+                             "Comparisons combined with & or | need parentheses.") from None
+        if mask.dtype != np.bool_ or mask.shape != (stop - start,):
+            raise ValueError("The filter expression must give one boolean per row.")
+        matches.append(np.flatnonzero(mask) + start)
+        if progress:
+            progress(int(100 * stop / reader.row_count))
+    return np.concatenate(matches) if matches else np.zeros(0, dtype=np.int64)
+
+
+def sort_rows(reader: DatasetReader, column, progress=None, should_stop=None):
+    """
+    Compute the stable ascending argsort of a column. NaNs sort last.
+
+    Returns:
+        np.ndarray: Row indexes in sorted order, int32 when they fit, or None if cancelled.
+    """
+    dtype = reader.dtype[reader.fields[column]] if reader.fields else reader.dtype
+    values = np.empty(reader.row_count, dtype=dtype)
+    piece_rows = _piece_rows(reader)
+    for start in range(0, reader.row_count, piece_rows):
+        if should_stop and should_stop():
+            return None
+        stop = min(start + piece_rows, reader.row_count)
+        values[start:stop] = _read_columns(reader, [column], start, stop)[column]
+        if progress:
+            # Reading the column is most of the work
+            progress(int(90 * stop / reader.row_count))
+    order = np.argsort(values, kind='stable')
+    return order.astype(np.int32) if reader.row_count < 2 ** 31 else order
+
+
+def build_row_index(reader: DatasetReader, sort_column=None, descending=False, expression=None, cache=None,
+                    progress=None, should_stop=None):
+    """
+    Compute the rows shown by a sorted and/or filtered table.
+
+    Args:
+        reader (DatasetReader): Dataset to sort and filter.
+        sort_column (int): Column to sort by, None to keep the file order.
+        descending (bool): Sort in descending order.
+        expression (str): Filter expression, see `filter_rows`, None or empty to keep every row.
+        cache (SortIndexCache): Persisted sort permutations, optional.
+        progress (callable): Called with the percentage done.
+        should_stop (callable): Returns True to cancel.
+
+    Returns:
+        np.ndarray: Row indexes in display order; None if there is nothing to
+        sort or filter, or if cancelled.
+    """
+    steps = [step for step in (sort_column is not None, bool(expression)) if step]
+    if not steps:
+        return None
+
+    def step_progress(step):
+        if progress is None:
+            return None
+        return lambda percent: progress(int((step * 100 + percent) / len(steps)))
+
+    order = None
+    if sort_column is not None:
+        order = cache.get(reader, sort_column) if cache is not None else None
+        if order is None:
+            order = sort_rows(reader, sort_column, step_progress(0), should_stop)
+            if order is None:
+                return None
+            if cache is not None:
+                try:
+                    cache.put(reader, sort_column, order)
+                except Exception as e:
+                    print(f'Error updating sort index cache: {e}')
+        if descending:
+            order = order[::-1]
+        if not expression:
+            return order
+
+    rows = filter_rows(reader, expression, step_progress(len(steps) - 1), should_stop)
+    if rows is None or order is None:
+        return rows
+    keep = np.zeros(reader.row_count, dtype=bool)
+    keep[rows] = True
+    return order[keep[order]]
+
+
+class SortIndexCache:
+    """
+    Sort permutations of big columns, persisted as .npy sidecar files in the
+    user cache.
+
+    A cached permutation is memory-mapped instead of recomputed, so sorting a
+    column again is instant whatever its length. Files are named after the
+    file, dataset path, slice and column, and the size and modification time
+    of the file, so a changed file never reuses a stale permutation. The least
+    recently used files are deleted beyond `max_bytes`.
+    """
+
+    def __init__(self, directory=None, min_rows=1_000_000, max_bytes=4 * 1024 * 1024 * 1024):
+        """
+        Initialize the SortIndexCache object.
+
+        Args:
+            directory (str): Directory of the cache, defaults to the user cache.
+            min_rows (int): Columns shorter than this are quick to sort and not persisted.
+            max_bytes (int): Budget of the cache files.
+        """
+        self.directory = os.path.join(directory or default_cache_dir(), 'sort_index')
+        self.min_rows = min_rows
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, reader: DatasetReader, column):
+        stat = os.stat(reader.filename)
+        key = repr((os.path.abspath(reader.filename), '/' + reader.key_path.strip('/'), reader.view, column,
+                    stat.st_size, stat.st_mtime_ns))
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.npy')
+
+    def get(self, reader: DatasetReader, column):
+        """
+        Return the persisted permutation of a column, memory-mapped, or None.
+        """
+        path = self._path(reader, column)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return np.load(path, mmap_mode='r')
+
+    def put(self, reader: DatasetReader, column, order):
+        """
+        Persist the permutation of a column, if it is long enough to be worth it.
+        """
+        if len(order) < self.min_rows:
+            return
+        path = self._path(reader, column)
+        partial = path + '.partial'
+        with open(partial, 'wb') as file:
+            np.save(file, order)
+        os.replace(partial, path)
+        self._evict()
+
+    def _evict(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files)[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass  # Still memory-mapped, on Windows
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class IndexedReader:
+    """
+    The rows of a DatasetReader seen through a row index, the result of a
+    sort or a filter: row i is row `rows[i]` of the dataset.
+
+    Blocks of BLOCK_ROWS rows are read with one point selection each and kept
+    in a bounded LRU cache of their own. Everything else, columns, renames
+    and edits, goes to the underlying reader, which keeps the edits in
+    dataset rows so they are saved as usual.
+    """
+
+    # Rows of a block; scattered rows cost a chunk each, so blocks stay small
+    BLOCK_ROWS = 256
+
+    def __init__(self, reader: DatasetReader, rows):
+        """
+        Initialize the IndexedReader object.
+
+        Args:
+            reader (DatasetReader): Reader of the dataset.
+            rows (np.ndarray): Dataset row of every displayed row.
+        """
+        self.reader = reader
+        self.rows = rows
+        self.block_rows = self.BLOCK_ROWS
+        self._lock = RLock()  # Guards the block cache
+        self._blocks = OrderedDict()  # Block index -> rows
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    @property
+    def block_count(self):
+        return -(-self.row_count // self.block_rows)
+
+    def source_row(self, row):
+        """Row of the dataset shown as a displayed row."""
+        return int(self.rows[row])
+
+    def close(self):
+        with self._lock:
+            self._blocks.clear()
+
+    def cached_block(self, block_index):
+        """
+        Return a block of displayed rows if it is cached, see `DatasetReader.cached_block`.
+        """
+        with self._lock:
+            block = self._blocks.get(block_index)
+            if block is not None:
+                if self.reader.fields and not self.reader.active_fields <= block.keys():
+                    return None
+                self._blocks.move_to_end(block_index)
+            return block
+
+    def get_block(self, block_index):
+        """
+        Return a block of displayed rows, reading it if it is not cached.
+        """
+        block = self.cached_block(block_index)
+        if block is not None:
+            return block
+
+        start = block_index * self.block_rows
+        rows = np.asarray(self.rows[start:start + self.block_rows])
+        if self.reader.fields:
+            with self._lock:
+                cached = self._blocks.get(block_index, {})
+            missing = [column for column in self.reader.active_columns if self.reader.fields[column] not in cached]
+            block = self.reader.read_indexed(rows, missing) if missing else {}
+        else:
+            block = self.reader.read_indexed(rows)
+        with self._lock:
+            if self.reader.fields:
+                block = {**self._blocks.get(block_index, {}), **block}
+            self._blocks[block_index] = block
+            self._blocks.move_to_end(block_index)
+            while len(self._blocks) > self.reader.max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+    def value(self, row, column):
+        return self.reader.value(self.source_row(row), column)
+
+    def set_value(self, row, column, value):
+        """
+        Edit a displayed cell; the edit is kept by the underlying reader.
+        """
+        self.reader.set_value(self.source_row(row), column, value)
+        # Read the block again, with the edit applied
+        with self._lock:
+            self._blocks.pop(row // self.block_rows, None)
+        self.get_block(row // self.block_rows)
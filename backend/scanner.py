@@ -0,0 +1,162 @@
+import h5py
+import numpy as np
+
+# Names used by h5py for the standard HDF5 filters
+FILTER_NAMES = {
+    h5py.h5z.FILTER_DEFLATE: "gzip",
+    h5py.h5z.FILTER_SHUFFLE: "shuffle",
+    h5py.h5z.FILTER_FLETCHER32: "fletcher32",
+    h5py.h5z.FILTER_SZIP: "szip",
+    h5py.h5z.FILTER_SCALEOFFSET: "scaleoffset",
+}
+
+# Attributes kept per object for search, and characters kept per value
+MAX_ATTRIBUTES = 32
+MAX_ATTRIBUTE_CHARS = 200
+
+
+def describe_attributes(obj):
+    """
+    Read the attributes of an object as short strings, for search.
+
+    Only called for objects whose header lists attributes, so objects without
+    attributes cost nothing. Attributes that cannot be read are skipped.
+
+    Args:
+        obj (h5py.HLObject): Open group or dataset.
+
+    Returns:
+        dict: Attribute name -> value text, at most MAX_ATTRIBUTES entries.
+    """
+    attributes = {}
+    for name in obj.attrs:
+        if len(attributes) >= MAX_ATTRIBUTES:
+            break
+        try:
+            value = obj.attrs[name]
+        except Exception:
+            continue
+        if isinstance(value, bytes):
+            value = value.decode(errors="replace")
+        elif isinstance(value, np.ndarray):
+            value = " ".join(item.decode(errors="replace") if isinstance(item, bytes) else str(item)
+                             for item in value.ravel()[:MAX_ATTRIBUTE_CHARS])
+        attributes[name] = str(value)[:MAX_ATTRIBUTE_CHARS]
+    return attributes
+
+
+def describe_dataset(dsid, path):
+    """
+    Build the metadata entry of a dataset from its low-level identifier.
+
+    Args:
+        dsid (h5py.h5d.DatasetID): Open dataset identifier.
+        path (str): Full path of the dataset.
+
+    Returns:
+        dict: Type, path, shape, dtype, chunking, compression and storage size.
+    """
+    dcpl = dsid.get_create_plist()
+    chunks = dcpl.get_chunk() if dcpl.get_layout() == h5py.h5d.CHUNKED else None
+
+    filters = []
+    for index in range(dcpl.get_nfilters()):
+        code, _, _, name = dcpl.get_filter(index)
+        filters.append(FILTER_NAMES.get(code, name.decode(errors="replace") or str(code)))
+
+    return {
+        "Type": "Dataset",
+        "Path": path,
+        "Shape": dsid.shape,
+        "Dtype": str(dsid.dtype),
+        "Chunks": chunks,
+        "Compression": "+".join(filters) if filters else None,
+        "StorageSize": dsid.get_storage_size(),
+    }
+
+
+def list_group(h5file, path):
+    """
+    List the direct children of an HDF5 group without descending into sub-groups.
+
+    Args:
+        h5file (h5py.File): Open HDF5 file object.
+        path (str): Group path.
+
+    Returns:
+        dict: Metadata of the children. Sub-groups are flagged with "Loaded": False.
+    """
+    children = {}
+    gid = h5file[path].id
+    prefix = path if path.endswith('/') else f"{path}/"
+    for name in gid:
+        try:
+            info = h5py.h5o.get_info(gid, name)
+        except (KeyError, RuntimeError):
+            continue  # Dangling soft or external link
+        key = name.decode()
+        if info.type == h5py.h5o.TYPE_GROUP:
+            children[key] = {"Type": "Group", "Path": f"{prefix}{key}", "Children": {}, "Loaded": False}
+        elif info.type == h5py.h5o.TYPE_DATASET:
+            children[key] = describe_dataset(h5py.h5d.open(gid, name), f"{prefix}{key}")
+        else:
+            continue
+        if info.num_attrs:
+            children[key]["Attributes"] = describe_attributes(h5file[f"{prefix}{key}"])
+    return children
+
+
+def scan_file(h5file):
+    """
+    Scan the whole hierarchy of an HDF5 file in a single pass.
+
+    Every link is visited once through H5Lvisit, so soft links, external
+    links and extra hard links show up like `list_group` lists them. Only
+    datasets are opened (once per link) to read their layout, and groups only
+    when their header lists attributes. A group reached through a soft or
+    external link, or through a second hard link, is not descended into: its
+    entry is flagged with "Loaded": False and "Link": True and is listed
+    lazily, like `list_group` lists it, which also keeps link cycles finite.
+
+    Args:
+        h5file (h5py.File): Open HDF5 file object.
+
+    Returns:
+        dict: Nested metadata representing the structure of the HDF5 file.
+    """
+    metadata = {}
+    groups = {"": metadata}  # Group name -> its "Children" dict
+    fid = h5file.id
+    visited = {h5py.h5o.get_info(fid).addr}  # Addresses of the groups H5Lvisit descends into
+
+    def visitor(name, link):
+        parent, _, key = name.decode().rpartition('/')
+        children = groups.get(parent)
+        if children is None or not key or key == '.':
+            return None
+        try:
+            info = h5py.h5o.get_info(fid, name)
+        except (KeyError, RuntimeError):
+            return None  # Dangling soft or external link
+        full_name = f"{parent}/{key}" if parent else key
+        if info.type == h5py.h5o.TYPE_GROUP:
+            entry = {"Type": "Group", "Path": f"/{full_name}", "Children": {}, "Loaded": True}
+            if link.type == h5py.h5l.TYPE_HARD and link.u not in visited:
+                visited.add(link.u)
+                groups[full_name] = entry["Children"]
+            else:
+                entry.update(Loaded=False, Link=True)
+            if info.num_attrs:
+                entry["Attributes"] = describe_attributes(h5py.Group(h5py.h5g.open(fid, name)))
+        elif info.type == h5py.h5o.TYPE_DATASET:
+            dsid = h5py.h5d.open(fid, name)
+            entry = describe_dataset(dsid, f"/{full_name}")
+            if info.num_attrs:
+                entry["Attributes"] = describe_attributes(h5py.Dataset(dsid))
+        else:
+            return None
+        children[key] = entry
+        return None
+
+    fid.links.visit(visitor, info=True)
+    return metadata
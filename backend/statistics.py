@@ -0,0 +1,403 @@
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import closing
+
+import msgpack
+import numpy as np
+
+from backend.dataset_reader import DatasetReader
+from backend.metadata_cache import default_cache_dir
+
+# Rows per task sent to a worker process, in bytes of whole rows rounded to chunks
+TASK_BYTES = 64 * 1024 * 1024
+# Rows read at once inside a task
+PIECE_BYTES = 8 * 1024 * 1024
+
+
+class StreamingHistogram:
+    """
+    Exact, mergeable histogram of a stream of values.
+
+    Bins have a power-of-two width and are aligned on multiples of it, so two
+    histograms can always be merged by coarsening the finer one. When the
+    values span more than `max_bins` bins, the width is doubled and pairs of
+    bins are merged. NaNs and infinities are not counted.
+    """
+
+    def __init__(self, max_bins=64):
+        self.max_bins = max_bins
+        self.exponent = None  # Bins are 2 ** exponent wide
+        self.first = 0  # Index of the first bin, in units of the bin width
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def edges(self):
+        """Bin edges, one more than the bins."""
+        if self.exponent is None:
+            return np.zeros(0)
+        return np.ldexp(np.arange(self.first, self.first + len(self.counts) + 1, dtype=np.float64), self.exponent)
+
+    def _exponent_for(self, low, high):
+        """Smallest exponent at which [low, high] fits in max_bins bins."""
+        span = high - low
+        magnitude = max(abs(low), abs(high))
+        exponent = math.frexp(span / self.max_bins)[1] if span > 0 else math.frexp(magnitude or 1.0)[1] - 8
+        # Keep the bin indexes of the values well inside int64
+        exponent = max(exponent, math.frexp(magnitude)[1] - 60, -1074)
+        while math.floor(math.ldexp(high, -exponent)) - math.floor(math.ldexp(low, -exponent)) >= self.max_bins:
+            exponent += 1
+        return exponent
+
+    def _coarsen(self, exponent):
+        """Merge the bins into bins 2 ** exponent wide."""
+        shift = exponent - self.exponent
+        if shift <= 0:
+            return
+        indexes = np.arange(self.first, self.first + len(self.counts), dtype=np.int64) >> shift
+        first = int(indexes[0]) if len(indexes) else self.first >> shift
+        self.counts = np.bincount(indexes - first, weights=self.counts).astype(np.int64)
+        self.first = first
+        self.exponent = exponent
+
+    def _add_counts(self, first, counts):
+        """Add bins of the same width, starting at bin `first`."""
+        start = min(self.first, first) if len(self.counts) else first
+        stop = max(self.first + len(self.counts), first + len(counts))
+        merged = np.zeros(stop - start, dtype=np.int64)
+        merged[self.first - start:self.first - start + len(self.counts)] += self.counts
+        merged[first - start:first - start + len(counts)] += counts
+        self.first, self.counts = start, merged
+
+    def _fit(self, low, high):
+        """Coarsen until the bins cover [low, high] within max_bins bins."""
+        if self.exponent is None:
+            self.exponent = self._exponent_for(low, high)
+            self.first = math.floor(math.ldexp(low, -self.exponent))
+            return
+        if len(self.counts):
+            low = min(low, math.ldexp(self.first, self.exponent))
+            high = max(high, math.ldexp(self.first + len(self.counts) - 1, self.exponent))
+        self._coarsen(max(self.exponent, self._exponent_for(low, high)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self._fit(float(values.min()), float(values.max()))
+        indexes = np.floor(np.ldexp(values, -self.exponent)).astype(np.int64)
+        first = int(indexes.min())
+        self._add_counts(first, np.bincount(indexes - first))
+
+    def merge(self, other):
+        if other.exponent is None:
+            return
+        if self.exponent is None:
+            self.exponent, self.first, self.counts = other.exponent, other.first, other.counts.copy()
+            return
+        other = other.copy()
+        exponent = max(self.exponent, other.exponent)
+        self._coarsen(exponent)
+        other._coarsen(exponent)
+        self._add_counts(other.first, other.counts)
+        low = math.ldexp(self.first, self.exponent)
+        high = math.ldexp(self.first + len(self.counts) - 1, self.exponent)
+        self._coarsen(self._exponent_for(low, high))
+
+    def copy(self):
+        histogram = StreamingHistogram(self.max_bins)
+        histogram.exponent, histogram.first, histogram.counts = self.exponent, self.first, self.counts.copy()
+        return histogram
+
+    def to_dict(self):
+        return {'max_bins': self.max_bins, 'exponent': self.exponent, 'first': self.first,
+                'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, values):
+        histogram = cls(values['max_bins'])
+        histogram.exponent = values['exponent']
+        histogram.first = values['first']
+        histogram.counts = np.asarray(values['counts'], dtype=np.int64)
+        return histogram
+
+
+class ColumnStats:
+    """
+    Single-pass, mergeable statistics of one column.
+
+    Mean and variance are accumulated with Welford's algorithm, and partial
+    results are merged with Chan's formula, so pieces of a column can be
+    processed in any order and in separate processes. Non-numeric columns
+    only count their values.
+    """
+
+    def __init__(self, numeric=True, max_bins=64):
+        self.numeric = numeric
+        self.count = 0  # Values that are not NaN
+        self.nan_count = 0
+        self.minimum = math.nan
+        self.maximum = math.nan
+        self.mean = math.nan
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.histogram = StreamingHistogram(max_bins)
+
+    @property
+    def std(self):
+        """Sample standard deviation, like pandas; NaN for non-numeric columns."""
+        if not self.numeric or self.count < 2:
+            return math.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def update(self, values):
+        if not self.numeric:
+            self.count += len(values)
+            return
+        values = np.asarray(values, dtype=np.float64)
+        nans = np.isnan(values)
+        nan_count = int(nans.sum())
+        if nan_count:
+            values = values[~nans]
+        part = ColumnStats(max_bins=self.histogram.max_bins)
+        part.nan_count = nan_count
+        if len(values):
+            part.count = len(values)
+            part.minimum = float(values.min())
+            part.maximum = float(values.max())
+            part.mean = float(values.mean())
+            with np.errstate(invalid='ignore', over='ignore'):
+                part.m2 = float(np.square(values - part.mean).sum())
+            part.histogram.update(values)
+        self.merge(part)
+
+    def merge(self, other):
+        self.nan_count += other.nan_count
+        if not self.numeric or not other.numeric:
+            self.numeric = False
+            self.count += other.count
+            return
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.minimum, self.maximum = other.count, other.minimum, other.maximum
+            self.mean, self.m2 = other.mean, other.m2
+            self.histogram = other.histogram.copy()
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.histogram.merge(other.histogram)
+
+    def to_dict(self):
+        return {'numeric': self.numeric, 'count': self.count, 'nan_count': self.nan_count,
+                'minimum': self.minimum, 'maximum': self.maximum, 'mean': self.mean, 'm2': self.m2,
+                'histogram': self.histogram.to_dict()}
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls(values['numeric'])
+        for name in ('count', 'nan_count', 'minimum', 'maximum', 'mean', 'm2'):
+            setattr(stats, name, values[name])
+        stats.histogram = StreamingHistogram.from_dict(values['histogram'])
+        return stats
+
+
+def _is_numeric(dtype):
+    return dtype.kind in 'biuf'
+
+
+def _range_statistics(filename, key_path, view, start, stop):
+    """
+    Statistics of every column over rows [start, stop), in a worker process.
+
+    Returns:
+        list: ColumnStats.to_dict() per column.
+    """
+    reader = DatasetReader(filename, key_path)
+    try:
+        if view is not None:
+            reader.set_view(*view)
+        dtypes = [reader.dtype[name] for name in reader.fields] if reader.fields else [reader.dtype] * reader.column_count
+        columns = [ColumnStats(_is_numeric(dtype)) for dtype in dtypes]
+        piece_rows = reader.row_chunk * max(1, PIECE_BYTES // reader.row_bytes // reader.row_chunk)
+        for piece_start in range(start, stop, piece_rows):
+            piece_stop = min(piece_start + piece_rows, stop)
+            rows = reader.read_rows(piece_start, piece_stop)
+            for column, stats in enumerate(columns):
+                stats.update(rows[reader.fields[column]] if reader.fields else rows[:, column])
+        return [stats.to_dict() for stats in columns]
+    finally:
+        reader.close()
+
+
+_default_executor = None
+
+
+def default_executor():
+    """
+    Return the process pool shared by statistics computations, one worker per core.
+    """
+    global _default_executor
+    if _default_executor is None:
+        # Spawned workers do not inherit the HDF5 library state of the GUI process
+        _default_executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return _default_executor
+
+
+def shutdown_executor():
+    """
+    Stop the shared process pool, cancelling the pending tasks.
+    """
+    global _default_executor
+    if _default_executor is not None:
+        _default_executor.shutdown(wait=False, cancel_futures=True)
+        _default_executor = None
+
+
+def compute_statistics(filename, key_path, view=None, progress=None, should_stop=None, executor=None):
+    """
+    Compute the statistics of every column of a dataset in a process pool.
+
+    The rows are split into chunk-aligned ranges of about TASK_BYTES, processed
+    in parallel, and the partial results are merged as they complete, so even
+    one big dataset uses every worker.
+
+    Args:
+        filename (str): Path to the HDF5 file.
+        key_path (str): Path of the dataset in the file.
+        view (tuple): Slice of an N-D dataset, see `DatasetReader.set_view`.
+        progress (callable): Called with the percentage done.
+        should_stop (callable): Returns True to cancel the computation.
+        executor (concurrent.futures.Executor): Defaults to the shared process pool.
+
+    Returns:
+        list: ColumnStats per column, or None if cancelled.
+    """
+    reader = DatasetReader(filename, key_path)
+    try:
+        if view is not None:
+            reader.set_view(*view)
+        row_count, row_bytes, chunk_rows = reader.row_count, reader.row_bytes, reader.row_chunk
+        dtypes = [reader.dtype[name] for name in reader.fields] if reader.fields else [reader.dtype] * reader.column_count
+    finally:
+        reader.close()
+
+    columns = [ColumnStats(_is_numeric(dtype)) for dtype in dtypes]
+    task_rows = chunk_rows * max(1, TASK_BYTES // row_bytes // chunk_rows)
+    executor = executor or default_executor()
+    pending = {executor.submit(_range_statistics, filename, key_path, view, start, min(start + task_rows, row_count))
+               for start in range(0, row_count, task_rows)}
+    total = len(pending)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            if should_stop and should_stop():
+                return None
+            for future in done:
+                for stats, values in zip(columns, future.result()):
+                    stats.merge(ColumnStats.from_dict(values))
+            if done and progress:
+                progress(int(100 * (total - len(pending)) / total))
+        return columns
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class StatisticsCache:
+    """
+    Persistent cache of column statistics, stored in a SQLite file in the user cache.
+
+    Entries are keyed by file, dataset path and slice, and are only returned
+    while the file keeps the size and modification time they were computed for.
+    When the stored statistics exceed `max_bytes`, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, directory=None, max_bytes=16 * 1024 * 1024):
+        """
+        Initialize the StatisticsCache object.
+
+        Args:
+            directory (str): Directory of the cache file, defaults to the user cache.
+            max_bytes (int): Size budget of the stored statistics.
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.filename = os.path.join(self.directory, 'statistics.sqlite')
+        with closing(self._connect()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS statistics (
+                    path TEXT NOT NULL,
+                    key_path TEXT NOT NULL,
+                    view TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    payload BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (path, key_path, view)
+                )
+            """)
+
+    def _connect(self):
+        # One connection per call keeps the cache usable from any QThread
+        return sqlite3.connect(self.filename, timeout=10)
+
+    @staticmethod
+    def _key(filename, key_path, view):
+        stat = os.stat(filename)
+        return (os.path.abspath(filename), '/' + key_path.strip('/'), repr(view)), (stat.st_size, stat.st_mtime_ns)
+
+    def get(self, filename, key_path, view=None):
+        """
+        Return the cached statistics of a dataset, or None if missing or stale.
+        """
+        key, stamp = self._key(filename, key_path, view)
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT size, mtime_ns, payload FROM statistics WHERE path = ? AND key_path = ? AND view = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            if row[:2] != stamp:
+                connection.execute("DELETE FROM statistics WHERE path = ? AND key_path = ? AND view = ?", key)
+                return None
+            connection.execute(
+                "UPDATE statistics SET last_used = ? WHERE path = ? AND key_path = ? AND view = ?", (time.time(),) + key
+            )
+        return [ColumnStats.from_dict(values) for values in msgpack.unpackb(row[2], raw=False)]
+
+    def put(self, filename, key_path, columns, view=None):
+        """
+        Store the statistics of a dataset, replacing any previous entry.
+        """
+        key, stamp = self._key(filename, key_path, view)
+        payload = msgpack.packb([stats.to_dict() for stats in columns], use_bin_type=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO statistics (path, key_path, view, size, mtime_ns, payload, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", key + stamp + (payload, time.time())
+            )
+            self._evict(connection)
+
+    def _evict(self, connection):
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        total = connection.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM statistics").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for rowid, nbytes in connection.execute(
+                "SELECT rowid, LENGTH(payload) FROM statistics ORDER BY last_used").fetchall():
+            connection.execute("DELETE FROM statistics WHERE rowid = ?", (rowid,))
+            total -= nbytes
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,87 @@
+"""
+Compare h5py reads of a compressed dataset with the parallel chunk reader
+for an increasing number of decoding threads.
+
+Usage:
+    python -m benchmarks.chunk_benchmark [--size-gb 10] [--compression gzip|blosc] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import numpy as np
+
+from backend.chunk_reader import ParallelChunkReader, chunk_filters
+
+COLUMNS = 8
+CHUNK_ROWS = 16_384
+
+
+def build_file(filename, size_gb, compression):
+    """Write a synthetic, compressible float64 dataset of about `size_gb` GB."""
+    rows = int(size_gb * 1024 ** 3) // (COLUMNS * 8)
+    if compression == 'blosc':
+        import hdf5plugin
+        options = hdf5plugin.Blosc(cname='lz4', clevel=5, shuffle=hdf5plugin.Blosc.SHUFFLE)
+    else:
+        options = {'compression': 'gzip', 'compression_opts': 4, 'shuffle': True}
+    rng = np.random.default_rng(0)
+    block = 64 * CHUNK_ROWS
+    with h5py.File(filename, 'w') as h5file:
+        dataset = h5file.create_dataset('data', shape=(rows, COLUMNS), dtype=np.float64,
+                                        chunks=(CHUNK_ROWS, COLUMNS), **options)
+        for start in range(0, rows, block):
+            stop = min(rows, start + block)
+            # Slowly varying signals with a little rounded noise, like logged measurements
+            base = np.arange(start, stop, dtype=np.float64)[:, None] * np.arange(1, COLUMNS + 1) * 1e-6
+            dataset[start:stop] = (base + rng.normal(0, 1e-3, size=(stop - start, COLUMNS))).round(4)
+    return rows
+
+
+def read_all(source, rows, block_rows):
+    """Read the whole dataset block by block, as the viewer and the exporter do."""
+    start = time.perf_counter()
+    for block_start in range(0, rows, block_rows):
+        source[block_start:min(rows, block_start + block_rows)]
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-gb', type=float, default=10, help="Uncompressed size of the dataset")
+    parser.add_argument('--compression', choices=('gzip', 'blosc'), default='gzip')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="Decoding threads to try, powers of two up to the core count by default")
+    parser.add_argument('--block-mb', type=int, default=256, help="Size of each read")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or [1 << power for power in range(cores.bit_length()) if 1 << power <= cores]
+    block_rows = args.block_mb * 1024 ** 2 // (COLUMNS * 8)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'chunk_benchmark.h5')
+        start = time.perf_counter()
+        rows = build_file(filename, args.size_gb, args.compression)
+        print(f"Built {rows:,} x {COLUMNS} {args.compression} rows ({args.size_gb:g} GB, "
+              f"{os.path.getsize(filename) / 1024 ** 3:.2f} GB on disk) in {time.perf_counter() - start:.1f} s")
+
+        with h5py.File(filename, 'r') as h5file:
+            dataset = h5file['data']
+            filters = chunk_filters(dataset)
+            baseline = read_all(dataset, rows, block_rows)
+            print(f"h5py                  : {baseline:8.2f} s  {args.size_gb / baseline:6.2f} GB/s")
+            for count in workers:
+                with ThreadPoolExecutor(max_workers=count) as executor:
+                    reader = ParallelChunkReader(dataset, filters, executor)
+                    elapsed = read_all(reader, rows, block_rows)
+                print(f"parallel, {count:3d} threads : {elapsed:8.2f} s  {args.size_gb / elapsed:6.2f} GB/s  "
+                      f"speedup {baseline / elapsed:5.2f}x")
+    print(f"({cores} cores)")
+
+
+if __name__ == '__main__':
+    main()
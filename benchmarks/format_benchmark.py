@@ -0,0 +1,79 @@
+"""
+Measure the cost of formatting table cells for a repaint of 1k x 200 visible cells.
+
+Compares the previous per-cell `str(DataFrame.iat[row, column])` lookup with
+the vectorized, cached formatting of LazyLoadTableModel.
+
+Usage:
+    python -m benchmarks.format_benchmark [--rows 1000] [--columns 200] [--repaints 10]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QAbstractTableModel, QCoreApplication, Qt
+
+from frontend.Model.LazyTableModel import LazyLoadTableModel
+
+
+class LegacyTableModel(QAbstractTableModel):
+    """Cell formatting used by LazyLoadTableModel before vectorization."""
+
+    def __init__(self, data_frame):
+        super().__init__()
+        self._data = data_frame
+
+    def rowCount(self, parent=None):
+        return len(self._data)
+
+    def columnCount(self, parent=None):
+        return len(self._data.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return str(self._data.iat[index.row(), index.column()])
+        return None
+
+
+def repaint(model, indexes):
+    """Request the display text of every visible cell, as a paint does."""
+    start = time.perf_counter()
+    for index in indexes:
+        model.data(index, Qt.DisplayRole)
+    return time.perf_counter() - start
+
+
+def measure(model, repaints):
+    indexes = [model.index(row, column) for row in range(model.rowCount()) for column in range(model.columnCount())]
+    first = repaint(model, indexes)
+    following = [repaint(model, indexes) for _ in range(repaints)]
+    return len(indexes), first, sum(following) / len(following)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help="Visible rows")
+    parser.add_argument('--columns', type=int, default=200, help="Visible float columns")
+    parser.add_argument('--repaints', type=int, default=10, help="Repaints after the first one")
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    data_frame = pd.DataFrame(np.random.default_rng(0).standard_normal((args.rows, args.columns)))
+
+    for name, model in [
+        ("str(iat) per cell", LegacyTableModel(data_frame)),
+        ("vectorized + cached", LazyLoadTableModel(data_frame, rows_per_chunk=args.rows)),
+    ]:
+        cells, first, following = measure(model, args.repaints)
+        print(f"{name:20s}: first repaint {first * 1000:8.1f} ms, "
+              f"next repaints {following * 1000:8.1f} ms ({following / cells * 1e9:6.0f} ns/cell)")
+
+
+if __name__ == '__main__':
+    main()
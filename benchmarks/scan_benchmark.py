@@ -0,0 +1,81 @@
+"""
+Compare the legacy recursive metadata walk with the single-pass scanner.
+
+Usage:
+    python -m benchmarks.scan_benchmark [--nodes 100000] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from backend.scanner import scan_file
+
+
+def legacy_scan(h5file):
+    """Recursive walk used by HDF5Data before the single-pass scanner."""
+    metadata = {}
+
+    def process_group(path, metadata):
+        for key in h5file[path].keys():
+            item_path = f"{path}{key}"
+            if isinstance(h5file[item_path], h5py.Group):
+                metadata[key] = {"Type": "Group", "Path": item_path, "Children": {}}
+                process_group(f"{item_path}/", metadata[key]["Children"])
+            elif isinstance(h5file[item_path], h5py.Dataset):
+                metadata[key] = {"Type": "Dataset", "Path": item_path}
+
+    process_group('/', metadata)
+    return metadata
+
+
+def build_file(filename, nodes, datasets_per_group=99):
+    """Write a synthetic file holding about `nodes` groups and datasets."""
+    data = np.arange(16, dtype=np.float64)
+    with h5py.File(filename, 'w') as h5file:
+        created = 0
+        group_index = 0
+        while created < nodes:
+            group = h5file.create_group(f"group_{group_index:05d}")
+            created += 1
+            group_index += 1
+            for dataset_index in range(min(datasets_per_group, nodes - created)):
+                group.create_dataset(f"dataset_{dataset_index:03d}", data=data)
+                created += 1
+
+
+def best_of(function, filename, repeat):
+    timings = []
+    for _ in range(repeat):
+        with h5py.File(filename, 'r') as h5file:
+            start = time.perf_counter()
+            function(h5file)
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=100_000, help="Number of groups and datasets")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per scanner, the best one is kept")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'scan_benchmark.h5')
+        start = time.perf_counter()
+        build_file(filename, args.nodes)
+        print(f"Built {args.nodes:,} nodes in {time.perf_counter() - start:.1f} s")
+
+        legacy = best_of(legacy_scan, filename, args.repeat)
+        single_pass = best_of(scan_file, filename, args.repeat)
+
+    print(f"legacy recursive walk : {legacy:8.3f} s")
+    print(f"single-pass scanner   : {single_pass:8.3f} s (with shape/dtype/chunk info)")
+    print(f"speedup               : {legacy / single_pass:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
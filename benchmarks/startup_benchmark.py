@@ -0,0 +1,98 @@
+"""
+Measure the cold start of the viewer: import time of the main window module
+and time to the first shown window, offscreen.
+
+Each run happens in a fresh interpreter. The heaviest imports are listed from
+`python -X importtime`, and the run fails when matplotlib or pandas are
+imported before the first window is shown, or when the startup is slower
+than --max-seconds.
+
+Usage:
+    python -m benchmarks.startup_benchmark [--repeat 5] [--file data.h5] [--max-seconds 2.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a child interpreter: prints the seconds to the first shown window and
+# the deferred modules that were imported anyway
+FIRST_WINDOW = """
+import sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+from frontend.main_view import HDF5Viewer
+viewer = HDF5Viewer(sys.argv[1] if len(sys.argv) > 1 else None)
+viewer.show()
+app.processEvents()
+elapsed = time.perf_counter() - start
+loaded = [name for name in ('matplotlib', 'pandas') if name in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+
+def child_env():
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    return env
+
+
+def import_times(module, top):
+    """Cumulative import times of `module`, heaviest first, in microseconds."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=child_env(), cwd=ROOT, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times.append((int(cumulative), name.rstrip()))
+    total = next((cumulative for cumulative, name in times if name.strip() == module), 0)
+    return total, sorted(times, reverse=True)[:top]
+
+
+def first_window(filename):
+    command = [sys.executable, '-c', FIRST_WINDOW] + ([filename] if filename else [])
+    result = subprocess.run(command, capture_output=True, text=True, env=child_env(), cwd=ROOT, check=True)
+    elapsed, _, loaded = result.stdout.strip().splitlines()[-1].partition(' ')
+    return float(elapsed), [name for name in loaded.split(',') if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help="Cold starts measured, the median is kept")
+    parser.add_argument('--file', help="HDF5 file opened at startup, like a double-click")
+    parser.add_argument('--top', type=int, default=10, help="Number of heaviest imports listed")
+    parser.add_argument('--max-seconds', type=float, help="Fail when the median startup is slower")
+    args = parser.parse_args()
+
+    total, heaviest = import_times('frontend.main_view', args.top)
+    print(f"import frontend.main_view: {total / 1e6:8.3f} s")
+    for cumulative, name in heaviest:
+        print(f"  {cumulative / 1e6:8.3f} s {name}")
+
+    timings = []
+    deferred = set()
+    for _ in range(args.repeat):
+        elapsed, loaded = first_window(args.file)
+        timings.append(elapsed)
+        deferred.update(loaded)
+    median = statistics.median(timings)
+    print(f"time to first window     : {median:8.3f} s (median of {args.repeat}, best {min(timings):.3f} s)")
+
+    failures = []
+    if deferred:
+        failures.append(f"imported before the first window: {', '.join(sorted(deferred))}")
+    if args.max_seconds is not None and median > args.max_seconds:
+        failures.append(f"startup took {median:.3f} s, over the {args.max_seconds:.3f} s budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
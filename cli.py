@@ -0,0 +1,174 @@
+import argparse
+import csv
+import json
+import sys
+
+from backend.formatting import format_values
+from backend.hdf5_file import HDF5File, scan_files, summarize
+
+
+def _json_default(value):
+    # Numpy scalars and tuples found in metadata entries
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def _print_json(value):
+    json.dump(value, sys.stdout, indent=2, default=_json_default)
+    print()
+
+
+def _print_tree(metadata, indent=0):
+    for name, entry in metadata.items():
+        if entry.get("Type") == "Group":
+            print(f"{'  ' * indent}{name}/")
+            _print_tree(entry.get("Children", {}), indent + 1)
+        else:
+            shape = " x ".join(map(str, entry.get("Shape", ()))) or "scalar"
+            print(f"{'  ' * indent}{name}  {shape} {entry.get('Dtype', '')}")
+
+
+def _progress(percent):
+    print(f"\r{percent:3d}%", end='', file=sys.stderr, flush=True)
+
+
+def tree(args):
+    metadata = HDF5File(args.file).load_metadata()
+    if args.json:
+        _print_json(metadata)
+    else:
+        _print_tree(metadata)
+
+
+def describe(args):
+    _print_json(HDF5File(args.file).describe(args.path))
+
+
+def read(args):
+    columns, rows = HDF5File(args.file).read(args.path, args.start, args.stop)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    if rows.dtype.names:
+        values = [format_values(rows[name]) for name in rows.dtype.names]
+    else:
+        values = [format_values(rows[:, column]) for column in range(rows.shape[1])]
+    writer.writerows(zip(*values))
+
+
+def stats(args):
+    columns = HDF5File(args.file).statistics(args.path, progress=None if args.json else _progress)
+    if args.json:
+        _print_json({str(name): column.to_dict() for name, column in columns})
+        return
+    print(file=sys.stderr)
+    print(f"{'column':<20} {'count':>12} {'nan':>8} {'min':>14} {'max':>14} {'mean':>14} {'std':>14}")
+    for name, column in columns:
+        if column.numeric:
+            values = " ".join(f"{value:>14.6g}" for value in (column.minimum, column.maximum, column.mean, column.std))
+        else:
+            values = " ".join(f"{'':>14}" for _ in range(4))
+        print(f"{str(name):<20} {column.count:>12,} {column.nan_count:>8,} {values}")
+
+
+def export(args):
+    count = HDF5File(args.file).export(args.path, args.output, sort_column=args.sort, descending=args.descending,
+                                       expression=args.filter, progress=_progress)
+    print(f"\nExported {count:,} rows to {args.output}", file=sys.stderr)
+
+
+def scan(args):
+    results = {}
+    for filename, metadata, error in scan_files(args.files, workers=args.workers):
+        if error is not None:
+            print(f"Error scanning {filename}: {error}", file=sys.stderr)
+            continue
+        results[filename] = metadata if args.json else summarize(metadata)
+        if not args.json:
+            summary = results[filename]
+            print(f"{filename}: {summary['Groups']:,} groups, {summary['Datasets']:,} datasets, "
+                  f"{summary['StorageSize']:,} bytes")
+    if args.json:
+        _print_json(results)
+
+
+def compare(args):
+    comparison = HDF5File(args.file).compare(args.other_file, args.path, args.other_path,
+                                             progress=None if args.json else _progress)
+    if args.json:
+        _print_json(comparison.to_dict())
+        return
+    print(file=sys.stderr)
+    for path, description in comparison.differences:
+        print(f"{path}: {description}")
+    for path, diff in comparison.datasets.items():
+        if not diff.identical:
+            print(f"{path}: {diff.summary()}")
+            for start, stop in diff.column_ranges(None)[:args.ranges]:
+                print(f"  rows {start:,}-{stop - 1:,}")
+    print("identical" if comparison.identical else "different")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Inspect and export HDF5 files without the viewer.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('tree', help="print the groups and datasets of a file")
+    command.add_argument('file')
+    command.add_argument('--json', action='store_true', help="print the full metadata as JSON")
+    command.set_defaults(handler=tree)
+
+    command = commands.add_parser('describe', help="print the metadata and attributes of an object as JSON")
+    command.add_argument('file')
+    command.add_argument('path')
+    command.set_defaults(handler=describe)
+
+    command = commands.add_parser('read', help="print a range of rows of a dataset as CSV")
+    command.add_argument('file')
+    command.add_argument('path')
+    command.add_argument('--start', type=int, default=0)
+    command.add_argument('--stop', type=int, default=None)
+    command.set_defaults(handler=read)
+
+    command = commands.add_parser('stats', help="compute the column statistics of a dataset")
+    command.add_argument('file')
+    command.add_argument('path')
+    command.add_argument('--json', action='store_true')
+    command.set_defaults(handler=stats)
+
+    command = commands.add_parser('export', help="export a dataset to CSV, Parquet or .npy")
+    command.add_argument('file')
+    command.add_argument('path')
+    command.add_argument('output', help="output file, the format follows its extension")
+    command.add_argument('--sort', type=int, default=None, metavar='COLUMN', help="column index to sort by")
+    command.add_argument('--descending', action='store_true')
+    command.add_argument('--filter', default=None, metavar='EXPRESSION', help="e.g. \"(c0 > 0) & (c1 < 5)\"")
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser('compare', help="compare two files, or two datasets, structure and values")
+    command.add_argument('file')
+    command.add_argument('other_file')
+    command.add_argument('--path', default=None, help="dataset to compare, every dataset by default")
+    command.add_argument('--other-path', default=None, help="dataset of the other file, defaults to --path")
+    command.add_argument('--ranges', type=int, default=10, help="differing row ranges printed per dataset")
+    command.add_argument('--json', action='store_true')
+    command.set_defaults(handler=compare)
+
+    command = commands.add_parser('scan', help="scan many files in parallel and summarize them")
+    command.add_argument('files', nargs='+')
+    command.add_argument('--workers', type=int, default=None, help="worker processes, one per core by default")
+    command.add_argument('--json', action='store_true', help="print the full metadata of every file as JSON")
+    command.set_defaults(handler=scan)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
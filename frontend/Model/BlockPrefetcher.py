@@ -0,0 +1,64 @@
+from threading import Condition
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from backend.dataset_reader import DatasetReader
+
+
+class BlockPrefetcher(QThread):
+    """
+    Worker thread reading row blocks of a DatasetReader ahead of the viewport.
+    """
+
+    block_loaded = pyqtSignal(int)  # Emits the index of a block that is now cached
+    error_occurred = pyqtSignal(str)  # Emits error messages
+
+    def __init__(self, reader: DatasetReader, parent=None):
+        super().__init__(parent)
+        self._reader = reader
+        self._queue = []
+        self._condition = Condition()
+        self._running = True
+
+    def request(self, block_indexes, replace=True):
+        """
+        Queue blocks to read, most urgent first.
+
+        Args:
+            block_indexes (list): Blocks to read.
+            replace (bool): Drop the blocks queued by a previous request, which
+                belong to a viewport the user already scrolled away from.
+        """
+        with self._condition:
+            if replace:
+                self._queue = []
+            new_blocks = [index for index in block_indexes if index not in self._queue]
+            self._queue = new_blocks + self._queue
+            self._condition.notify()
+
+    def stop(self):
+        """
+        Stop the thread once the block being read is done.
+        """
+        with self._condition:
+            self._running = False
+            self._queue = []
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                block_index = self._queue.pop(0)
+
+            if self._reader.cached_block(block_index) is not None:
+                continue
+            try:
+                self._reader.get_block(block_index)
+                self.block_loaded.emit(block_index)
+            except Exception as e:
+                self.error_occurred.emit(str(e))
@@ -0,0 +1,234 @@
+import time
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QBrush, QColor
+
+from backend.dataset_reader import DatasetReader
+from backend.formatting import FormatCache
+from backend.row_index import IndexedReader
+from frontend.Model.BlockPrefetcher import BlockPrefetcher
+
+
+class DatasetTableModel(QAbstractTableModel):
+    """
+    Table model backed by an open HDF5 dataset.
+
+    Only the row blocks around the visible viewport are read, through the
+    block cache of the DatasetReader. Blocks are read by a BlockPrefetcher,
+    ahead of the viewport in the scroll direction; cells of a block that is
+    not loaded yet stay empty until the block arrives.
+
+    A sorted or filtered table is backed by an IndexedReader; its vertical
+    header shows the row numbers of the dataset.
+
+    Cells found different from another dataset by a comparison are painted
+    with a highlight background, see `set_differences`.
+    """
+
+    DIFFERENCE_BRUSH = QBrush(QColor(255, 205, 205))
+
+    # Rows of a block column formatted at once, around the painted cells
+    FORMAT_ROWS = 1024
+
+    def __init__(self, reader: DatasetReader, lookahead_seconds=0.5, max_blocks_ahead=8, parent=None):
+        super().__init__(parent)
+        self._reader = reader
+        self._row_count = reader.row_count  # Rows announced to the view, see append_rows
+        self.lookahead_seconds = lookahead_seconds
+        self.max_blocks_ahead = max(1, min(max_blocks_ahead, reader.max_blocks // 2))
+
+        # Prefetch counters: a block entering the viewport is a hit if it was already read
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        self._visible_blocks = set()
+        self._last_viewport = None  # (first row, time) of the previous viewport update
+
+        # Cells are formatted per (block, segment, column), only for the columns that get painted
+        self._format_cache = FormatCache()
+
+        self._differences = None  # DatasetDiff of a comparison, see set_differences
+
+        self._prefetcher = BlockPrefetcher(reader, parent=self)
+        self._prefetcher.block_loaded.connect(self._on_block_loaded)
+        self._prefetcher.error_occurred.connect(lambda error: print(f"Error prefetching rows: {error}"))
+        self._prefetcher.start()
+
+    def rowCount(self, parent=None):
+        return self._row_count
+
+    def columnCount(self, parent=None):
+        return self._reader.column_count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            row, column = index.row(), index.column()
+            if self._reader.fields and column not in self._reader.active_columns:
+                # Compound datasets only read the fields of the columns being painted
+                self._reader.set_active_columns([column], keep=True)
+            block_index = row // self._reader.block_rows
+            block = self._reader.cached_block(block_index)
+            if block is None:
+                self._prefetcher.request([block_index], replace=False)
+                return None
+            # Only the segment around the painted cell is formatted, not the whole block
+            segment, position = divmod(row % self._reader.block_rows, self.FORMAT_ROWS)
+            start, stop = segment * self.FORMAT_ROWS, (segment + 1) * self.FORMAT_ROWS
+            if self._reader.fields:
+                values = lambda: block[self._reader.fields[column]][start:stop]
+            else:
+                values = lambda: block[start:stop, column]
+            return self._format_cache.get(block_index, column, values, segment)[position]
+        if role == Qt.BackgroundRole and self._differences is not None:
+            row = self._reader.source_row(index.row()) if isinstance(self._reader, IndexedReader) else index.row()
+            if self._differences.differs(row, index.column()):
+                return self.DIFFERENCE_BRUSH
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._reader.columns[section]
+        elif role == Qt.DisplayRole and orientation == Qt.Vertical:
+            if isinstance(self._reader, IndexedReader):
+                return str(self._reader.source_row(section))
+            return str(section)
+        return None
+
+    def setHeaderData(self, section, orientation, value, role=Qt.EditRole):
+        if role == Qt.EditRole and orientation == Qt.Horizontal:
+            try:
+                self._reader.rename_column(self._reader.columns[section], str(value))
+                self.headerDataChanged.emit(orientation, section, section)
+                return True
+            except Exception as e:
+                print(f"Error updating column name: {e}")
+                return False
+        return False
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        try:
+            self._reader.set_value(index.row(), index.column(), value)
+        except Exception as e:
+            print(f"Error updating cell: {e}")
+            return False
+        self.invalidate_rows(index.row(), index.row())
+        return True
+
+    def set_differences(self, differences):
+        """
+        Highlight the cells that differ from another dataset.
+
+        Args:
+            differences (DatasetDiff): Result of the comparison, None to clear the highlights.
+        """
+        self._differences = differences
+        if self.rowCount() and self.columnCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1),
+                                  [Qt.BackgroundRole])
+
+    def has_edits(self):
+        return self._reader.has_edits
+
+    def flags(self, index):
+        # Allow editing of data cells and headers
+        default_flags = super().flags(index)
+        return default_flags | Qt.ItemIsEditable
+
+    def update_viewport(self, first_row, last_row, first_column=None, last_column=None):
+        """
+        Queue the visible blocks and the blocks the user is scrolling towards.
+
+        The number of blocks read ahead grows with the scroll velocity, so that
+        the blocks needed in the next `lookahead_seconds` are read in advance.
+        For compound datasets, only the fields of the visible columns are read.
+
+        Args:
+            first_row (int): First visible row.
+            last_row (int): Last visible row.
+            first_column (int): First visible column, optional.
+            last_column (int): Last visible column, optional.
+        """
+        if self._reader.fields and first_column is not None and last_column is not None:
+            self._reader.set_active_columns(range(first_column, last_column + 1))
+        block_rows = self._reader.block_rows
+        first_block, last_block = first_row // block_rows, last_row // block_rows
+        visible = list(range(first_block, last_block + 1))
+
+        for block_index in visible:
+            if block_index not in self._visible_blocks:
+                if self._reader.cached_block(block_index) is not None:
+                    self.prefetch_hits += 1
+                else:
+                    self.prefetch_misses += 1
+        self._visible_blocks = set(visible)
+
+        now = time.monotonic()
+        velocity = 0.0  # Rows per second
+        if self._last_viewport is not None:
+            previous_row, previous_time = self._last_viewport
+            velocity = (first_row - previous_row) / max(now - previous_time, 1e-3)
+        self._last_viewport = (first_row, now)
+
+        blocks_ahead = min(self.max_blocks_ahead, 1 + int(abs(velocity) * self.lookahead_seconds / block_rows))
+        if velocity >= 0:
+            ahead = range(last_block + 1, last_block + 1 + blocks_ahead)
+        else:
+            ahead = range(first_block - 1, first_block - 1 - blocks_ahead, -1)
+
+        wanted = visible + [index for index in ahead if 0 <= index < self._reader.block_count]
+        self._prefetcher.request([index for index in wanted if self._reader.cached_block(index) is None])
+
+    def prefetch_stats(self):
+        """
+        Prefetch counters, to tune the block size of a dataset.
+
+        Returns:
+            dict: Hits, misses, hit rate and block height in rows.
+        """
+        total = self.prefetch_hits + self.prefetch_misses
+        return {
+            "hits": self.prefetch_hits,
+            "misses": self.prefetch_misses,
+            "hit_rate": self.prefetch_hits / total if total else 0.0,
+            "block_rows": self._reader.block_rows,
+        }
+
+    def invalidate_rows(self, first_row, last_row):
+        """
+        Drop the formatted cells of edited rows and repaint them.
+        """
+        block_rows = self._reader.block_rows
+        for block_index in range(first_row // block_rows, last_row // block_rows + 1):
+            self._format_cache.invalidate(block_index)
+        if self.columnCount():
+            self.dataChanged.emit(self.index(first_row, 0), self.index(last_row, self.columnCount() - 1))
+
+    def append_rows(self):
+        """
+        Show the rows appended to the dataset since the last call, after a
+        refresh of a live dataset. The last block, read while it was partial,
+        is formatted again.
+        """
+        row_count = self._reader.row_count
+        if row_count <= self._row_count:
+            return
+        self._format_cache.invalidate(self._row_count // self._reader.block_rows)
+        self.beginInsertRows(QModelIndex(), self._row_count, row_count - 1)
+        self._row_count = row_count
+        self.endInsertRows()
+
+    def _on_block_loaded(self, block_index):
+        first_row = block_index * self._reader.block_rows
+        last_row = min(first_row + self._reader.block_rows, self._row_count) - 1
+        if self.columnCount() and last_row >= first_row:
+            self.dataChanged.emit(self.index(first_row, 0), self.index(last_row, self.columnCount() - 1))
+
+    def stop(self):
+        """
+        Stop the prefetch thread, before the model or its reader is dropped.
+        """
+        self._prefetcher.stop()
@@ -1,4 +1,7 @@
-from PyQt5.QtCore import QAbstractTableModel, Qt
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from backend.formatting import FormatCache
 
 class LazyLoadTableModel(QAbstractTableModel):
     def __init__(self, data_frame, rows_per_chunk=100, parent=None):
@@ -7,6 +10,11 @@ class LazyLoadTableModel(QAbstractTableModel):
         self._rows_per_chunk = rows_per_chunk
         self._rows_loaded = rows_per_chunk  # Initially load the first chunk
 
+        # One NumPy array per column (a view for numeric columns), formatted a chunk at a time
+        self._columns = [self._data.iloc[:, column].to_numpy() for column in range(len(self._data.columns))]
+        self._format_cache = FormatCache()
+        self._edited = False
+
     def rowCount(self, parent=None):
         return min(self._rows_loaded, len(self._data))
 
@@ -18,8 +26,14 @@ class LazyLoadTableModel(QAbstractTableModel):
             return None
 
         row, column = index.row(), index.column()
-        if role == Qt.DisplayRole:
-            return str(self._data.iat[row, column])
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            chunk_index, offset = divmod(row, self._rows_per_chunk)
+            start = chunk_index * self._rows_per_chunk
+            values = self._columns[column]
+            strings = self._format_cache.get(
+                chunk_index, column, lambda: values[start:start + self._rows_per_chunk]
+            )
+            return strings[offset]
         return None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
@@ -46,14 +60,45 @@ class LazyLoadTableModel(QAbstractTableModel):
                 return False
         return False
 
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        row, column = index.row(), index.column()
+        try:
+            dtype = self._columns[column].dtype
+            self._data.iat[row, column] = value if dtype == object else np.array(value).astype(dtype)[()]
+        except Exception as e:
+            print(f"Error updating cell: {e}")
+            return False
+        self._edited = True
+        self.invalidate_rows(row, row)
+        return True
+
+    def has_edits(self):
+        return self._edited
+
+    def invalidate_rows(self, first_row, last_row):
+        """
+        Drop the formatted cells of edited rows and repaint them.
+        """
+        for column in range(len(self._columns)):
+            self._columns[column] = self._data.iloc[:, column].to_numpy()
+        for chunk_index in range(first_row // self._rows_per_chunk, last_row // self._rows_per_chunk + 1):
+            self._format_cache.invalidate(chunk_index)
+        if self.columnCount():
+            self.dataChanged.emit(self.index(first_row, 0), self.index(last_row, self.columnCount() - 1))
+
     def flags(self, index):
         # Allow editing of data cells and headers
         default_flags = super().flags(index)
         return default_flags | Qt.ItemIsEditable
 
     def load_more_rows(self):
-        previous_rows = self._rows_loaded
-        self._rows_loaded = min(self._rows_loaded + self._rows_per_chunk, len(self._data))
+        previous_rows = self.rowCount()
+        new_rows = min(self._rows_loaded + self._rows_per_chunk, len(self._data))
 
-        if self._rows_loaded > previous_rows:
-            self.layoutChanged.emit()
+        if new_rows > previous_rows:
+            # Only the appended rows are inserted, the view keeps its state
+            self.beginInsertRows(QModelIndex(), previous_rows, new_rows - 1)
+            self._rows_loaded = new_rows
+            self.endInsertRows()
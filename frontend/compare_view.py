@@ -0,0 +1,148 @@
+import os
+
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView
+)
+
+from backend.hdf5_data import CompareWorker
+
+
+class CompareDialog(QDialog):
+    """
+    Differences between two files, or two datasets, computed in the
+    background: objects only one side has, shape, dtype and attribute
+    differences, and the datasets whose values differ.
+
+    Double-clicking a dataset shows it, with its differing rows highlighted
+    in the table and the graph.
+    """
+
+    comparison_ready = pyqtSignal(object)  # Emits the Comparison once computed
+    dataset_activated = pyqtSignal(str)  # Emits the path of a dataset to show
+
+    HEADERS = ["Path", "Difference"]
+
+    def __init__(self, parent=None):
+        """
+        Initialize the CompareDialog.
+
+        :param parent: Window the dialog stays on top of.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Compare")
+        self.resize(700, 400)
+        self.comparison = None
+        self._worker = None
+
+        self.summary = QLabel()
+        self.summary.setWordWrap(True)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.cellDoubleClicked.connect(self._on_cell_double_clicked)
+
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.cancel_button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.summary)
+        layout.addLayout(progress_layout)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+        self._set_running(False)
+
+    def compare(self, filename, other_filename, key_path=None, other_key_path=None, view=None):
+        """
+        Start comparing two files, or two datasets, and show the dialog.
+
+        :param key_path: Dataset of the first file, None to compare the whole files.
+        :param other_key_path: Dataset of the second file, defaults to key_path.
+        :param view: Slice of N-D datasets, see DatasetReader.set_view.
+        """
+        self.cancel()
+        self.comparison = None
+        self.table.setRowCount(0)
+        first = os.path.basename(filename) + (key_path or "")
+        second = os.path.basename(other_filename) + ((other_key_path or key_path) or "")
+        self.summary.setText(f"Comparing {first} with {second}...")
+        self._worker = CompareWorker(filename, other_filename, key_path, other_key_path, view)
+        self._worker.progress.connect(self.progress_bar.setValue)
+        self._worker.comparison_ready.connect(self._on_comparison_ready)
+        self._worker.error_occurred.connect(self._on_error)
+        self._worker.finished.connect(self._on_worker_finished)
+        self.progress_bar.setValue(0)
+        self._set_running(True)
+        self._worker.start()
+        self.show()
+        self.raise_()
+
+    def cancel(self):
+        """
+        Stop a running comparison.
+        """
+        if self._worker is not None:
+            self._worker.requestInterruption()
+            self._worker.wait()
+            self._worker = None
+        self._set_running(False)
+
+    def closeEvent(self, event):
+        self.cancel()
+        super().closeEvent(event)
+
+    def _set_running(self, running):
+        self.progress_bar.setVisible(running)
+        self.cancel_button.setVisible(running)
+
+    def _on_worker_finished(self):
+        if self._worker is not None and self._worker is self.sender():
+            self._worker.wait()
+            self._worker = None
+            self._set_running(False)
+
+    def _on_error(self, error):
+        if self.sender() is self._worker:
+            self.summary.setText(f"Failed to compare: {error}")
+
+    def _on_comparison_ready(self, comparison):
+        if self.sender() is not self._worker:
+            return
+        self.comparison = comparison
+        self.show_comparison(comparison)
+        self.comparison_ready.emit(comparison)
+
+    def show_comparison(self, comparison):
+        rows = [(path, description, None) for path, description in comparison.differences]
+        rows += [(path, diff.summary(), path) for path, diff in comparison.datasets.items() if not diff.identical]
+        rows.sort(key=lambda row: row[0])
+        self.table.setRowCount(len(rows))
+        for row, (path, description, dataset) in enumerate(rows):
+            path_item = QTableWidgetItem(path)
+            # Only datasets whose values were compared can be shown with highlights
+            path_item.setData(Qt.UserRole, dataset)
+            self.table.setItem(row, 0, path_item)
+            self.table.setItem(row, 1, QTableWidgetItem(description))
+
+        skipped = sum(diff.rows_skipped for diff in comparison.datasets.values())
+        compared = sum(min(diff.rows_a, diff.rows_b) for diff in comparison.datasets.values())
+        text = "Identical." if comparison.identical else f"{len(rows):,} differences."
+        if compared:
+            text += f" {skipped:,} of {compared:,} rows had identical stored chunks and were not decoded."
+        if any(diff.truncated for diff in comparison.datasets.values()):
+            text += " Only the first differing ranges of some columns are highlighted."
+        self.summary.setText(text)
+
+    def _on_cell_double_clicked(self, row, column):
+        dataset = self.table.item(row, 0).data(Qt.UserRole)
+        if dataset:
+            self.dataset_activated.emit(dataset)
@@ -1,31 +1,94 @@
+from PyQt5.QtCore import QThreadPool, QTimer
 from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QVBoxLayout, QWidget, QComboBox, QSizePolicy
-from matplotlib import pyplot as plt
-from matplotlib.backends.backend_qt import NavigationToolbar2QT
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QWidget, QComboBox, QSizePolicy, QPushButton
 import numpy as np
 from backend.dataset_model import DatasetModel
+from backend.decimation import column_envelope
+from backend.hdf5_data import EnvelopeWorker, PyramidBuilder
+from backend.profiling import timed
+from backend.pyramid import Pyramid
 
 class GraphWidget(QWidget):
-    def __init__(self):
+    # Ranges of up to this many rows are decimated on the GUI thread, larger ones on a worker
+    SYNC_ROWS = 1 << 16
+
+    def __init__(self, pool=None):
+        """
+        Initialize the GraphWidget.
+
+        :param pool: QThreadPool decimating large ranges, defaults to the global pool.
+        """
         super().__init__()
         self._datasetModel = DatasetModel()
+        self._pool = pool or QThreadPool.globalInstance()
+        self._envelope_worker = None  # EnvelopeWorker decimating a large range
+        self._envelope_request = 0  # Id of the latest decimation, older results are dropped
+        self._apply_envelope = None  # Applies the (x, y) envelope of the latest decimation
+        self._pending_append = None  # First appended row not plotted yet, see append_rows
+        self._line = None
+        self._pyramid = None  # Overview pyramid of the plotted column, if built
+        self._builder = None
+        self._initial_envelope = None  # Envelope of the first column, computed by the loader
+        self._envelope_pending = False  # The loader is still computing the first column envelope
+        self._moving_tail = False  # The x-range is being moved to follow a live dataset
+        self._differences = None  # DatasetDiff of a comparison, its rows are shaded
+        self._difference_spans = None  # Artist shading the differing rows of the plotted column
+
+        # Zooming and panning re-decimate the visible range once the view settles
+        self._redecimate_timer = QTimer(self)
+        self._redecimate_timer.setSingleShot(True)
+        self._redecimate_timer.setInterval(100)
+        self._redecimate_timer.timeout.connect(self.redecimate)
 
         self.variable_names_button = QComboBox()
         self.variable_names_button.currentTextChanged.connect(self.plot)
-        self.variable_names_button.addItems(list(map(str, self.datasetModel.dataFrame.keys())))
+        self.variable_names_button.addItems(list(map(str, self.datasetModel.columns)))
         self.variable_names_button.setFont(QFont("", 10))
 
-        self.figure = plt.Figure(figsize=(8, 6))
+        self.overview_button = QPushButton("Build overview")
+        self.overview_button.setToolTip("Precompute min/max/mean overviews of the column for fast zoomed-out views")
+        self.overview_button.setEnabled(False)
+        self.overview_button.clicked.connect(self.build_overview)
+
+        # Matplotlib is slow to import, so the canvas is built when the first dataset is shown
+        self.figure = None
+        self.canvas = None
+        self.toolbar = None
+
+        selector_layout = QHBoxLayout()
+        selector_layout.addWidget(self.variable_names_button, 1)
+        selector_layout.addWidget(self.overview_button)
+
+        self.graph_layout = QVBoxLayout()
+        self.graph_layout.addLayout(selector_layout)
+        self.graph_layout.addStretch(1)
+        self.setLayout(self.graph_layout)
+
+    def ensure_canvas(self):
+        """
+        Import matplotlib and build the figure, canvas and toolbar, once.
+        """
+        if self.figure is not None:
+            return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qt import NavigationToolbar2QT
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+
+        class FigureCanvas(FigureCanvasQTAgg):
+            # Every render goes through draw, including the deferred draw_idle ones
+            def draw(self):
+                with timed('plot', 'draw'):
+                    super().draw()
+
+        self.figure = Figure(figsize=(8, 6))
         self.canvas = FigureCanvas(self.figure)
         self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.toolbar = NavigationToolbar2QT(self.canvas, self)
 
-        graph_layout = QVBoxLayout()
-        graph_layout.addWidget(self.variable_names_button)
-        graph_layout.addWidget(self.canvas)
-        graph_layout.addWidget(self.toolbar)
-        self.setLayout(graph_layout)
+        # Replace the stretch holding the place of the canvas
+        self.graph_layout.takeAt(self.graph_layout.count() - 1)
+        self.graph_layout.addWidget(self.canvas)
+        self.graph_layout.addWidget(self.toolbar)
 
     @property
     def datasetModel(self) -> DatasetModel:
@@ -36,18 +99,47 @@ class GraphWidget(QWidget):
 
     @datasetModel.setter
     def datasetModel(self, value: DatasetModel):
+        self.set_dataset(value)
+
+    def set_dataset(self, value: DatasetModel, envelope=None, pending=False):
+        """
+        Show a dataset, optionally with the full-range envelope of its first
+        column already computed off the GUI thread. With `pending`, the first
+        column is only plotted once `set_envelope` delivers its envelope.
+        """
         if not isinstance(value, DatasetModel):
             raise ValueError("datasetModel must be an instance of DatasetModel.")
+        self.ensure_canvas()
         self._datasetModel = value
+        self.variable_names_button.blockSignals(True)
         self.variable_names_button.clear()
-        if not self._datasetModel.dataFrame.empty:
-            self.variable_names_button.addItems(list(self._datasetModel.dataFrame.keys()))
+        if not self._datasetModel.empty:
+            self.variable_names_button.addItems(list(map(str, self._datasetModel.columns)))
+        self.variable_names_button.blockSignals(False)
+        self._initial_envelope = envelope
+        self._envelope_pending = pending and envelope is None
+        self._differences = None
         self.clear_plot()
         self.plot()
 
+    def set_envelope(self, envelope):
+        """
+        Plot the first column envelope computed in the background, unless the
+        user already picked another column.
+        """
+        if not self._envelope_pending:
+            return
+        self._envelope_pending = False
+        if self.variable_names_button.currentIndex() == 0:
+            self._initial_envelope = envelope
+            self.plot()
+
 
     def clear_plot(self):
+        if self.figure is None:
+            return
         self.figure.clear()
+        self._difference_spans = None
         ax = self.figure.add_subplot(111)
         ax.set_facecolor("white")
         ax.set_xticks([])
@@ -61,20 +153,292 @@ class GraphWidget(QWidget):
         self.clear_plot()
         self.variable_names_button.clear()
 
+    def bins_for_width(self):
+        """
+        Number of envelope bins for the current plot width, one per pixel column.
+        """
+        self.ensure_canvas()
+        return max(100, int(self.figure.gca().get_window_extent().width))
+
+    def _decimate(self, start, stop, n_bins=None):
+        """
+        Min/max envelope of the current column over [start, stop), at about
+        one bin per pixel column of the axes unless `n_bins` is given.
+        """
+        column = self.variable_names_button.currentIndex()
+        with timed('decimate', f'rows {start}-{stop}'):
+            return column_envelope(self.datasetModel, column, start, stop, n_bins or self.bins_for_width(),
+                                   self._pyramid)
+
+    def _decimate_async(self, start, stop, apply, n_bins=None):
+        """
+        Decimate [start, stop) of the current column and pass the envelope to
+        `apply`. Small ranges are decimated right away; larger ones on a worker
+        of the pool, so the GUI never streams a whole column. Starting a
+        decimation cancels the previous one.
+        """
+        self.cancel_decimation()
+        n_bins = n_bins or self.bins_for_width()
+        if stop - start <= self.SYNC_ROWS:
+            apply(*self._decimate(start, stop, n_bins))
+            return
+        self._envelope_request += 1
+        self._envelope_worker = EnvelopeWorker(self.datasetModel, self.variable_names_button.currentIndex(),
+                                               start, stop, n_bins, self._pyramid, self._envelope_request)
+        self._envelope_worker.signals.envelope_ready.connect(self._on_envelope_computed)
+        self._envelope_worker.signals.error_occurred.connect(self._on_envelope_error)
+        self._apply_envelope = apply
+        self._pool.start(self._envelope_worker)
+
+    def cancel_decimation(self):
+        """
+        Cancel the decimation running on a worker; its envelope is dropped.
+        """
+        if self._envelope_worker is not None:
+            self._envelope_worker.cancel()
+        self._envelope_worker = None
+        self._apply_envelope = None
+
+    def _on_envelope_computed(self, request_id, envelope):
+        if request_id != self._envelope_request or self._apply_envelope is None:
+            return
+        apply = self._apply_envelope
+        self._envelope_worker = None
+        self._apply_envelope = None
+        try:
+            apply(*envelope)
+        except Exception as e:
+            print(f'Error plotting envelope: {e}')
+
+    def _on_envelope_error(self, request_id, error):
+        if request_id == self._envelope_request:
+            self._envelope_worker = None
+            self._apply_envelope = None
+            print(f'Error decimating column: {error}')
+
+    def set_differences(self, differences):
+        """
+        Shade the rows of the plotted column that differ from another dataset.
+
+        :param differences: DatasetDiff of the dataset shown, in its current slice, None to clear.
+        """
+        self._differences = differences
+        if self._line is not None:
+            self._draw_differences(self.figure.gca())
+            self.canvas.draw_idle()
+
+    def _draw_differences(self, ax):
+        """
+        Shade the differing rows of the current column as one collection of
+        spans. Ranges closer than a pixel column are joined, so the number of
+        spans stays bounded by the plot width.
+        """
+        if self._difference_spans is not None:
+            self._difference_spans.remove()
+            self._difference_spans = None
+        if self._differences is None:
+            return
+        from matplotlib.collections import PolyCollection
+
+        gap = max(1.0, self.datasetModel.row_count / self.bins_for_width())
+        spans = []
+        for start, stop in self._differences.column_ranges(self.variable_names_button.currentIndex()):
+            if spans and start - spans[-1][1] < gap:
+                spans[-1][1] = stop
+            else:
+                spans.append([start, stop])
+        if not spans:
+            return
+        # x in rows, y across the whole axes whatever its limits
+        self._difference_spans = PolyCollection(
+            [[(start, 0), (start, 1), (stop, 1), (stop, 0)] for start, stop in spans],
+            transform=ax.get_xaxis_transform(), facecolor=(0.84, 0.15, 0.16, 0.25),
+            edgecolor=(0.84, 0.15, 0.16, 0.5), linewidth=1, zorder=0)
+        ax.add_collection(self._difference_spans, autolim=False)
+
+    def _on_xlim_changed(self, ax):
+        if self._line is not None and not self._moving_tail:
+            self._redecimate_timer.start()
+
+    def append_rows(self, start, stop):
+        """
+        Extend the plot with the rows appended to a live dataset.
+
+        Only the new rows are read, decimated at the bin width of the current
+        view. While the view shows the tail, the x-range slides along with it,
+        keeping its width, and the points that scroll out are dropped, so the
+        work per update does not grow with the dataset.
+
+        :param start: Row count before the append.
+        :param stop: Row count after the append.
+        """
+        if self._line is None or stop <= start:
+            return
+        try:
+            # An overview pyramid only covers the rows present when it was built
+            self._pyramid = None
+            self._update_overview_button()
+            if self._pending_append is not None:
+                # Rows of an earlier append still being decimated, or cancelled by a zoom
+                start = min(start, self._pending_append)
+            xmin, xmax = self.figure.gca().get_xlim()
+            if xmax < start - 1:
+                # The user is looking at older rows; panning back redecimates the tail
+                return
+            span = max(xmax - xmin, 1.0)
+            self._pending_append = start
+            self._decimate_async(start, stop, lambda x, y: self._extend_line(x, y, stop),
+                                 max(1, int(self.bins_for_width() * (stop - start) / span)))
+        except Exception as e:
+            print(f'Error doing append_rows(): {e}')
+
+    def _extend_line(self, x, y, stop):
+        """Add the envelope of appended rows to the line, sliding a view that shows the tail."""
+        self._pending_append = None
+        if self._line is None:
+            return
+        ax = self.figure.gca()
+        xmin, xmax = ax.get_xlim()
+        shift = max(0.0, stop - xmax)
+        old_x, old_y = self._line.get_data()
+        keep = np.asarray(old_x) >= xmin + shift
+        self._line.set_data(np.concatenate((np.asarray(old_x)[keep], x)),
+                            np.concatenate((np.asarray(old_y)[keep], y)))
+        self._moving_tail = True
+        try:
+            ax.set_xlim(xmin + shift, xmax + shift)
+        finally:
+            self._moving_tail = False
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+        self.canvas.draw_idle()
+
+    def redecimate(self):
+        """
+        Re-decimate the visible x-range from the source data, so zooming in
+        reveals the detail hidden by the full-range envelope.
+        """
+        if self._line is None or self.datasetModel.empty:
+            return
+        try:
+            xmin, xmax = self.figure.gca().get_xlim()
+            start = max(0, int(np.floor(xmin)))
+            stop = min(self.datasetModel.row_count, int(np.ceil(xmax)) + 1)
+            self._decimate_async(start, stop, self._set_line_data)
+        except Exception as e:
+            print(f'Error doing redecimate(): {e}')
+
+    def _set_line_data(self, x, y):
+        if self._line is not None:
+            self._line.set_data(x, y)
+            self.canvas.draw_idle()
+
     def plot(self):
+        if self.figure is None:
+            return
         try:
+            self._redecimate_timer.stop()
+            self.cancel_decimation()
+            self._pending_append = None
+            self._line = None
+            self._pyramid = None
+            self._update_overview_button()
             ax = self.figure.gca()
             ax.clear()
-            if not self.datasetModel.dataFrame.empty:
+            self._difference_spans = None  # Removed with the rest of the axes
+            if self._envelope_pending and self.variable_names_button.currentIndex() == 0:
+                ax.text(0.5, 0.5, 'Loading...', fontsize=14, ha='center', va='center')
+                # Drawn once the event loop is idle, so the table shows first
+                self.canvas.draw_idle()
+                return
+            elif not self.datasetModel.empty:
                 try:
-                    data = self.datasetModel.dataFrame.iloc[:, self.variable_names_button.currentIndex()]
-                    ax.plot(np.arange(len(data)), data)
-                    ax.set_title(f"{self.datasetModel.title}")
-                    ax.set_ylabel(f"{self.variable_names_button.currentText()}")
+                    if self.variable_names_button.currentIndex() < 0:
+                        raise ValueError("No column selected.")
+                    reader = self.datasetModel.reader
+                    if reader is not None and reader.view is None:
+                        self._pyramid = Pyramid.open(reader.filename, reader.key_path,
+                                                     self.variable_names_button.currentIndex())
+                        self._update_overview_button()
+                    if self._initial_envelope is not None and self.variable_names_button.currentIndex() == 0:
+                        x, y = self._initial_envelope
+                        self._initial_envelope = None
+                        self._show_line(x, y)
+                        return
+                    self._initial_envelope = None
+                    self._decimate_async(0, self.datasetModel.row_count, self._show_line)
+                    if self._line is not None:
+                        return
+                    # Large columns are decimated on a worker, see _show_line
+                    ax.text(0.5, 0.5, 'Loading...', fontsize=14, ha='center', va='center')
+                    self.canvas.draw_idle()
+                    return
                 except Exception:
                     pass
             else:
                 ax.text(0.5, 0.5, 'No Data Available', fontsize=14, ha='center', va='center')
             self.canvas.draw()
         except Exception as e:
-            print(f'Error doing update_plot(): {e}')
\ No newline at end of file
+            print(f'Error doing update_plot(): {e}')
+
+    def _show_line(self, x, y):
+        """Plot the full-range envelope of the current column."""
+        ax = self.figure.gca()
+        ax.clear()
+        self._difference_spans = None
+        self._line, = ax.plot(x, y)
+        self._draw_differences(ax)
+        ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+        ax.set_title(f"{self.datasetModel.title}")
+        ax.set_ylabel(f"{self.variable_names_button.currentText()}")
+        self.canvas.draw()
+
+    def _update_overview_button(self):
+        if self._builder is not None and self._builder.isRunning():
+            return
+        if self._pyramid is not None:
+            self.overview_button.setText("Overview ready")
+            self.overview_button.setEnabled(False)
+        else:
+            self.overview_button.setText("Build overview")
+            self.overview_button.setEnabled(
+                self.datasetModel.reader is not None and self.datasetModel.view is None
+                and self.variable_names_button.currentIndex() >= 0
+            )
+
+    def build_overview(self):
+        """
+        Build the overview pyramid of the current column in the background.
+        """
+        reader = self.datasetModel.reader
+        column = self.variable_names_button.currentIndex()
+        if reader is None or reader.view is not None or column < 0:
+            return
+        self.cancel_overview()
+        self._builder = PyramidBuilder(reader.filename, reader.key_path, column)
+        self._builder.progress.connect(lambda percent: self.overview_button.setText(f"Building overview {percent}%"))
+        self._builder.pyramid_built.connect(self._on_pyramid_built)
+        self._builder.error_occurred.connect(lambda error: print(f'Error building overview: {error}'))
+        self._builder.finished.connect(self._on_builder_finished)
+        self.overview_button.setEnabled(False)
+        self._builder.start()
+
+    def cancel_overview(self):
+        """
+        Stop a running overview build.
+        """
+        if self._builder is not None:
+            self._builder.requestInterruption()
+            self._builder.wait()
+            self._builder = None
+
+    def _on_builder_finished(self):
+        if self._builder is not None:
+            self._builder.wait()
+            self._builder = None
+        self._update_overview_button()
+
+    def _on_pyramid_built(self, key_path, column):
+        reader = self.datasetModel.reader
+        if reader is not None and reader.key_path == key_path and self.variable_names_button.currentIndex() == column:
+            self.plot()
@@ -1,18 +1,28 @@
-import pandas as pd
 from PyQt5.QtWidgets import (
-    QMainWindow, QFileDialog, QVBoxLayout, QWidget, QAction,
-    QMessageBox, QTableView, QHeaderView, QSplitter, QMenu, QInputDialog
+    QMainWindow, QFileDialog, QVBoxLayout, QWidget, QAction, QDockWidget,
+    QMessageBox, QTableView, QHeaderView, QSplitter, QMenu, QInputDialog, QLabel, QProgressDialog
 )
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThreadPool, QTimer
 
+from backend.compare import normalize_path
+from backend.dataset_cache import DatasetCache
 from backend.dataset_model import DatasetModel
-from backend.hdf5_data import HDF5Data
+from backend.file_pool import default_pool
+from backend.export import FORMATS
+from backend.hdf5_data import HDF5Data, GroupLoader, DatasetLoader, ExportWorker, LiveTail
+from backend.metadata_cache import MetadataCache
+from backend.row_index import SortIndexCache
+from backend.statistics import StatisticsCache, shutdown_executor
 from frontend.Model.LazyTableModel import LazyLoadTableModel
 
+from frontend.compare_view import CompareDialog
 from frontend.graph_view import GraphWidget
+from frontend.perf_view import PerformanceWidget
+from frontend.stats_view import StatisticsWidget
 from frontend.table_view import TableWidget
 from frontend.tree_view import TreeWidget
+import os
 import numpy as np
 from pyqtspinner import WaitingSpinner
 
@@ -31,26 +41,103 @@ class HDF5Viewer(QMainWindow):
         # Initialize data & CustomWidget
         self.data: HDF5Data = None
 
+        self.group_loaders = []
+
+        # Datasets are opened on a worker pool; only the latest request is shown
+        self.load_pool = QThreadPool(self)
+        self.load_pool.setMaxThreadCount(2)
+        self.load_request = 0
+        self.dataset_loader = None
+
+        try:
+            self.metadata_cache = MetadataCache()
+        except Exception as e:
+            print(f'Metadata cache disabled: {e}')
+            self.metadata_cache = None
+
+        # Recently viewed datasets, so switching back to one is instant
+        self.dataset_cache = DatasetCache()
+
+        try:
+            self.statistics_cache = StatisticsCache()
+        except Exception as e:
+            print(f'Statistics cache disabled: {e}')
+            self.statistics_cache = None
+
+        try:
+            self.sort_index_cache = SortIndexCache()
+        except Exception as e:
+            print(f'Sort index cache disabled: {e}')
+            self.sort_index_cache = None
+
         self.datasetModel = DatasetModel()
 
         self.tree = TreeWidget()
 
         self.tree.itemClickedSignal.connect(self.update_content)
 
-        self.table = TableWidget()
+        self.tree.expandRequested.connect(self.load_group)
 
-        self.graph = GraphWidget()
+        self.tree.fullScanRequested.connect(self.start_index_scan)
+
+        self.index_scan = None
+
+        self.export_worker = None
+        self.export_progress = None
+
+        # Follows the dataset shown while another process appends to the file
+        self.live_tail = None
+
+        # Last comparison; the dataset shown is highlighted if it was compared
+        self.comparison = None
+        self.compare_dialog = CompareDialog(self)
+        self.compare_dialog.comparison_ready.connect(self.on_comparison_ready)
+        self.compare_dialog.dataset_activated.connect(lambda path: self.update_content({'Type': 'Dataset', 'Path': path}))
+
+        self.table = TableWidget(sort_index_cache=self.sort_index_cache)
+
+        self.graph = GraphWidget(pool=self.load_pool)
+
+        self.statistics = StatisticsWidget(cache=self.statistics_cache)
 
         self.table.rename_trigger.connect(lambda dataset_model: setattr(self.graph, "datasetModel", dataset_model))
 
+        self.table.rename_trigger.connect(lambda dataset_model: self.statistics.refresh_column_names())
+
+        self.table.slice_changed.connect(lambda dataset_model: setattr(self.graph, "datasetModel", dataset_model))
+
+        self.table.slice_changed.connect(self.statistics.set_dataset)
+
+        self.table.export_requested.connect(self.export_dataset)
+
+        self.table.slice_changed.connect(lambda dataset_model: self.apply_differences())
+
         # Splitter Layout
         splitter = QSplitter(Qt.Horizontal)
 
-        splitter.addWidget(self.tree)
+        tree_layout = QVBoxLayout()
+        tree_layout.setContentsMargins(0, 0, 0, 0)
+        tree_layout.addWidget(self.tree.search_bar)
+        tree_layout.addWidget(self.tree)
+        tree_panel = QWidget()
+        tree_panel.setLayout(tree_layout)
+
+        splitter.addWidget(tree_panel)
 
         splitter.addWidget(self.table)
 
-        splitter.addWidget(self.graph)
+        # Graph and statistics share the right pane
+        plot_splitter = QSplitter(Qt.Vertical)
+
+        plot_splitter.addWidget(self.graph)
+
+        plot_splitter.addWidget(self.statistics)
+
+        plot_splitter.setStretchFactor(0, 2)
+
+        plot_splitter.setStretchFactor(1, 1)
+
+        splitter.addWidget(plot_splitter)
 
         splitter.setStretchFactor(0, 1)
 
@@ -77,10 +164,48 @@ class HDF5Viewer(QMainWindow):
 
         # Menu Bar
         self.statusBar()
+        self.cache_status = QLabel()
+        self.statusBar().addPermanentWidget(self.cache_status)
+        # Block prefetch counters of the table, to tune the block size
+        self.prefetch_status = QLabel()
+        self.statusBar().addPermanentWidget(self.prefetch_status)
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setInterval(1000)
+        self.prefetch_timer.timeout.connect(self.update_prefetch_status)
+        self.prefetch_timer.start()
         open_action = self.create_action('Open', self.open_hdf5, 'Ctrl+O')
         self.menu = self.menuBar()
         file_menu = self.menu.addMenu('File')
         file_menu.addAction(open_action)
+        export_action = self.create_action('Export...', self.export_dataset, 'Ctrl+E',
+                                           'Export the dataset shown, or its sorted and filtered rows')
+        file_menu.addAction(export_action)
+        self.live_action = self.create_action('Live Tail', self.toggle_live_tail, 'Ctrl+L',
+                                              'Follow the rows appended to the file by another process (SWMR)')
+        self.live_action.setCheckable(True)
+        file_menu.addAction(self.live_action)
+        file_menu.addSeparator()
+        compare_files_action = self.create_action('Compare With File...', self.compare_files, 'Ctrl+D',
+                                                  'Compare the structure and the values of the open file with another file')
+        file_menu.addAction(compare_files_action)
+        compare_dataset_action = self.create_action('Compare Dataset With...', self.compare_dataset, 'Ctrl+Shift+D',
+                                                    'Compare the dataset shown with a dataset of another file')
+        file_menu.addAction(compare_dataset_action)
+
+        # Timings of the hot paths, recorded only while the dock is shown
+        self.performance = PerformanceWidget()
+        self.performance_dock = QDockWidget("Performance", self)
+        self.performance_dock.setObjectName("performance_dock")
+        self.performance_dock.setWidget(self.performance)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.performance_dock)
+        self.performance_dock.hide()
+        performance_action = self.performance_dock.toggleViewAction()
+        performance_action.setText('Performance Monitor')
+        performance_action.setShortcut('Ctrl+Shift+P')
+        performance_action.setStatusTip('Show the timings of reads, decompression, formatting, painting and plotting')
+        performance_action.toggled.connect(self.performance.set_active)
+        view_menu = self.menu.addMenu('View')
+        view_menu.addAction(performance_action)
 
         about_menu = self.menu.addMenu('About')
         version_action = QAction(f"Version: v1.0.1", self)
@@ -90,7 +215,7 @@ class HDF5Viewer(QMainWindow):
         self.spinner = WaitingSpinner(
             self,
             center_on_parent=True,
-            disable_parent_when_spinning=True,
+            disable_parent_when_spinning=False,
             roundness=100.0,
             fade=80.0,
             radius=10,
@@ -103,6 +228,26 @@ class HDF5Viewer(QMainWindow):
         if filepath:
             self.open_hdf5(filepath)
 
+    def closeEvent(self, event):
+        self.prefetch_timer.stop()
+        self.performance.stop()
+        self.stop_live_tail()
+        self.compare_dialog.cancel()
+        self.cancel_dataset_load()
+        self.graph.cancel_decimation()
+        self.load_pool.waitForDone()
+        self.graph.cancel_overview()
+        self.statistics.cancel()
+        shutdown_executor()
+        if self.index_scan is not None:
+            self.index_scan.wait()
+        self.cancel_export()
+        self.table.clear_table()
+        self.datasetModel.close()
+        self.dataset_cache.clear()
+        default_pool().close_all()
+        super().closeEvent(event)
+
     def create_action(self, text, slot=None, shortcut=None, tip=None):
         action = QAction(text, self)
         if shortcut is not None:
@@ -126,28 +271,71 @@ class HDF5Viewer(QMainWindow):
             file_name = filename
 
         if file_name:
+            self.stop_live_tail()
+            if self.data is not None:
+                default_pool().set_live(self.data.filename, False)
+            self.live_action.setChecked(False)
+
             # Clear plot
             self.graph.clear_graph()
             self.table.clear_table()
 
             self.spinner.start()
-            self.data = HDF5Data(file_name)
+            self.data = HDF5Data(file_name, cache=self.metadata_cache, dataset_cache=self.dataset_cache)
             self.data.metadata_loaded.connect(self.on_metadata_loaded)
             self.data.error_occurred.connect(self.on_load_error)
             self.data.start()
 
     def on_metadata_loaded(self, metadata):
+        if self.sender() is not self.data:
+            return
         self.spinner.stop()
-        self.tree.update_tree(metadata, self.data.filename)
+        self.tree.update_tree(metadata, self.data.filename, self.data.path_index)
         self.graph.clear_graph()
 
+    def start_index_scan(self):
+        """
+        Scan the whole file in the background, so searches cover the groups not expanded yet.
+        """
+        if self.data is None:
+            return
+        self.index_scan = HDF5Data(self.data.filename, lazy=False, cache=self.metadata_cache)
+        self.index_scan.metadata_loaded.connect(self.on_index_scan_loaded)
+        self.index_scan.error_occurred.connect(lambda error: print(f'Error indexing the file: {error}'))
+        self.index_scan.start()
+
+    def on_index_scan_loaded(self, metadata):
+        scan = self.sender()
+        if scan is not self.index_scan or self.data is None or scan.filename != self.data.filename:
+            return
+        self.tree.set_full_metadata(metadata, scan.path_index)
+
+    def load_group(self, path):
+        """
+        List the children of a group in the background when it is expanded.
+        """
+        if self.data is None:
+            return
+        loader = GroupLoader(self.data.filename, path, cache=self.metadata_cache)
+        loader.children_loaded.connect(self.tree.add_children)
+        loader.error_occurred.connect(lambda error: self.on_group_error(path, error))
+        loader.finished.connect(lambda: self.group_loaders.remove(loader))
+        self.group_loaders.append(loader)
+        loader.start()
+
+    def on_group_error(self, path, error):
+        self.tree.load_failed(path)
+        QMessageBox.warning(self, "Error", f"Failed to load group '{path}': {error}")
+
     def on_load_error(self, error):
+        if self.sender() is not self.data:
+            return
         self.spinner.stop()
         QMessageBox.critical(self, "Error", f"Failed to load HDF5 file: {error}")
 
     def update_content(self, item):
         try:
-            if self.table.modified_columns:
+            if self.table.has_unsaved_changes():
                 reply = QMessageBox.question(
                     self,
                     "Save Changes",
@@ -156,31 +344,247 @@ class HDF5Viewer(QMainWindow):
                 )
 
                 if reply == QMessageBox.Yes:
-                    if self.datasetModel.keypath and not self.datasetModel.dataFrame.empty:
+                    if self.datasetModel.keypath and not self.datasetModel.empty:
                         self.spinner.start()
                         self.data.update_dataset(self.datasetModel)
                         self.spinner.stop()
 
                 elif reply == QMessageBox.No:
-                    for old_name, new_name in self.table.modified_columns.items():
-                        self.datasetModel.dataFrame.rename(columns={new_name: old_name}, inplace=True)
+                    self.datasetModel.discard_changes(self.table.modified_columns)
 
                 elif reply == QMessageBox.Cancel:
                     return
 
+                self.table.modified_columns.clear()
+
             self.item = item
 
             if item['Type'] != 'Group' and item['Type'] != 'File' and item['Type'] != None:
-                self.spinner.start()
-                try:
-                    key_path = self.item.get('Path')
-                    self.datasetModel = self.data.get_by_key(key_path)
-                    self.graph.datasetModel = self.datasetModel
-                    self.table.datasetModel = self.datasetModel
-
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Failed to update content: {str(e)}")
-                finally:
-                    self.spinner.stop()
+                self.load_dataset(self.item.get('Path'))
         except Exception as e:
             print(f'Error doing update_content(): {e}')
+
+    def load_dataset(self, key_path):
+        """
+        Open a dataset in the background. A load still running for a previously
+        clicked dataset is cancelled and its result dropped.
+        """
+        self.stop_live_tail()
+        self.cancel_dataset_load()
+        self.load_request += 1
+        self.dataset_loader = DatasetLoader(self.data, key_path, self.load_request, self.graph.bins_for_width())
+        self.dataset_loader.signals.loaded.connect(self.on_dataset_loaded)
+        self.dataset_loader.signals.envelope_ready.connect(self.on_envelope_ready)
+        self.dataset_loader.signals.error_occurred.connect(self.on_dataset_error)
+        self.spinner.start()
+        self.load_pool.start(self.dataset_loader)
+
+    def cancel_dataset_load(self):
+        if self.dataset_loader is not None:
+            self.dataset_loader.cancel()
+            self.dataset_loader = None
+
+    def on_dataset_loaded(self, request_id, dataset_model, envelope):
+        if request_id != self.load_request:
+            return
+        self.spinner.stop()
+        if envelope is not None or dataset_model.empty:
+            self.dataset_loader = None
+        try:
+            self.datasetModel = dataset_model
+            # Without a cached envelope, the graph waits for on_envelope_ready
+            self.graph.set_dataset(self.datasetModel, envelope, pending=envelope is None)
+            self.table.datasetModel = self.datasetModel
+            self.statistics.set_dataset(self.datasetModel)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to update content: {str(e)}")
+        self.update_cache_status()
+        self.apply_differences()
+        if self.live_action.isChecked():
+            self.start_live_tail()
+
+    def update_cache_status(self):
+        stats = self.dataset_cache.stats()
+        self.cache_status.setText(
+            f"Dataset cache: {stats['hit_rate']:.0%} hits, {stats['entries']} datasets, "
+            f"{stats['resident_bytes'] / (1024 * 1024):.1f} MiB"
+        )
+
+    def update_prefetch_status(self):
+        stats = self.table.prefetch_stats()
+        if not stats:
+            self.prefetch_status.clear()
+            return
+        self.prefetch_status.setText(
+            f"Prefetch: {stats['hit_rate']:.0%} hits ({stats['hits']:,} hits, {stats['misses']:,} misses), "
+            f"{stats['block_rows']:,}-row blocks"
+        )
+
+    def on_envelope_ready(self, request_id, envelope):
+        if request_id != self.load_request:
+            return
+        self.dataset_loader = None
+        self.graph.set_envelope(envelope)
+        self.update_cache_status()
+
+    def on_dataset_error(self, request_id, error):
+        if request_id != self.load_request:
+            return
+        self.dataset_loader = None
+        self.spinner.stop()
+        QMessageBox.critical(self, "Error", f"Failed to update content: {error}")
+
+    def export_dataset(self):
+        """
+        Export the dataset shown in the table, or its sorted and filtered rows,
+        to CSV, Parquet or .npy in the background.
+        """
+        reader = self.datasetModel.reader
+        if reader is None or self.datasetModel.empty:
+            QMessageBox.information(self, "Export", "Select a dataset to export first.")
+            return
+        if self.export_worker is not None:
+            QMessageBox.information(self, "Export", "An export is already running.")
+            return
+
+        name = reader.key_path.strip('/').replace('/', '_') or 'dataset'
+        filters = {'CSV Files (*.csv)': '.csv', 'Parquet Files (*.parquet)': '.parquet', 'NumPy Files (*.npy)': '.npy'}
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, 'Export Dataset', f'{name}.csv',
+                                                                 ';;'.join(filters))
+        if not file_name:
+            return
+        if os.path.splitext(file_name)[1].lower() not in FORMATS:
+            file_name += filters.get(selected_filter, '.csv')
+
+        try:
+            self.export_worker = ExportWorker(reader, file_name, rows=self.table.row_index)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to export: {e}")
+            return
+        self.export_progress = QProgressDialog(f"Exporting to {os.path.basename(file_name)}...", "Cancel", 0, 100, self)
+        self.export_progress.setWindowTitle("Export")
+        self.export_progress.setMinimumDuration(500)
+        self.export_progress.canceled.connect(self.cancel_export)
+        self.export_worker.progress.connect(self.export_progress.setValue)
+        self.export_worker.export_finished.connect(self.on_export_finished)
+        self.export_worker.error_occurred.connect(self.on_export_error)
+        self.export_worker.finished.connect(self.on_export_worker_finished)
+        self.export_worker.start()
+
+    def cancel_export(self):
+        if self.export_worker is not None:
+            self.export_worker.requestInterruption()
+            self.export_worker.wait()
+
+    def on_export_finished(self, file_name):
+        self.statusBar().showMessage(f"Exported to {file_name}", 5000)
+
+    def on_export_error(self, error):
+        QMessageBox.warning(self, "Error", f"Failed to export: {error}")
+
+    def on_export_worker_finished(self):
+        if self.sender() is not self.export_worker:
+            return
+        self.export_worker = None
+        if self.export_progress is not None:
+            self.export_progress.reset()
+            self.export_progress.deleteLater()
+            self.export_progress = None
+
+    def toggle_live_tail(self, live):
+        """
+        Switch the live mode of the open file: its handle is reopened as a
+        SWMR reader and the dataset shown is polled for appended rows.
+        """
+        if self.data is None:
+            self.live_action.setChecked(False)
+            return
+        default_pool().set_live(self.data.filename, live)
+        if live:
+            self.start_live_tail()
+        else:
+            self.stop_live_tail()
+            self.statusBar().clearMessage()
+
+    def start_live_tail(self):
+        """
+        Poll the dataset shown for appended rows in the background.
+        """
+        self.stop_live_tail()
+        reader = self.datasetModel.reader
+        if reader is None:
+            return
+        self.live_tail = LiveTail(reader)
+        self.live_tail.rows_appended.connect(self.on_rows_appended)
+        self.live_tail.error_occurred.connect(self.on_live_tail_error)
+        self.live_tail.start()
+        self.statusBar().showMessage(f"Live: {reader.row_count:,} rows")
+
+    def stop_live_tail(self):
+        if self.live_tail is not None:
+            self.live_tail.requestInterruption()
+            self.live_tail.wait()
+            self.live_tail = None
+
+    def on_rows_appended(self, start, stop):
+        if self.live_tail is None or self.sender() is not self.live_tail:
+            return
+        self.table.append_rows()
+        self.graph.append_rows(start, stop)
+        self.statusBar().showMessage(f"Live: {stop:,} rows")
+
+    def on_live_tail_error(self, error):
+        if self.sender() is not self.live_tail:
+            return
+        self.stop_live_tail()
+        self.live_action.setChecked(False)
+        default_pool().set_live(self.data.filename, False)
+        QMessageBox.warning(self, "Error", f"Live tail stopped: {error}")
+
+    def compare_files(self):
+        """
+        Compare the open file with another file, structure and values, in the background.
+        """
+        if self.data is None:
+            QMessageBox.information(self, "Compare", "Open a file to compare first.")
+            return
+        other, _ = QFileDialog.getOpenFileName(self, 'Compare With', os.path.dirname(self.data.filename),
+                                               'HDF5 Files (*.hdf5 *.h5);;All Files (*)')
+        if other:
+            self.compare_dialog.compare(self.data.filename, other)
+
+    def compare_dataset(self):
+        """
+        Compare the dataset shown, in its current slice, with a dataset of
+        another file, or of the same file, in the background.
+        """
+        reader = self.datasetModel.reader
+        if self.data is None or reader is None:
+            QMessageBox.information(self, "Compare", "Select a dataset to compare first.")
+            return
+        other, _ = QFileDialog.getOpenFileName(self, 'Compare Dataset With', self.data.filename,
+                                               'HDF5 Files (*.hdf5 *.h5);;All Files (*)')
+        if not other:
+            return
+        path, ok = QInputDialog.getText(self, "Compare Dataset", "Dataset of the other file:", text=reader.key_path)
+        if ok and path.strip():
+            self.compare_dialog.compare(self.data.filename, other, reader.key_path, path.strip(), reader.view)
+
+    def on_comparison_ready(self, comparison):
+        self.comparison = comparison
+        self.apply_differences()
+
+    def apply_differences(self):
+        """
+        Highlight the differing rows of the dataset shown, if the last
+        comparison covered it in its current slice.
+        """
+        reader = self.datasetModel.reader
+        diff = None
+        if self.comparison is not None and reader is not None and self.data is not None \
+                and self.comparison.filename == self.data.filename:
+            diff = self.comparison.datasets.get(normalize_path(reader.key_path))
+            if diff is not None and diff.view != reader.view:
+                diff = None
+        self.table.set_differences(diff)
+        self.graph.set_differences(diff)
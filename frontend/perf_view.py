@@ -0,0 +1,152 @@
+import time
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QSplitter,
+    QFileDialog, QLabel
+)
+
+from backend.profiling import default_monitor
+
+
+class PerformanceWidget(QWidget):
+    """
+    Live view of the performance monitor: count, time and throughput per
+    kind of operation, and the most recent operations.
+
+    Operations are only recorded while the widget is active, see
+    `set_active`, so the instrumented code costs nothing the rest of the
+    time. A cProfile of the GUI thread can be recorded and saved as well.
+    """
+
+    OPERATION_HEADERS = ["Operation", "Count", "Total s", "Mean ms", "Last ms", "Max ms", "MB/s"]
+    EVENT_HEADERS = ["Time", "Operation", "Detail", "ms", "MB"]
+
+    # Recent operations listed, newest first
+    MAX_EVENTS = 100
+
+    def __init__(self, monitor=None):
+        """
+        Initialize the PerformanceWidget.
+
+        :param monitor: PerformanceMonitor shown, defaults to the shared one.
+        """
+        super().__init__()
+        self.monitor = monitor or default_monitor()
+        self._events_shown = None  # Last event shown, to skip refreshes without new operations
+        self._own_profile = False  # The running profile was started here, not with main.py --profile
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        self.reset_button = QPushButton("Reset")
+        self.reset_button.clicked.connect(self.reset)
+        self.profile_button = QPushButton("Stop cProfile..." if self.monitor.profiling else "Start cProfile")
+        self.profile_button.setToolTip("Profile the GUI thread with cProfile and save the stats")
+        self.profile_button.clicked.connect(self.toggle_profile)
+        self.status = QLabel()
+
+        self.operations = QTableWidget(0, len(self.OPERATION_HEADERS))
+        self.operations.setHorizontalHeaderLabels(self.OPERATION_HEADERS)
+        self.operations.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.operations.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.operations.verticalHeader().setVisible(False)
+
+        self.events = QTableWidget(0, len(self.EVENT_HEADERS))
+        self.events.setHorizontalHeaderLabels(self.EVENT_HEADERS)
+        self.events.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.events.horizontalHeader().setStretchLastSection(True)
+        self.events.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.events.verticalHeader().setVisible(False)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.reset_button)
+        button_layout.addWidget(self.profile_button)
+        button_layout.addWidget(self.status, 1)
+
+        splitter = QSplitter(Qt.Horizontal)
+        splitter.addWidget(self.operations)
+        splitter.addWidget(self.events)
+
+        layout = QVBoxLayout()
+        layout.addLayout(button_layout)
+        layout.addWidget(splitter)
+        self.setLayout(layout)
+
+    def set_active(self, active):
+        """
+        Start or stop recording operations and refreshing the tables.
+        """
+        self.monitor.enabled = active
+        if active:
+            self.refresh()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+
+    def reset(self):
+        self.monitor.reset()
+        self._events_shown = None
+        self.refresh()
+
+    def toggle_profile(self):
+        """
+        Start profiling, or stop and ask where to save the stats.
+        """
+        if not self.monitor.profiling:
+            self.monitor.start_profile()
+            self._own_profile = True
+            self.profile_button.setText("Stop cProfile...")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, 'Save Profile', 'hdf5viewer.prof',
+                                                   'Profile Stats (*.prof);;All Files (*)')
+        try:
+            self.monitor.stop_profile(file_name or None)
+            if file_name:
+                self.status.setText(f"Profile saved to {file_name}")
+        except Exception as e:
+            print(f'Error saving profile: {e}')
+        self._own_profile = False
+        self.profile_button.setText("Start cProfile")
+
+    def stop(self):
+        """
+        Stop recording and drop the profile started here, when the viewer
+        closes. A session profile of main.py --profile is written by main.py.
+        """
+        self.set_active(False)
+        if self._own_profile:
+            self.monitor.stop_profile()
+            self._own_profile = False
+
+    def refresh(self):
+        operations, events = self.monitor.snapshot()
+        last_event = events[-1] if events else None
+        if last_event == self._events_shown:
+            return
+        self._events_shown = last_event
+
+        self.operations.setRowCount(len(operations))
+        for row, (operation, stats) in enumerate(sorted(operations.items(), key=lambda item: -item[1].seconds)):
+            cells = [operation, f"{stats.count:,}", f"{stats.seconds:.3f}",
+                     f"{1000 * stats.seconds / max(stats.count, 1):.2f}", f"{1000 * stats.last_seconds:.2f}",
+                     f"{1000 * stats.max_seconds:.2f}",
+                     f"{stats.throughput / (1024 * 1024):,.1f}" if stats.nbytes else ""]
+            self._set_row(self.operations, row, cells, 1)
+
+        recent = events[::-1][:self.MAX_EVENTS]
+        self.events.setRowCount(len(recent))
+        for row, (wall_time, operation, detail, seconds, nbytes) in enumerate(recent):
+            cells = [time.strftime('%H:%M:%S', time.localtime(wall_time)), operation, str(detail),
+                     f"{1000 * seconds:.2f}", f"{nbytes / (1024 * 1024):.2f}" if nbytes else ""]
+            self._set_row(self.events, row, cells, 3)
+
+    @staticmethod
+    def _set_row(table, row, cells, text_columns):
+        """Fill a row; the numbers after the first `text_columns` cells are right-aligned."""
+        for column, text in enumerate(cells):
+            item = QTableWidgetItem(text)
+            if column >= text_columns:
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            table.setItem(row, column, item)
@@ -0,0 +1,151 @@
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QGridLayout, QLabel, QComboBox, QSpinBox, QSlider
+
+from backend.dataset_reader import DatasetReader
+
+
+class SliceSelector(QWidget):
+    """
+    Slice selection panel for datasets with more than two dimensions.
+
+    The user picks the axes shown as rows and columns, and indexes every other
+    axis with a spin box and a slider. Only the selected 2-D hyperslab is read.
+    """
+
+    sliceChanged = pyqtSignal(int, object, object)  # Emits the row axis, the column axis (or None) and the indexes
+
+    def __init__(self):
+        super().__init__()
+        self._reader = None
+        self._spin_boxes = []
+        self._sliders = []
+
+        # Holding an arrow key or dragging a slider reads one hyperslab once the value settles
+        self._emit_timer = QTimer(self)
+        self._emit_timer.setSingleShot(True)
+        self._emit_timer.setInterval(100)
+        self._emit_timer.timeout.connect(self._emit_slice)
+
+        self.row_axis_box = QComboBox()
+        self.column_axis_box = QComboBox()
+        self.row_axis_box.currentIndexChanged.connect(self._on_axes_changed)
+        self.column_axis_box.currentIndexChanged.connect(self._on_axes_changed)
+
+        axes_layout = QHBoxLayout()
+        axes_layout.addWidget(QLabel("Rows"))
+        axes_layout.addWidget(self.row_axis_box, 1)
+        self.column_axis_label = QLabel("Columns")
+        axes_layout.addWidget(self.column_axis_label)
+        axes_layout.addWidget(self.column_axis_box, 1)
+
+        self.index_layout = QGridLayout()
+
+        layout = QGridLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(axes_layout, 0, 0)
+        layout.addLayout(self.index_layout, 1, 0)
+        self.setLayout(layout)
+        self.setVisible(False)
+
+    def set_reader(self, reader: DatasetReader):
+        """
+        Show the controls of a sliced dataset, or hide the panel for other data.
+        """
+        self._emit_timer.stop()
+        if reader is not None and reader is self._reader:
+            self.show_view(reader.view)
+            return
+        self._reader = reader if reader is not None and reader.sliced else None
+        self._clear_index_controls()
+        self.setVisible(self._reader is not None)
+        if self._reader is None:
+            return
+
+        shape = self._reader.shape
+        labels = [f"Axis {axis} ({size})" for axis, size in enumerate(shape)]
+        for box in (self.row_axis_box, self.column_axis_box):
+            box.blockSignals(True)
+            box.clear()
+            box.addItems(labels)
+            box.blockSignals(False)
+
+        compound = self._reader.column_axis is None
+        self.column_axis_label.setVisible(not compound)
+        self.column_axis_box.setVisible(not compound)
+
+        for axis, size in enumerate(shape):
+            spin_box = QSpinBox()
+            spin_box.setRange(0, max(0, size - 1))
+            spin_box.setKeyboardTracking(False)
+            slider = QSlider(Qt.Horizontal)
+            slider.setRange(0, max(0, size - 1))
+            spin_box.valueChanged.connect(slider.setValue)
+            slider.valueChanged.connect(spin_box.setValue)
+            spin_box.valueChanged.connect(lambda _: self._emit_timer.start())
+            self.index_layout.addWidget(QLabel(f"Axis {axis}"), axis, 0)
+            self.index_layout.addWidget(spin_box, axis, 1)
+            self.index_layout.addWidget(slider, axis, 2)
+            self._spin_boxes.append(spin_box)
+            self._sliders.append(slider)
+        self.show_view(self._reader.view)
+
+    def show_view(self, view):
+        """
+        Set the controls to a view, without emitting sliceChanged.
+        """
+        if self._reader is None or view is None:
+            return
+        row_axis, column_axis, indexes = view
+        widgets = [self.row_axis_box, self.column_axis_box] + self._spin_boxes + self._sliders
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.row_axis_box.setCurrentIndex(row_axis)
+        if column_axis is not None:
+            self.column_axis_box.setCurrentIndex(column_axis)
+        for spin_box, slider, index in zip(self._spin_boxes, self._sliders, indexes):
+            spin_box.setValue(index)
+            slider.setValue(index)
+        for widget in widgets:
+            widget.blockSignals(False)
+        self._update_enabled()
+
+    def _clear_index_controls(self):
+        while self.index_layout.count():
+            widget = self.index_layout.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+        self._spin_boxes = []
+        self._sliders = []
+
+    def _display_axes(self):
+        row_axis = self.row_axis_box.currentIndex()
+        column_axis = None if self._reader.column_axis is None else self.column_axis_box.currentIndex()
+        return row_axis, column_axis
+
+    def _update_enabled(self):
+        display_axes = self._display_axes()
+        for axis, (spin_box, slider) in enumerate(zip(self._spin_boxes, self._sliders)):
+            spin_box.setEnabled(axis not in display_axes)
+            slider.setEnabled(axis not in display_axes)
+
+    def _on_axes_changed(self):
+        if self._reader is None:
+            return
+        row_axis, column_axis = self._display_axes()
+        if row_axis == column_axis:
+            # Swap the axes rather than showing the same axis twice
+            other_box = self.column_axis_box if self.sender() is self.row_axis_box else self.row_axis_box
+            other_box.blockSignals(True)
+            other_box.setCurrentIndex(self._reader.row_axis if other_box is self.column_axis_box
+                                      else self._reader.column_axis)
+            other_box.blockSignals(False)
+        self._update_enabled()
+        self._emit_timer.start()
+
+    def _emit_slice(self):
+        if self._reader is None:
+            return
+        row_axis, column_axis = self._display_axes()
+        indexes = tuple(spin_box.value() for spin_box in self._spin_boxes)
+        if (row_axis, column_axis, indexes) != self._reader.view:
+            self.sliceChanged.emit(row_axis, column_axis, indexes)
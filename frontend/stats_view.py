@@ -0,0 +1,196 @@
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QColor, QPainter
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView
+)
+
+from backend.dataset_model import DatasetModel
+from backend.hdf5_data import StatisticsWorker
+
+
+class HistogramView(QWidget):
+    """
+    Bar chart of a histogram, painted directly so it needs no plotting library.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._edges = []
+        self._counts = []
+        self.setMinimumHeight(120)
+
+    def set_histogram(self, edges, counts):
+        self._edges = list(edges)
+        self._counts = list(counts)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if not self._counts or max(self._counts) == 0:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No histogram")
+            return
+
+        label_height = painter.fontMetrics().height() + 4
+        width = self.width()
+        height = self.height() - label_height
+        bar_width = width / len(self._counts)
+        peak = max(self._counts)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(31, 119, 180))
+        for index, count in enumerate(self._counts):
+            bar_height = height * count / peak
+            painter.drawRect(QRectF(index * bar_width, height - bar_height, max(bar_width - 1, 1), bar_height))
+
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(0, height, width, label_height), Qt.AlignLeft | Qt.AlignVCenter, f"{self._edges[0]:.6g}")
+        painter.drawText(QRectF(0, height, width, label_height), Qt.AlignRight | Qt.AlignVCenter, f"{self._edges[-1]:.6g}")
+
+
+class StatisticsWidget(QWidget):
+    """
+    Per-column statistics of the selected dataset: count, NaN count, minimum,
+    maximum, mean, standard deviation and a histogram.
+
+    Statistics are computed on demand in a process pool, and cached per file,
+    dataset and modification time, so a cached result shows up as soon as the
+    dataset is selected.
+    """
+
+    HEADERS = ["Column", "Count", "NaN", "Min", "Max", "Mean", "Std"]
+
+    def __init__(self, cache=None):
+        """
+        Initialize the StatisticsWidget.
+
+        :param cache: StatisticsCache holding computed statistics, optional.
+        """
+        super().__init__()
+        self.cache = cache
+        self._datasetModel = DatasetModel()
+        self._columns = []  # ColumnStats of the dataset shown
+        self._worker = None
+
+        self.compute_button = QPushButton("Compute statistics")
+        self.compute_button.setEnabled(False)
+        self.compute_button.clicked.connect(self.compute)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setVisible(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.currentCellChanged.connect(lambda row, *_: self.show_histogram(row))
+
+        self.histogram = HistogramView()
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.compute_button)
+        button_layout.addWidget(self.progress_bar, 1)
+        button_layout.addWidget(self.cancel_button)
+
+        layout = QVBoxLayout()
+        layout.addLayout(button_layout)
+        layout.addWidget(self.table, 2)
+        layout.addWidget(self.histogram, 1)
+        self.setLayout(layout)
+
+    def set_dataset(self, value: DatasetModel):
+        """
+        Show the cached statistics of a dataset, if any.
+        """
+        self.cancel()
+        self._datasetModel = value
+        self.show_statistics([])
+        reader = value.reader
+        self.compute_button.setEnabled(reader is not None and not value.empty)
+        if reader is None or self.cache is None:
+            return
+        try:
+            columns = self.cache.get(reader.filename, reader.key_path, reader.view)
+        except Exception as e:
+            print(f'Error reading statistics cache: {e}')
+            columns = None
+        if columns is not None and len(columns) == len(value.columns):
+            self.show_statistics(columns)
+
+    def compute(self):
+        """
+        Compute the statistics of the current dataset in the background.
+        """
+        reader = self._datasetModel.reader
+        if reader is None:
+            return
+        self.cancel()
+        self._worker = StatisticsWorker(reader.filename, reader.key_path, reader.view, cache=self.cache)
+        self._worker.progress.connect(self.progress_bar.setValue)
+        self._worker.statistics_ready.connect(self._on_statistics_ready)
+        self._worker.error_occurred.connect(lambda error: print(f'Error computing statistics: {error}'))
+        self._worker.finished.connect(self._on_worker_finished)
+        self.progress_bar.setValue(0)
+        self._set_running(True)
+        self._worker.start()
+
+    def cancel(self):
+        """
+        Stop a running computation.
+        """
+        if self._worker is not None:
+            self._worker.requestInterruption()
+            self._worker.wait()
+            self._worker = None
+        self._set_running(False)
+
+    def _set_running(self, running):
+        self.compute_button.setVisible(not running)
+        self.progress_bar.setVisible(running)
+        self.cancel_button.setVisible(running)
+
+    def _on_worker_finished(self):
+        if self._worker is not None and self._worker is self.sender():
+            self._worker.wait()
+            self._worker = None
+            self._set_running(False)
+
+    def _on_statistics_ready(self, key_path, view, columns):
+        reader = self._datasetModel.reader
+        if reader is not None and reader.key_path == key_path and reader.view == view:
+            self.show_statistics(columns)
+
+    def refresh_column_names(self):
+        """
+        Show the statistics again after a column rename.
+        """
+        self.show_statistics(self._columns)
+
+    def show_statistics(self, columns):
+        self._columns = columns
+        names = self._datasetModel.columns
+        self.table.setRowCount(len(columns))
+        for row, stats in enumerate(columns):
+            cells = [str(names[row]) if row < len(names) else str(row), f"{stats.count:,}", f"{stats.nan_count:,}"]
+            if stats.numeric:
+                cells += [f"{value:.6g}" for value in (stats.minimum, stats.maximum, stats.mean, stats.std)]
+            else:
+                cells += [""] * 4
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        if columns:
+            self.table.selectRow(0)
+        self.show_histogram(0)
+
+    def show_histogram(self, row):
+        if 0 <= row < len(self._columns) and self._columns[row].numeric:
+            histogram = self._columns[row].histogram
+            self.histogram.set_histogram(histogram.edges, histogram.counts)
+        else:
+            self.histogram.set_histogram([], [])
@@ -1,28 +1,94 @@
-from PyQt5.QtWidgets import QWidget, QTableView, QHeaderView, QVBoxLayout, QMessageBox, QInputDialog, QMenu, QAction
+from PyQt5.QtWidgets import (
+    QWidget, QTableView, QHeaderView, QVBoxLayout, QHBoxLayout, QMessageBox, QInputDialog, QMenu, QAction, QLineEdit,
+    QProgressBar, QPushButton, QLabel
+)
 from PyQt5.QtCore import Qt, pyqtSignal
 
 from backend.dataset_model import DatasetModel
+from backend.hdf5_data import RowIndexWorker
+from backend.profiling import timed
+from backend.row_index import IndexedReader
+from frontend.Model.DatasetTableModel import DatasetTableModel
 from frontend.Model.LazyTableModel import LazyLoadTableModel
+from frontend.slice_view import SliceSelector
+
+
+class TimedTableView(QTableView):
+    """QTableView whose paints are timed by the performance monitor."""
+
+    def paintEvent(self, event):
+        with timed('paint', 'table'):
+            super().paintEvent(event)
 
 
 class TableWidget(QWidget):
 
     rename_trigger = pyqtSignal(DatasetModel)
+    slice_changed = pyqtSignal(DatasetModel)  # Emits the dataset model once it shows another slice
+    export_requested = pyqtSignal()  # Emitted by the Export action of the context menus
+
+    def __init__(self, sort_index_cache=None):
+        """
+        Initialize the TableWidget.
 
-    def __init__(self):
+        :param sort_index_cache: SortIndexCache persisting the sort permutations, optional.
+        """
         super().__init__()
 
-        self.table = QTableView()
+        self.table = TimedTableView()
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
         self.table.setModel(None)
+        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_table_context_menu)
+
+        self.slice_selector = SliceSelector()
+        self.slice_selector.sliceChanged.connect(self.change_slice)
+
+        # Sorting and filtering compute a row index in the background, the table maps its rows through it
+        self.sort_index_cache = sort_index_cache
+        self.sort_column = None
+        self.sort_descending = False
+        self.filter_expression = ''
+        self.row_index = None  # Dataset rows shown, in display order, None for every row in file order
+        self.row_index_worker = None
+
+        self.differences = None  # DatasetDiff highlighted in the table, see set_differences
+
+        self.filter_box = QLineEdit()
+        self.filter_box.setPlaceholderText("Filter rows, e.g. (temperature > 80) & (status == 3); columns are also c0, c1, ...")
+        self.filter_box.setClearButtonEnabled(True)
+        self.filter_box.returnPressed.connect(self.apply_filter)
+        self.filter_box.textChanged.connect(lambda text: self.apply_filter() if not text and self.filter_expression else None)
+        self.row_index_progress = QProgressBar()
+        self.row_index_progress.setRange(0, 100)
+        self.row_index_progress.setVisible(False)
+        self.row_index_cancel = QPushButton("Cancel")
+        self.row_index_cancel.setVisible(False)
+        self.row_index_cancel.clicked.connect(self.cancel_row_index)
+        self.row_count_label = QLabel()
+
+        filter_layout = QHBoxLayout()
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+        filter_layout.addWidget(self.filter_box, 1)
+        filter_layout.addWidget(self.row_index_progress)
+        filter_layout.addWidget(self.row_index_cancel)
+        filter_layout.addWidget(self.row_count_label)
+        self.filter_bar = QWidget()
+        self.filter_bar.setLayout(filter_layout)
+        self.filter_bar.setVisible(False)
 
         table_layout = QVBoxLayout()
+        table_layout.addWidget(self.slice_selector)
+        table_layout.addWidget(self.filter_bar)
         table_layout.addWidget(self.table)
 
         self.setLayout(table_layout)
 
         self._datasetModel = DatasetModel()
         self.modified_columns = {}
+        self.lazy_model = None
+        self.table.verticalScrollBar().valueChanged.connect(self.update_viewport)
+        self.table.horizontalScrollBar().valueChanged.connect(self.update_viewport)
 
 
     @property
@@ -58,7 +124,7 @@ class TableWidget(QWidget):
 
         new_name = new_name.strip()
 
-        if new_name in self.datasetModel.dataFrame.columns:
+        if new_name in self.datasetModel.columns:
             QMessageBox.warning(
                 self, "Error", f"Column name '{new_name}' already exists. Choose a different name."
             )
@@ -67,18 +133,163 @@ class TableWidget(QWidget):
         if model.setHeaderData(column_index, Qt.Horizontal, new_name, Qt.EditRole):
             QMessageBox.information(self, "Success", f"Column name updated to '{new_name}'.")
             self.modified_columns[current_name] = new_name
-            self.datasetModel.dataFrame.rename(columns={current_name: new_name}, inplace=True)
+            self.datasetModel.rename_column(current_name, new_name)
             self.rename_trigger.emit(self.datasetModel)
 
         else:
             QMessageBox.warning(self, "Error", "Failed to update column name.")
 
+    def change_slice(self, row_axis, column_axis, indexes):
+        """
+        Show another 2-D slice of an N-D dataset. Only that hyperslab is read.
+        """
+        reader = self.datasetModel.reader
+        if reader is None:
+            return
+        if self.has_unsaved_changes():
+            QMessageBox.warning(self, "Unsaved Changes", "Save or discard your changes before changing the slice.")
+            self.slice_selector.show_view(reader.view)
+            return
+        try:
+            # Stop the prefetcher first, so no block of the previous slice is read anymore
+            self.table.setModel(None)
+            self.release_model()
+            reader.set_view(row_axis, column_axis, indexes)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to change the slice: {e}")
+            self.slice_selector.show_view(reader.view)
+        self.fill_table()
+        self.slice_changed.emit(self.datasetModel)
+
+    def sort_by_column(self, column, descending=False):
+        """
+        Sort the rows by a column, or restore the file order.
+
+        :param column: Index of the column, None for the file order.
+        :param descending: Sort in descending order.
+        """
+        self.update_row_index(column, descending, self.filter_expression)
+
+    def apply_filter(self):
+        """Show the rows matching the expression of the filter box, or every row when it is empty."""
+        self.update_row_index(self.sort_column, self.sort_descending, self.filter_box.text().strip())
+
+    def update_row_index(self, sort_column, descending, expression):
+        """
+        Sort and filter the rows of the dataset in the background. The table
+        keeps showing the current rows until the new row index is ready.
+        """
+        reader = self.datasetModel.reader
+        if reader is None:
+            return
+        if self.has_unsaved_changes():
+            QMessageBox.warning(self, "Unsaved Changes", "Save or discard your changes before sorting or filtering.")
+            return
+        self.cancel_row_index()
+        self.row_index_worker = RowIndexWorker(reader, sort_column, descending, expression or None,
+                                               cache=self.sort_index_cache)
+        self.row_index_worker.progress.connect(self.row_index_progress.setValue)
+        self.row_index_worker.row_index_ready.connect(self.on_row_index_ready)
+        self.row_index_worker.error_occurred.connect(self.on_row_index_error)
+        self.row_index_worker.finished.connect(self.on_row_index_finished)
+        self.row_index_progress.setValue(0)
+        self.set_row_index_running(True)
+        self.row_index_worker.start()
+
+    def cancel_row_index(self):
+        """Stop a running sort or filter."""
+        if self.row_index_worker is not None:
+            self.row_index_worker.requestInterruption()
+            self.row_index_worker.wait()
+            self.row_index_worker = None
+        self.set_row_index_running(False)
+
+    def set_row_index_running(self, running):
+        self.row_index_progress.setVisible(running)
+        self.row_index_cancel.setVisible(running)
+
+    def on_row_index_finished(self):
+        if self.row_index_worker is not None and self.row_index_worker is self.sender():
+            self.row_index_worker.wait()
+            self.row_index_worker = None
+            self.set_row_index_running(False)
+
+    def on_row_index_error(self, error):
+        if self.sender() is self.row_index_worker:
+            QMessageBox.warning(self, "Error", f"Failed to sort or filter the rows: {error}")
+
+    def on_row_index_ready(self, rows):
+        worker = self.sender()
+        if worker is not self.row_index_worker or worker.reader is not self.datasetModel.reader:
+            return
+        self.sort_column, self.sort_descending = worker.sort_column, worker.descending
+        self.filter_expression = worker.expression or ''
+        self.show_rows(rows)
+
+    def show_rows(self, rows):
+        """
+        Show the rows of the dataset in the order of a row index.
+
+        :param rows: Dataset row of every displayed row, None for every row in file order.
+        """
+        reader = self.datasetModel.reader
+        header = self.table.horizontalHeader()
+        widths = [header.sectionSize(column) for column in range(header.count())]
+        self.table.setModel(None)
+        self.release_model()
+        if rows is not None:
+            reader = IndexedReader(reader, rows)
+        if reader.row_count:
+            reader.get_block(0)
+        self.lazy_model = DatasetTableModel(reader, parent=self)
+        self.lazy_model.set_differences(self.differences)
+        self.table.setModel(self.lazy_model)
+        for column, width in enumerate(widths[:header.count()]):
+            header.resizeSection(column, width)
+
+        self.row_index = rows
+        header.setSortIndicatorShown(self.sort_column is not None)
+        if self.sort_column is not None:
+            header.setSortIndicator(self.sort_column, Qt.DescendingOrder if self.sort_descending else Qt.AscendingOrder)
+        self.row_count_label.setText(
+            "" if rows is None else f"{len(rows):,} of {self.datasetModel.reader.row_count:,} rows"
+        )
+
+    def reset_row_index(self):
+        """Forget the sort and the filter of the previous dataset or slice."""
+        self.cancel_row_index()
+        self.sort_column = None
+        self.sort_descending = False
+        self.filter_expression = ''
+        self.row_index = None
+        self.filter_box.clear()
+        self.row_count_label.clear()
+        self.table.horizontalHeader().setSortIndicatorShown(False)
+
     def fill_table(self):
         try:
             self.modified_columns.clear()
-            self.lazy_model = LazyLoadTableModel(self.datasetModel.dataFrame, rows_per_chunk=100, parent=self)
-            self.table.setModel(self.lazy_model)
-            self.table.verticalScrollBar().valueChanged.connect(self.check_scroll_position)
+            self.reset_row_index()
+            self.differences = None
+            self.release_model()
+            self.slice_selector.set_reader(self.datasetModel.reader)
+            self.filter_bar.setVisible(self.datasetModel.reader is not None)
+            if self.datasetModel.reader is not None:
+                # Rows are read from the file block by block, no need to page them in.
+                # The first block is read up front so the first paint is complete.
+                self.datasetModel.reader.get_block(0)
+                self.lazy_model = DatasetTableModel(self.datasetModel.reader, parent=self)
+                self.table.setModel(self.lazy_model)
+                # Size the columns from about one screen of rows; the default samples 1000
+                self.table.horizontalHeader().setResizeContentsPrecision(100)
+            elif self.datasetModel.dataFrame is None:
+                self.table.setModel(None)
+                return
+            else:
+                self.lazy_model = LazyLoadTableModel(self.datasetModel.dataFrame, rows_per_chunk=100, parent=self)
+                self.table.setModel(self.lazy_model)
+                self.table.horizontalHeader().setResizeContentsPrecision(1000)
+                self.table.verticalScrollBar().valueChanged.connect(self.check_scroll_position)
             self.table.resizeColumnsToContents()
 
             header = self.table.horizontalHeader()
@@ -89,12 +300,85 @@ class TableWidget(QWidget):
             print(f'Error doing fill_table(): {e}')
 
     def clear_table(self):
+        self.reset_row_index()
+        self.filter_bar.setVisible(False)
         self.table.setModel(None)
+        self.release_model()
+        self.slice_selector.set_reader(None)
         self.modified_columns.clear()
 
+    def append_rows(self):
+        """
+        Show the rows appended to a live dataset. A table scrolled to the end
+        keeps following it; a sorted or filtered table keeps its rows, only
+        the row count is updated.
+        """
+        if not isinstance(self.lazy_model, DatasetTableModel):
+            return
+        if self.row_index is not None:
+            self.row_count_label.setText(f"{len(self.row_index):,} of {self.datasetModel.reader.row_count:,} rows")
+            return
+        scroll_bar = self.table.verticalScrollBar()
+        at_end = scroll_bar.value() == scroll_bar.maximum()
+        self.lazy_model.append_rows()
+        if at_end:
+            self.table.scrollToBottom()
+
+    def set_differences(self, differences):
+        """
+        Highlight the cells that differ from another dataset.
+
+        :param differences: DatasetDiff of the dataset shown, in its current slice, None to clear.
+        """
+        self.differences = differences
+        if isinstance(self.lazy_model, DatasetTableModel):
+            self.lazy_model.set_differences(differences)
+
+    def go_to_next_difference(self):
+        """Select the first differing row after the current one, in file order."""
+        if self.differences is None or self.row_index is not None or not isinstance(self.lazy_model, DatasetTableModel):
+            return
+        current = self.table.currentIndex()
+        row = self.differences.next_row(current.row() if current.isValid() else -1)
+        if row is None or row >= self.lazy_model.rowCount():
+            return
+        index = self.lazy_model.index(row, max(current.column(), 0))
+        self.table.setCurrentIndex(index)
+        self.table.scrollTo(index, QTableView.PositionAtCenter)
+
+    def has_unsaved_changes(self):
+        """True when columns were renamed or cells edited since the last save."""
+        return bool(self.modified_columns) or (self.lazy_model is not None and self.lazy_model.has_edits())
+
+    def release_model(self):
+        """Stop the background work of the current model."""
+        if isinstance(self.lazy_model, DatasetTableModel):
+            self.lazy_model.stop()
+        self.lazy_model = None
+
+    def update_viewport(self):
+        """Tell a dataset-backed model which rows are visible, so it can prefetch around them."""
+        if not isinstance(self.lazy_model, DatasetTableModel) or self.lazy_model.rowCount() == 0:
+            return
+        first_row = max(self.table.rowAt(0), 0)
+        last_row = self.table.rowAt(self.table.viewport().height() - 1)
+        if last_row < 0:
+            last_row = self.lazy_model.rowCount() - 1
+        first_column = max(self.table.columnAt(0), 0)
+        last_column = self.table.columnAt(self.table.viewport().width() - 1)
+        if last_column < 0:
+            last_column = self.lazy_model.columnCount() - 1
+        self.lazy_model.update_viewport(first_row, last_row, first_column, last_column)
+
+    def prefetch_stats(self):
+        """Prefetch counters of the current model, empty for in-memory data."""
+        if isinstance(self.lazy_model, DatasetTableModel):
+            return self.lazy_model.prefetch_stats()
+        return {}
+
     def check_scroll_position(self):
         scroll_bar = self.table.verticalScrollBar()
-        if scroll_bar.value() == scroll_bar.maximum():
+        if scroll_bar.value() == scroll_bar.maximum() and isinstance(self.lazy_model, LazyLoadTableModel):
             self.lazy_model.load_more_rows()
 
     def show_header_context_menu(self, pos):
@@ -107,4 +391,37 @@ class TableWidget(QWidget):
             rename_action = QAction("Rename Column", self)
             rename_action.triggered.connect(lambda: self.rename_column(logical_index))
             menu.addAction(rename_action)
+            if isinstance(self.lazy_model, DatasetTableModel):
+                menu.addSeparator()
+                sort_ascending_action = QAction("Sort Ascending", self)
+                sort_ascending_action.triggered.connect(lambda: self.sort_by_column(logical_index))
+                menu.addAction(sort_ascending_action)
+                sort_descending_action = QAction("Sort Descending", self)
+                sort_descending_action.triggered.connect(lambda: self.sort_by_column(logical_index, descending=True))
+                menu.addAction(sort_descending_action)
+                clear_sort_action = QAction("Clear Sort", self)
+                clear_sort_action.setEnabled(self.sort_column is not None)
+                clear_sort_action.triggered.connect(lambda: self.sort_by_column(None))
+                menu.addAction(clear_sort_action)
+                menu.addSeparator()
+                menu.addAction(self._export_action())
             menu.exec_(header.mapToGlobal(pos))
+
+    def show_table_context_menu(self, pos):
+        if not isinstance(self.lazy_model, DatasetTableModel):
+            return
+        menu = QMenu(self)
+        if self.differences is not None:
+            next_difference_action = QAction("Next Difference", self)
+            next_difference_action.setEnabled(self.row_index is None)
+            next_difference_action.triggered.connect(self.go_to_next_difference)
+            menu.addAction(next_difference_action)
+            menu.addSeparator()
+        menu.addAction(self._export_action())
+        menu.exec_(self.table.viewport().mapToGlobal(pos))
+
+    def _export_action(self):
+        text = "Export Selection..." if self.row_index is not None else "Export..."
+        export_action = QAction(text, self)
+        export_action.triggered.connect(self.export_requested.emit)
+        return export_action
@@ -1,13 +1,27 @@
-from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtWidgets import QTreeWidget, QTreeWidgetItem, QMessageBox
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import QTreeWidget, QTreeWidgetItem, QMessageBox, QWidget, QHBoxLayout, QLineEdit, QLabel
+
+from backend.path_index import PathIndex
 
 
 class TreeWidget(QTreeWidget):
     """
     A QTreeWidget for displaying the structure of an HDF5 file.
+
+    Paths are resolved through a PathIndex of the metadata. The `search_bar`
+    widget, laid out by the parent, searches names, path globs and attribute
+    values and expands the tree to the matches.
     """
 
     itemClickedSignal = pyqtSignal(dict)
+    expandRequested = pyqtSignal(str)  # Emits the path of a group whose children are not loaded yet
+    fullScanRequested = pyqtSignal()  # Emitted when a search needs the groups that are not listed yet
+
+    PLACEHOLDER_TEXT = "Loading..."
+
+    # Matches expanded in the tree; the count of the others is only reported
+    MAX_REVEALED_MATCHES = 100
 
     def __init__(self, hdf5_metadata=None):
         """
@@ -18,10 +32,35 @@ class TreeWidget(QTreeWidget):
         """
         super().__init__()
         self.hdf5_metadata = hdf5_metadata
+        self.path_index = PathIndex(hdf5_metadata)
+        self._pending_items = {}  # Group path -> item waiting for its children
+        self._items = {}  # Path -> item, for the objects shown so far
+        self._highlighted = []  # Items of the current search matches
+        self._full_scan_requested = False
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search names, path globs (/run_*/temp?) or attribute values")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_status = QLabel()
+        self.search_bar = QWidget()
+        search_layout = QHBoxLayout()
+        search_layout.setContentsMargins(0, 0, 0, 0)
+        search_layout.addWidget(self.search_box, 1)
+        search_layout.addWidget(self.search_status)
+        self.search_bar.setLayout(search_layout)
+
+        # Search once typing pauses
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self.search)
+        self.search_box.textChanged.connect(lambda _: self._search_timer.start())
+        self.search_box.returnPressed.connect(self.search)
 
         # Set up the QTreeWidget
-        self.setHeaderLabels(["Key", "Type"])
+        self.setHeaderLabels(["Key", "Type", "Details"])
         self.itemClicked.connect(self.handle_item_click)
+        self.itemExpanded.connect(self.handle_item_expanded)
 
         # Populate the tree if metadata is available
         if hdf5_metadata:
@@ -33,22 +72,137 @@ class TreeWidget(QTreeWidget):
             return
 
         self.clear()
+        self._pending_items.clear()
+        self._items.clear()
+        self._highlighted = []
 
         # Add the root item and populate the tree using metadata
         root_item = QTreeWidgetItem(self, ["Path", path_file ])
-        self._populate_tree_recursive(root_item, self.hdf5_metadata)
-        self.expandAll()
+        if self._populate_tree_recursive(root_item, self.hdf5_metadata):
+            # Lazy metadata: expanding everything would load the whole hierarchy
+            root_item.setExpanded(True)
+        else:
+            self.expandAll()
         self.resizeColumnToContents(0)
         self.resizeColumnToContents(1)
+        self.resizeColumnToContents(2)
+
+    def _populate_tree_recursive(self, parent_item, metadata, recursive=True):
+        """
+        Recursively add items to the QTreeWidget from the metadata.
+
+        Groups whose children are not loaded yet get a placeholder child so
+        that they can still be expanded.
 
-    def _populate_tree_recursive(self, parent_item, metadata):
-        """Recursively add items to the QTreeWidget from the metadata."""
+        :param recursive: Add the items of the loaded sub-groups too; otherwise
+                          they get a placeholder and are filled when expanded.
+        :return: True if at least one placeholder was added.
+        """
+        has_placeholder = False
         for key, value in metadata.items():
             if value.get("Type") == "Group":
                 group_item = QTreeWidgetItem(parent_item, [key, "Group"])
-                self._populate_tree_recursive(group_item, value.get("Children", {}))
+                group_item.setData(0, Qt.UserRole, value.get("Path"))
+                self._items[value.get("Path")] = group_item
+                if value.get("Loaded", True) and (recursive or not value.get("Children")):
+                    has_placeholder |= self._populate_tree_recursive(group_item, value.get("Children", {}))
+                else:
+                    QTreeWidgetItem(group_item, [self.PLACEHOLDER_TEXT, ""])
+                    has_placeholder = True
             elif value.get("Type") == "Dataset":
-                QTreeWidgetItem(parent_item, [key, "Dataset"])
+                dataset_item = QTreeWidgetItem(parent_item, [key, "Dataset", self._dataset_details(value)])
+                dataset_item.setData(0, Qt.UserRole, value.get("Path"))
+                self._items[value.get("Path")] = dataset_item
+                dataset_item.setToolTip(2, self._dataset_tooltip(value))
+        return has_placeholder
+
+    @staticmethod
+    def _dataset_details(metadata):
+        """Short shape and dtype summary of a dataset entry."""
+        if "Shape" not in metadata:
+            return ""
+        shape = " x ".join(map(str, metadata["Shape"])) or "scalar"
+        return f"{shape} {metadata.get('Dtype', '')}"
+
+    @staticmethod
+    def _dataset_tooltip(metadata):
+        """Chunking, compression and storage details of a dataset entry."""
+        if "Shape" not in metadata:
+            return ""
+        chunks = metadata.get("Chunks")
+        return "\n".join([
+            f"Shape: {metadata['Shape']}",
+            f"Dtype: {metadata.get('Dtype')}",
+            f"Chunks: {chunks if chunks else 'contiguous'}",
+            f"Compression: {metadata.get('Compression') or 'none'}",
+            f"Storage size: {metadata.get('StorageSize', 0):,} bytes",
+        ])
+
+    def _find_metadata(self, path):
+        """Return the metadata entry of a path, or None if it is not known."""
+        return self.path_index.get(path)
+
+    def _is_placeholder(self, item):
+        return item.data(0, Qt.UserRole) is None and item.text(0) == self.PLACEHOLDER_TEXT
+
+    def _remove_placeholders(self, item):
+        """
+        Remove the placeholder child of an item.
+
+        :return: True if the item had one.
+        """
+        removed = False
+        for index in reversed(range(item.childCount())):
+            if self._is_placeholder(item.child(index)):
+                item.removeChild(item.child(index))
+                removed = True
+        return removed
+
+    def handle_item_expanded(self, item):
+        """
+        Request the children of a group the first time it is expanded.
+        """
+        path = item.data(0, Qt.UserRole)
+        if not path or path in self._pending_items:
+            return
+
+        metadata = self._find_metadata(path)
+        if metadata is None:
+            return
+        if metadata.get("Loaded", True):
+            # Listed by a full scan after the item was created, only one level
+            # is added so that revealing a search match stays cheap
+            if self._remove_placeholders(item):
+                self._populate_tree_recursive(item, metadata.get("Children", {}), recursive=False)
+            return
+
+        self._pending_items[path] = item
+        self.expandRequested.emit(path)
+
+    def add_children(self, path, children):
+        """
+        Insert the children of a lazily loaded group, replacing its placeholder.
+
+        :param path: Path of the group.
+        :param children: Metadata of the group's direct children.
+        """
+        item = self._pending_items.pop(path, None)
+        metadata = self._find_metadata(path)
+        if item is None or metadata is None:
+            return
+
+        if not metadata.get("Loaded", True):
+            metadata["Children"] = children
+            metadata["Loaded"] = True
+            self.path_index.add_children(path, children)
+
+        if self._remove_placeholders(item):
+            self._populate_tree_recursive(item, metadata.get("Children", {}))
+        self.resizeColumnToContents(0)
+
+    def load_failed(self, path):
+        """Forget a pending group so that it can be requested again."""
+        self._pending_items.pop(path, None)
 
     def handle_item_click(self, item):
         """
@@ -57,20 +211,13 @@ class TreeWidget(QTreeWidget):
         - Emits the usable path for the `get_by_key` function.
         - Emits the type of the item and the label for additional context.
         """
-        # Build the HDF5 path based on the item's position in the tree
-        hdf5_path = []
-        current_item = item
-        while current_item:
-            hdf5_path.insert(0, current_item.text(0))
-            current_item = current_item.parent()
-
-        # Join the path components to create the usable path for get_by_key
-        usable_path = "/".join(hdf5_path[1:])  # Skip the root filename
+        if self._is_placeholder(item):
+            return
 
-        # Traverse the metadata to find the item's information
-        current_metadata = self.hdf5_metadata
-        for key in hdf5_path[1:]:
-            current_metadata = current_metadata.get(key, {}).get("Children", current_metadata.get(key, {}))
+        # Items carry their full path; the root item, the file, has none
+        path = item.data(0, Qt.UserRole)
+        usable_path = path.strip("/") if path else ""
+        current_metadata = self.path_index.get(path) if path else self.hdf5_metadata
 
         if not current_metadata:
             QMessageBox.warning(self, "Error", f"Key '{usable_path}' not found in metadata.")
@@ -83,11 +230,74 @@ class TreeWidget(QTreeWidget):
             "Path": usable_path
         })
 
-    def update_tree(self, hdf5_metadata, path_file = None):
+    def update_tree(self, hdf5_metadata, path_file = None, path_index=None):
         """
         Update the tree widget with new HDF5 metadata.
 
         :param hdf5_metadata: Dictionary representing the updated HDF5 file structure.
+        :param path_index: PathIndex of the metadata, built here if not given.
         """
         self.hdf5_metadata = hdf5_metadata
+        self.path_index = path_index or PathIndex(hdf5_metadata)
+        self._full_scan_requested = False
         self.populate_tree(path_file)
+        if self.search_box.text().strip():
+            self.search()
+
+    def set_full_metadata(self, hdf5_metadata, path_index=None):
+        """
+        Replace lazily listed metadata with the metadata of a full scan,
+        keeping the items shown so far, and run the pending search again.
+
+        :param hdf5_metadata: Metadata of every group of the file.
+        :param path_index: PathIndex of the metadata, built here if not given.
+        """
+        self.hdf5_metadata = hdf5_metadata
+        self.path_index = path_index or PathIndex(hdf5_metadata)
+        if self.search_box.text().strip():
+            self.search()
+
+    def search(self):
+        """
+        Highlight the objects matching the search box and expand the tree to them.
+        """
+        self._search_timer.stop()
+        for item in self._highlighted:
+            item.setBackground(0, QBrush())
+        self._highlighted = []
+
+        query = self.search_box.text().strip()
+        if not query:
+            self.search_status.clear()
+            return
+        if not self.path_index.complete and not self._full_scan_requested:
+            # Lazily listed groups are not indexed yet; search them once the file is scanned
+            self._full_scan_requested = True
+            self.fullScanRequested.emit()
+
+        matches = self.path_index.search(query)
+        status = f"{len(matches):,} matches" if len(matches) < 10000 else "10,000+ matches"
+        self.search_status.setText(status if self.path_index.complete else f"{status}, indexing...")
+
+        brush = QBrush(QColor(255, 235, 130))
+        for path in matches[:self.MAX_REVEALED_MATCHES]:
+            item = self.reveal(path)
+            if item is not None:
+                item.setBackground(0, brush)
+                self._highlighted.append(item)
+        if self._highlighted:
+            self.scrollToItem(self._highlighted[0])
+
+    def reveal(self, path):
+        """
+        Expand the groups containing a path, creating their items if needed.
+
+        :return: The item of the path, or None if it is not shown.
+        """
+        for ancestor in self.path_index.ancestors(path):
+            item = self._items.get(ancestor)
+            if item is None:
+                return None
+            if not item.isExpanded():
+                item.setExpanded(True)
+        return self._items.get(path)
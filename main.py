@@ -1,14 +1,23 @@
+import argparse
 import sys
 from PyQt5.QtWidgets import QApplication
+from backend.profiling import default_monitor
 from frontend.main_view import HDF5Viewer
 import qt_material
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="HDF5 Viewer")
+    parser.add_argument('file', nargs='?', default=None)
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                        help="profile the session with cProfile and write the stats to FILE on exit")
+    # Options not listed here, e.g. -style, are left to Qt
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    if args.profile:
+        default_monitor().start_profile()
     try:
-        if len(sys.argv) > 1:
-            filepath = sys.argv[1]
-            viewer = HDF5Viewer(filepath)
+        if args.file:
+            viewer = HDF5Viewer(args.file)
         else:
             viewer = HDF5Viewer()
     except Exception as e:
@@ -16,4 +25,6 @@ if __name__ == '__main__':
     qt_material.apply_stylesheet(app, theme='light_blue.xml')
     viewer.show()
     exit_code = app.exec_()
-    sys.exit(exit_code)
\ No newline at end of file
+    if args.profile:
+        default_monitor().stop_profile(args.profile)
+    sys.exit(exit_code)
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import numpy as np
+
+from backend.compare import compare_datasets, compare_files, normalize_path
+
+
+def _write(filename, values):
+    with h5py.File(filename, "w") as h5file:
+        h5file.create_group("g").create_dataset("d", data=values, chunks=(10,))
+
+
+def test_compared_datasets_are_keyed_by_normalized_path(tmp_path):
+    first, second = str(tmp_path / "a.h5"), str(tmp_path / "b.h5")
+    values = np.arange(100, dtype=np.float64)
+    _write(first, values)
+    values[42] = -1
+    _write(second, values)
+
+    with ThreadPoolExecutor(1) as executor:
+        files = compare_files(first, second, executor=executor)
+        # Tree items give dataset paths without the leading slash
+        datasets = compare_datasets(first, "g/d", second, "g/d/", executor=executor)
+
+    for comparison in (files, datasets):
+        assert list(comparison.datasets) == ["/g/d"]
+        diff = comparison.datasets[normalize_path("g/d")]
+        assert (diff.key_path, diff.other_key_path) == ("/g/d", "/g/d")
+        assert diff.column_ranges(0) == [(42, 43)]
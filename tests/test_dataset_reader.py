@@ -0,0 +1,37 @@
+import h5py
+import numpy as np
+
+from backend.dataset_reader import DatasetReader
+from backend.hdf5_file import HDF5File
+
+
+def _transposed_reader(tmp_path):
+    """Reader of a (2, 4, 1000) dataset viewed with the column axis before the row axis."""
+    filename = str(tmp_path / "sliced.h5")
+    with h5py.File(filename, "w") as h5file:
+        h5file.create_dataset("data", data=np.arange(8000, dtype=np.float64).reshape(2, 4, 1000),
+                              chunks=(1, 4, 100))
+    # Blocks of 100 rows, so rows 5 and 150 are edited in two blocks
+    reader = DatasetReader(filename, "data", block_bytes=4 * 8 * 100)
+    reader.set_view(2, 1, (0, 0, 0))
+    assert reader.block_rows == 100
+    reader.set_value(5, 1, -1.0)
+    reader.set_value(150, 2, -2.0)
+    return filename, reader
+
+
+def test_read_rows_applies_edits_of_every_block_of_transposed_slice(tmp_path):
+    _, reader = _transposed_reader(tmp_path)
+    rows = reader.read_rows(0, 200, edits=True)
+    assert rows.shape == (200, 4)
+    assert rows[5, 1] == -1.0
+    assert rows[150, 2] == -2.0
+
+
+def test_save_writes_edits_of_every_block_of_transposed_slice(tmp_path):
+    filename, reader = _transposed_reader(tmp_path)
+    HDF5File(filename, pool=reader.pool)._write_reader_changes("data", reader)
+    assert not reader.has_edits
+    with reader.pool.read(filename) as h5file:
+        assert h5file["data"][0, 1, 5] == -1.0
+        assert h5file["data"][0, 2, 150] == -2.0
@@ -0,0 +1,20 @@
+import h5py
+import pytest
+
+from backend.dataset_reader import DatasetReader
+from backend.export import export_dataset
+
+
+def test_empty_dataset_exports_to_parquet_with_its_schema(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    filename = str(tmp_path / "empty.h5")
+    with h5py.File(filename, "w") as h5file:
+        h5file.create_dataset("e", shape=(0, 3), dtype="f4")
+        h5file.create_dataset("s", shape=(0,), dtype=[("x", "i8"), ("name", "S4")])
+
+    for key_path, types in (("e", ["float", "float", "float"]), ("s", ["int64", "string"])):
+        output = str(tmp_path / f"{key_path}.parquet")
+        assert export_dataset(DatasetReader(filename, key_path), output)
+        table = pq.read_table(output)
+        assert table.num_rows == 0
+        assert [str(field.type) for field in table.schema] == types
@@ -0,0 +1,27 @@
+import numpy as np
+
+from backend.formatting import FormatCache
+
+
+def test_cache_is_bounded_by_cells():
+    cache = FormatCache(max_cells=3000)
+    for block_index in range(10):
+        strings = cache.get(block_index, 0, lambda: np.arange(1024.0))
+        assert len(strings) == 1024
+    assert sum(len(strings) for strings in cache._entries.values()) <= 3000
+    assert cache._cells == sum(len(strings) for strings in cache._entries.values())
+
+    cache.invalidate(9)
+    assert cache._cells == sum(len(strings) for strings in cache._entries.values())
+    cache.invalidate()
+    assert cache._cells == 0
+
+
+def test_segments_of_a_block_are_cached_separately():
+    cache = FormatCache()
+    values = np.arange(2048)
+    first = cache.get(0, 0, lambda: values[:1024], segment=0)
+    second = cache.get(0, 0, lambda: values[1024:], segment=1)
+    assert first[0] == "0" and second[0] == "1024"
+    cache.invalidate(0)
+    assert not cache._entries
@@ -0,0 +1,32 @@
+import sqlite3
+from contextlib import closing
+
+import h5py
+
+from backend.metadata_cache import MetadataCache
+
+
+def _stored_bytes(cache):
+    with closing(sqlite3.connect(cache.filename)) as connection:
+        nbytes = connection.execute("SELECT nbytes FROM files").fetchone()[0]
+        payloads = connection.execute("SELECT SUM(LENGTH(payload)) FROM groups").fetchone()[0]
+    return nbytes, payloads
+
+
+def test_relisting_a_group_does_not_grow_file_size(tmp_path):
+    filename = str(tmp_path / "groups.h5")
+    with h5py.File(filename, "w") as h5file:
+        h5file.create_group("g").create_dataset("d", data=[1, 2, 3])
+    cache = MetadataCache(directory=str(tmp_path / "cache"))
+    cache.put(filename, "token", {"g": {"Type": "Group", "Path": "/g", "Children": {}, "Loaded": False}})
+    listing = {"d": {"Type": "Dataset", "Path": "/g/d", "Shape": [3]}}
+
+    for _ in range(3):
+        cache.put_group(filename, "/g", listing)
+    nbytes, payloads = _stored_bytes(cache)
+    assert nbytes == payloads
+
+    listing["e"] = {"Type": "Dataset", "Path": "/g/e", "Shape": [1]}
+    cache.put_group(filename, "/g", listing)
+    nbytes, payloads = _stored_bytes(cache)
+    assert nbytes == payloads
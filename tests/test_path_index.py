@@ -0,0 +1,23 @@
+from backend.path_index import PathIndex
+
+
+def _index():
+    dataset = {"Type": "Dataset"}
+    return PathIndex({
+        "a": {"Type": "Group", "Path": "/a", "Children": {
+            "b": {"Type": "Group", "Path": "/a/b", "Children": {"c": dict(dataset, Path="/a/b/c")}},
+            "d": dict(dataset, Path="/a/d"),
+        }},
+    })
+
+
+def test_path_globs_stay_within_a_segment():
+    index = _index()
+    assert index.search("/a/*") == ["/a/b", "/a/d"]
+    assert index.search("/a/?") == ["/a/b", "/a/d"]
+    assert index.search("/a/**") == ["/a/b", "/a/d", "/a/b/c"]
+    assert index.search("/*/b/*") == ["/a/b/c"]
+
+
+def test_name_globs_match_names():
+    assert _index().search("[bc]") == ["/a/b", "/a/b/c"]
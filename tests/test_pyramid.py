@@ -0,0 +1,33 @@
+import h5py
+import numpy as np
+
+from backend import pyramid
+from backend.dataset_reader import DatasetReader
+from backend.pyramid import Pyramid, build_pyramid
+
+
+def test_pieces_stay_bounded_for_prime_chunk_heights(tmp_path, monkeypatch):
+    filename = str(tmp_path / "prime.h5")
+    values = np.random.default_rng(0).normal(size=50_000)
+    with h5py.File(filename, "w") as h5file:
+        h5file.create_dataset("data", data=values, chunks=(10007,))
+    monkeypatch.setattr(pyramid, "PIECE_SAMPLES", 8192)
+    pieces = []
+    read_column = DatasetReader.read_column
+
+    def recording_read_column(self, column, start=0, stop=None):
+        pieces.append(stop - start)
+        return read_column(self, column, start, stop)
+
+    monkeypatch.setattr(DatasetReader, "read_column", recording_read_column)
+    assert build_pyramid(filename, "data", 0)
+    assert max(pieces) <= 8192 and sum(pieces) == len(values)
+
+    overview = Pyramid.open(filename, "data", 0)
+    assert overview is not None
+    factor = overview.factors[0]
+    bins = [values[start:start + factor] for start in range(0, len(values), factor)]
+    with h5py.File(overview.path, "r") as sidecar:
+        finest = sidecar[overview.group_name][f"level_{pyramid.BASE_LEVEL}"][()]
+    np.testing.assert_allclose(finest[:, 0], [values.min() for values in bins])
+    np.testing.assert_allclose(finest[:, 1], [values.max() for values in bins])
@@ -0,0 +1,49 @@
+import h5py
+import numpy as np
+
+from backend.metadata_cache import MetadataCache
+from backend.scanner import list_group, scan_file
+
+
+def _linked_file(tmp_path):
+    external = str(tmp_path / "external.h5")
+    with h5py.File(external, "w") as h5file:
+        h5file.create_dataset("x", data=[1, 2])
+        h5file.create_group("eg").create_dataset("y", data=[3])
+    filename = str(tmp_path / "links.h5")
+    with h5py.File(filename, "w") as h5file:
+        group = h5file.create_group("g")
+        group["hard_d"] = group.create_dataset("d", data=np.arange(5))
+        group["up"] = h5py.SoftLink("/")
+        h5file["soft_d"] = h5py.SoftLink("/g/d")
+        h5file["soft_g"] = h5py.SoftLink("/g")
+        h5file["hard_g"] = group
+        h5file["ext_x"] = h5py.ExternalLink(external, "/x")
+        h5file["ext_g"] = h5py.ExternalLink(external, "/eg")
+        h5file["dangling"] = h5py.SoftLink("/missing")
+    return filename
+
+
+def test_full_scan_lists_the_links_the_lazy_listing_shows(tmp_path):
+    with h5py.File(_linked_file(tmp_path), "r") as h5file:
+        metadata = scan_file(h5file)
+        assert metadata.keys() == list_group(h5file, "/").keys()
+        assert metadata["g"]["Children"].keys() == list_group(h5file, "/g").keys()
+        assert metadata["soft_d"]["Type"] == metadata["ext_x"]["Type"] == "Dataset"
+        assert "dangling" not in metadata
+        assert metadata["g"]["Loaded"]
+        # Groups behind links are listed lazily, which keeps the /g/up cycle finite
+        for key in ("soft_g", "hard_g", "ext_g"):
+            assert not metadata[key]["Loaded"]
+        assert not metadata["g"]["Children"]["up"]["Loaded"]
+
+
+def test_linked_groups_keep_a_full_scan_complete_in_the_cache(tmp_path):
+    filename = _linked_file(tmp_path)
+    with h5py.File(filename, "r") as h5file:
+        metadata = scan_file(h5file)
+    cache = MetadataCache(directory=str(tmp_path / "cache"))
+    cache.put(filename, "token", metadata)
+    cached = cache.get(filename, "token", require_complete=True)
+    assert cached is not None
+    assert cached["soft_g"]["Link"] and not cached["soft_g"]["Loaded"]
@@ -0,0 +1,42 @@
+import itertools
+import sqlite3
+from contextlib import closing
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+
+from backend import statistics
+from backend.statistics import ColumnStats, StatisticsCache
+
+
+def test_cache_evicts_least_recently_used_slices(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(statistics, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    filename = str(tmp_path / "cube.h5")
+    with h5py.File(filename, "w") as h5file:
+        h5file.create_dataset("cube", data=np.zeros((8, 4, 4)))
+    columns = [ColumnStats() for _ in range(4)]
+    for stats in columns:
+        stats.update(np.arange(10.0))
+
+    cache = StatisticsCache(directory=str(tmp_path / "cache"))
+    cache.put(filename, "cube", columns, (1, 2, (0, 0, 0)))
+    cache.put(filename, "cube", columns, (1, 2, (1, 0, 0)))
+    with closing(sqlite3.connect(cache.filename)) as connection:
+        entry_bytes = connection.execute("SELECT MAX(LENGTH(payload)) FROM statistics").fetchone()[0]
+    cache.max_bytes = 2 * entry_bytes
+
+    # Reading the first slice makes the second one the least recently used
+    assert cache.get(filename, "cube", (1, 2, (0, 0, 0))) is not None
+    cache.put(filename, "cube", columns, (1, 2, (2, 0, 0)))
+    assert cache.get(filename, "cube", (1, 2, (0, 0, 0))) is not None
+    assert cache.get(filename, "cube", (1, 2, (1, 0, 0))) is None
+    assert cache.get(filename, "cube", (1, 2, (2, 0, 0))) is not None
+
+
+def test_std_of_non_numeric_column_is_nan():
+    stats = ColumnStats(numeric=False)
+    stats.update(np.array([b"a", b"b", b"c"]))
+    assert stats.count == 3
+    assert np.isnan(stats.std)